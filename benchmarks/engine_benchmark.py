@@ -0,0 +1,100 @@
+"""
+Compares the time of each FAIRiskDataset method between the 'dict' and 'columnar' engines (see
+`FAIRiskDataset.load`). Every run starts from a fresh dataset, and the time of creating it is not included. `get`
+measures the creation of the dictionary, which the columnar engine defers until first needed.
+
+`resample` is measured on the first --resample-countries countries only, since it takes in the order of 30s per
+country in both engines.
+
+Usage (from the repository root):
+    python -m benchmarks.engine_benchmark [--dataset output/fairisk_dataset.json] [--repeat 3] [--methods get_interval ...]
+"""
+import argparse
+import json
+import logging
+import time
+import pandas as pd
+
+from fairiskdata import FAIRiskDataset
+from fairiskdata.storage.columnar_store import ColumnarStore
+from benchmarks.synthetic_dataset import make_dataset
+
+METHODS = {
+    'get': lambda d: d.get(),
+    'get_interval': lambda d: d.get_interval(),
+    'get_countries': lambda d: d.get_countries(),
+    'get_categories': lambda d: d.get_categories(),
+    'get_attributes': lambda d: d.get_attributes(),
+    'filter_countries': lambda d: d.filter_countries(d.get_countries()[::2]),
+    'filter_categories': lambda d: d.filter_categories(['COVID', 'MORTALITY']),
+    'filter_attributes': lambda d: d.filter_attributes([('COVID', 'new_cases'), ('COVID', 'total_deaths'),
+                                                        ('MORTALITY', 'Total_Total')]),
+    'filter_time_interval': lambda d: d.filter_time_interval(
+        pd.Interval(pd.Timestamp('2020-03-01'), pd.Timestamp('2020-12-31'), closed='both')),
+    'filter_age_group': lambda d: d.filter_age_group((40, 80)),
+    'filter_countries_with_missing_values_on_attributes':
+        lambda d: d.filter_countries_with_missing_values_on_attributes([('COVID', 'new_cases')]),
+    'filter_countries_missing_value_attributes_below': lambda d: d.filter_countries_missing_value_attributes_below(10),
+    'filter_attributes_with_countries_nan_below': lambda d: d.filter_attributes_with_countries_nan_below(10),
+    'export(parameters)': lambda d: d.export('parameters'),
+    'export(timeseries)': lambda d: d.export('timeseries'),
+    'export(all)': lambda d: d.export('all'),
+}
+
+
+def copy_dataset(dataset):
+    # dict methods change the nested dictionaries (VALUEs are replaced, not changed), so only those are copied
+    return {country: {category: {attribute: dict(attribute_val) for attribute, attribute_val in attributes.items()}
+                      for category, attributes in categories.items()}
+            for country, categories in dataset.items()}
+
+
+def time_method(create, method, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        dataset = create()
+        start = time.perf_counter()
+        method(dataset)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', help='exported json dataset (a synthetic dataset is used by default)')
+    parser.add_argument('--n-countries', type=int, default=200, help='number of countries of the synthetic dataset')
+    parser.add_argument('--resample-countries', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--methods', nargs='*', default=list(METHODS.keys()) + ['resample'])
+    args = parser.parse_args()
+
+    logging.getLogger('fairisk').setLevel(logging.ERROR)
+
+    if args.dataset:
+        with open(args.dataset) as f:
+            dataset = json.load(f)
+    else:
+        dataset = make_dataset(n_countries=args.n_countries)
+    for categories in dataset.values():
+        for attributes in categories.values():
+            for attribute_val in attributes.values():
+                attribute_val['VALUE'] = pd.Series(attribute_val['VALUE'], dtype='float64')
+
+    store = ColumnarStore.from_dict(dataset)
+    methods = dict(METHODS)
+    resample_countries = list(dataset.keys())[:args.resample_countries]
+    methods['resample'] = lambda d: d.filter_countries(resample_countries).resample('MONTHLY')
+
+    engines = {'dict': lambda: FAIRiskDataset(copy_dataset(dataset)),
+               # filters of the columnar engine create new stores, so the same store is used by every run
+               'columnar': lambda: FAIRiskDataset(store=store)}
+
+    print('%-52s %12s %12s %9s' % ('method', 'dict [s]', 'columnar [s]', 'speedup'))
+    for name in args.methods:
+        times = {engine: time_method(create, methods[name], args.repeat) for engine, create in engines.items()}
+        print('%-52s %12.4f %12.4f %8.1fx' % (name, times['dict'], times['columnar'],
+                                              times['dict'] / max(times['columnar'], 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares load time and peak memory (RSS) of FAIRiskDataset.load between the json, parquet and memmap file formats.
+Each load runs in a fresh process, as a cold-started worker would. The time includes creating the dataset dictionary
+(`get()`), which the memmap format defers until first needed.
+
+Usage (from the repository root):
+    python -m benchmarks.load_formats_benchmark [--dataset output/fairisk_dataset.json] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from fairiskdata.sources.single_dataset import export_dataset
+from benchmarks.synthetic_dataset import make_dataset
+
+LOAD_SCRIPT = '''
+import json, sys, time
+from benchmarks.memory import peak_rss_mb
+from fairiskdata import FAIRiskDataset
+rss_before = peak_rss_mb()
+start = time.perf_counter()
+dataset = FAIRiskDataset.load(sys.argv[1], file_format=sys.argv[2]).get()
+elapsed = time.perf_counter() - start
+rss_after = peak_rss_mb()
+print(json.dumps({'seconds': elapsed, 'peak_rss_mb': rss_after, 'load_rss_mb': rss_after - rss_before}))
+'''
+
+
+def run_load(file_path, file_format):
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    out = subprocess.run([sys.executable, '-c', LOAD_SCRIPT, file_path, file_format], cwd=root,
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', help='exported json dataset (a synthetic dataset is used by default)')
+    parser.add_argument('--n-countries', type=int, default=200, help='number of countries of the synthetic dataset')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.dataset:
+            with open(args.dataset) as f:
+                dataset = json.load(f)
+        else:
+            dataset = make_dataset(n_countries=args.n_countries)
+
+        paths = {'json': os.path.join(tmp, 'fairisk_dataset.json'),
+                 'parquet': os.path.join(tmp, 'fairisk_dataset.parquet'),
+                 'memmap': os.path.join(tmp, 'fairisk_dataset.mmap')}
+        for file_format, file_path in paths.items():
+            export_dataset(dataset, file_path, file_format=file_format)
+        del dataset
+
+        print('%-8s %12s %14s %14s' % ('format', 'load [s]', 'peak RSS [MB]', 'load RSS [MB]'))
+        for file_format, file_path in paths.items():
+            runs = [run_load(file_path, file_format) for _ in range(args.repeat)]
+            best = min(runs, key=lambda r: r['seconds'])
+            print('%-8s %12.3f %14.1f %14.1f' % (file_format, best['seconds'], best['peak_rss_mb'], best['load_rss_mb']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+import resource
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the current process in MB. On Linux the high-water mark of /proc is used, since
+    ru_maxrss is inherited from the parent process across fork and exec.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
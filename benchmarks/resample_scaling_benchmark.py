@@ -0,0 +1,80 @@
+"""
+Measures how `FAIRiskDataset.resample` and `FAIRiskDataset.resample_age_groups` scale with the number of processes
+(`max_processes`), in the 'dict' and 'columnar' engines (see `FAIRiskDataset.load`). Every run starts from a fresh
+dataset, whose creation is not included, and the result of each run is checked to be the same as with the
+first number of processes (a single one by default).
+
+Usage (from the repository root):
+    python -m benchmarks.resample_scaling_benchmark [--dataset output/fairisk_dataset.json] [--processes 1 2 4 8 16]
+"""
+import argparse
+import json
+import logging
+import time
+import pandas as pd
+
+from fairiskdata import FAIRiskDataset
+from fairiskdata.storage.columnar_store import ColumnarStore
+from benchmarks.engine_benchmark import copy_dataset
+from benchmarks.synthetic_dataset import make_dataset
+
+METHODS = {
+    'resample(WEEKLY)': lambda d, n: d.resample('WEEKLY', max_processes=n),
+    'resample(MONTHLY)': lambda d, n: d.resample('MONTHLY', max_processes=n),
+    'resample(DAILY)': lambda d, n: d.resample('DAILY', max_processes=n),
+    'resample_age_groups(MEDIUM)': lambda d, n: d.resample_age_groups('MEDIUM', max_processes=n),
+}
+
+
+def time_method(create, method, processes, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        dataset = create()
+        start = time.perf_counter()
+        method(dataset, processes)
+        best = min(best, time.perf_counter() - start)
+        result = dataset.export('all')
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', help='exported json dataset (a synthetic dataset is used by default)')
+    parser.add_argument('--n-countries', type=int, default=200, help='number of countries of the synthetic dataset')
+    parser.add_argument('--processes', type=int, nargs='*', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--engines', nargs='*', default=['dict', 'columnar'])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--methods', nargs='*', default=list(METHODS.keys()))
+    args = parser.parse_args()
+
+    logging.getLogger('fairisk').setLevel(logging.ERROR)
+
+    if args.dataset:
+        with open(args.dataset) as f:
+            dataset = json.load(f)
+    else:
+        dataset = make_dataset(n_countries=args.n_countries)
+    for categories in dataset.values():
+        for attributes in categories.values():
+            for attribute_val in attributes.values():
+                attribute_val['VALUE'] = pd.Series(attribute_val['VALUE'], dtype='float64')
+
+    store = ColumnarStore.from_dict(dataset)
+    engines = {'dict': lambda: FAIRiskDataset(copy_dataset(dataset)),
+               'columnar': lambda: FAIRiskDataset(store=store)}
+
+    print('%-30s %-9s %9s %10s %9s %10s' % ('method', 'engine', 'processes', 'time [s]', 'speedup', 'identical'))
+    for name in args.methods:
+        for engine in args.engines:
+            serial_time, serial = None, None
+            for processes in args.processes:
+                seconds, result = time_method(engines[engine], METHODS[name], processes, args.repeat)
+                if serial is None:
+                    serial_time, serial = seconds, result
+                identical = result.equals(serial)
+                print('%-30s %-9s %9d %10.3f %8.1fx %10s' % (name, engine, processes, seconds,
+                                                             serial_time / max(seconds, 1e-9), identical))
+
+
+if __name__ == '__main__':
+    main()
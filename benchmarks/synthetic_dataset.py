@@ -0,0 +1,98 @@
+"""
+Synthetic FAIRisk dataset with the shape of the merged dataset exported by `sources.single_dataset` (same categories,
+attribute names, time keys and frequencies), used by the benchmarks when no locally fetched dataset is available.
+"""
+import numpy as np
+import pandas as pd
+
+COVID_ATTRS = {'total_cases': 'TOTAL', 'new_cases': 'NEW', 'total_deaths': 'TOTAL', 'new_deaths': 'NEW',
+               'icu_patients': 'CURRENT', 'hosp_patients': 'CURRENT', 'new_tests': 'NEW', 'positive_rate': 'CURRENT',
+               'total_tests': 'TOTAL', 'new_vaccinations': 'NEW', 'total_vaccinations': 'TOTAL',
+               'people_fully_vaccinated': 'TOTAL', 'people_vaccinated': 'TOTAL', 'stringency_index': 'CURRENT',
+               'reproduction_rate': 'CURRENT'}
+
+MOBILITY_ATTRS = ['all_day_bing_tiles_visited_relative_change_mean', 'all_day_bing_tiles_visited_relative_change_std',
+                  'all_day_ratio_single_tile_users_mean', 'all_day_ratio_single_tile_users_std']
+
+EUROSTAT_AGES = ['Total', 'Less than 5 years'] + ['From %d to %d years' % (a, a + 4) for a in range(5, 85, 5)]
+EUROSTAT_SEXES = ['Males', 'Females', 'Total']
+HMD_AGES = ['D0_14', 'D15_64', 'D65_74', 'D75_84', 'D85p', 'DTotal']
+
+
+def _attr(name, source, values, unit='Number', frequency=None, series_type=None):
+    attr = {'ATTR_NAME': name, 'SOURCE': source, 'UNIT': unit, 'VALUE': values}
+    if frequency is not None:
+        attr['FREQUENCY'] = frequency
+        attr['SERIES_TYPE'] = series_type
+    return attr
+
+
+def _weeks(first_year, last_year):
+    return ['%dW%02d' % (y, w) for y in range(first_year, last_year + 1) for w in range(1, 53)]
+
+
+def make_dataset(n_countries=200, n_eurostat=35, n_hmd=5, n_mobility=120, n_indicators=40, seed=0):
+    """
+    Creates a synthetic dataset dictionary (VALUEs as dicts of time key -> value, as found in the exported json).
+    :param n_countries: int
+    :return: dataset: dict
+    """
+    rng = np.random.default_rng(seed)
+
+    days = pd.date_range('2020-01-01', '2021-09-30', freq='D').strftime('%Y-%m-%d').tolist()
+    mobility_days = days[60:]
+    weeks = _weeks(2010, 2021)[:-12]
+    years = [str(y) for y in range(2010, 2021)]
+
+    dataset = dict()
+    for c in range(n_countries):
+        country = 'Country%03d' % c
+        dataset[country] = {'COVID': {}, 'DEMOGRAPHIC': {}, 'INDICATORS': {}, 'SCORES': {}}
+
+        for attr, series_type in COVID_ATTRS.items():
+            x = rng.poisson(100, len(days)).astype(float)
+            x = np.cumsum(x) if series_type == 'TOTAL' else x
+            dataset[country]['COVID'][attr] = _attr(attr, 'OWID', dict(zip(days, x.tolist())),
+                                                    frequency='DAILY', series_type=series_type)
+
+        for i in range(n_indicators):
+            category = 'SCORES' if i % 4 == 0 else 'INDICATORS'
+            value = None if rng.random() < 0.1 else float(rng.random())
+            dataset[country][category]['IND%02d' % i] = _attr('Indicator %d' % i, 'GHO', {'2019': value})
+
+        if c < n_eurostat:
+            for age in EUROSTAT_AGES + ['85 years or over']:
+                for sex in EUROSTAT_SEXES:
+                    key = age + '_' + sex
+                    dataset[country]['DEMOGRAPHIC'][key] = _attr(
+                        key, 'Eurostat', dict(zip(years, rng.integers(1e4, 1e6, len(years)).astype(float).tolist())),
+                        frequency='YEARLY', series_type='CURRENT')
+
+            dataset[country]['MORTALITY'] = {}
+            for age in EUROSTAT_AGES + ['From 85 to 89 years', '90 years or over']:
+                for sex in EUROSTAT_SEXES:
+                    key = age + '_' + sex
+                    dataset[country]['MORTALITY'][key] = _attr(
+                        key, 'Eurostat', dict(zip(weeks, rng.poisson(50, len(weeks)).astype(float).tolist())),
+                        frequency='WEEKLY', series_type='NEW')
+        else:
+            dataset[country]['DEMOGRAPHIC']['population'] = _attr('Population', 'OWID',
+                                                                  {'2020': float(rng.integers(1e5, 1e8))})
+
+            if c < n_eurostat + n_hmd:
+                dataset[country]['MORTALITY'] = {}
+                for age in HMD_AGES:
+                    for sex in ['m', 'f', 'b']:
+                        key = age + '_' + sex
+                        dataset[country]['MORTALITY'][key] = _attr(
+                            key, 'Human Mortality Database',
+                            dict(zip(weeks, rng.poisson(50, len(weeks)).astype(float).tolist())),
+                            frequency='WEEKLY', series_type='NEW')
+
+        if c < n_mobility:
+            dataset[country]['MOBILITY'] = {
+                attr: _attr(attr, 'Facebook', dict(zip(mobility_days, rng.normal(0, 1, len(mobility_days)).tolist())),
+                            unit='Relation to baseline', frequency='DAILY', series_type='CURRENT')
+                for attr in MOBILITY_ATTRS}
+
+    return dataset
@@ -0,0 +1,50 @@
+"""
+Compares parsing time keys one by one with `time_parsers.safe_date_parse` with parsing them at once with
+`time_parsers.parse_time_keys`. The keys are drawn from the formats found in the merged dataset (weeks, months, years,
+year ranges and dates). Distinct keys are few compared to the number of keys, as in the dataset.
+
+Usage (from the repository root):
+    python -m benchmarks.time_parsers_benchmark [--n-keys 1000000] [--repeat 3]
+"""
+import argparse
+import time
+import numpy as np
+
+from fairiskdata.utils.time_parsers import parse_time_keys, safe_date_parse
+
+
+def make_keys(n_keys, seed=0):
+    distinct = (['%dW%02d' % (y, w) for y in range(2000, 2023) for w in range(1, 53)] +
+                ['%02d-%d' % (m, y) for y in range(2000, 2023) for m in range(1, 13)] +
+                [str(y) for y in range(1960, 2023)] +
+                ['%d-%d' % (y, y + 4) for y in range(1960, 2020)] +
+                [str(d.astype('datetime64[D]')) for d in np.arange('2020-01-01', '2022-12-31', dtype='datetime64[D]')])
+    return np.random.default_rng(seed).choice(np.array(distinct, dtype=object), n_keys)
+
+
+def time_function(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-keys', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    keys = make_keys(args.n_keys)
+    scalar = time_function(lambda: [safe_date_parse(key) for key in keys], 1)
+    bulk = time_function(lambda: parse_time_keys(keys), args.repeat)
+
+    print('%-20s %12s' % ('parser', 'time [s]'))
+    print('%-20s %12.4f' % ('safe_date_parse', scalar))
+    print('%-20s %12.4f %8.1fx' % ('parse_time_keys', bulk, scalar / max(bulk, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
+import copy
 import json
-from fairiskdata.sources.single_dataset import ALL_DATASETS_LIST, fetch_and_export
+from fairiskdata.sources.single_dataset import ALL_DATASETS_LIST, fetch_and_export, get_file_format
+from fairiskdata.storage.columnar import load_columnar, read_columnar
+from fairiskdata.storage.columnar_store import ColumnarStore
+from fairiskdata.storage.columnar_view import ColumnarView
+from fairiskdata.storage.sharded import load_sharded
+from fairiskdata.storage.memmap_store import MemmapStore
 from typing import List, Tuple, Union
-import datetime
+import numpy as np
 import pandas as pd
 from os import path
 import numbers
@@ -9,109 +15,350 @@ import math
 from collections.abc import Iterable
 
 from fairiskdata.utils.age_parsers import safe_parse_age_group, do_ranges_overlap
-from fairiskdata.utils.time_parsers import safe_date_parse, safe_sortable_date_parse, safe_interval_parse
+from fairiskdata.utils.time_parsers import safe_interval_parse
+from fairiskdata.utils.time_index import get_time_index, set_time_index
+from fairiskdata.utils.attribute_index import AttributeIndex
+from fairiskdata.utils.missingness import MissingnessMatrix
+from fairiskdata.utils.age_cube import AgeCube
 from fairiskdata.preprocessing.resampling import Resampler
 from fairiskdata.preprocessing.age_resampling import AgeResampler
 from fairiskdata.preprocessing.normalizers import Normalizers
+from fairiskdata.modelling.baseline_models import BaselineModel
 from fairiskdata.modelling.excess_mortality import ExcessMortality
+from fairiskdata.lazy_dataset import LazyFAIRiskDataset
 
 import logging
 logging.getLogger('fairisk').addHandler(logging.NullHandler())
 logger = logging.getLogger('fairisk')
 
+ENGINES = ['dict', 'columnar']
+""" The supported in-memory representations of the dataset (see `FAIRiskDataset.load`). """
+
 class FAIRiskDataset:
     """
     The main class of this package. It should be created by invoking the `fairisk_dataset.FAIRiskDataset.load` static
     method.
     """
 
-    def __init__(self, dataset=None) -> None:
+    def __init__(self, dataset=None, store=None) -> None:
         super().__init__()
-        self.dataset = dataset
+        self._dataset = dataset
+        self._store = store
+        # inverted index of the entries of the dataset dictionary (see utils.attribute_index) and missingness matrix
+        # (see utils.missingness), created on first use
+        self._attribute_index = None
+        self._missingness = None
         self._age_groups_granularity = None
         self.indicatorsNormalized = False
         self.scoresNormalized = False
 
+    @property
+    def dataset(self):
+        # Datasets backed by a store (see storage.memmap_store) are only created when first needed
+        if self._dataset is None and self._store is not None:
+            store = self._store
+            if isinstance(store, ColumnarStore) and store.shared:
+                # the dictionary refers to the arrays of the store, which views of this dataset still select from
+                store = store.copy()
+            self._dataset = store.to_dict()
+            self._store = None
+        return self._dataset
+
+    @dataset.setter
+    def dataset(self, dataset):
+        self._dataset = dataset
+        self._store = None
+        self._data_changed()
+
+    @property
+    def _columnar(self):
+        # The columnar engine (see storage.columnar_store), until the dictionary is created. The data selected by a
+        # view is copied into a store of its own when first needed by a method other than the filters.
+        if isinstance(self._store, ColumnarView):
+            self._store = self._store.compact()
+        return self._store if isinstance(self._store, ColumnarStore) else None
+
+    @property
+    def _filterable(self):
+        # Filters of the columnar engine and of views (which narrow the selection of the view, see `view`)
+        return self._store if isinstance(self._store, (ColumnarStore, ColumnarView)) else None
+
+    def _get_attribute_index(self):
+        # Getters and filters use this index instead of walking the dataset. Methods which change the entries of the
+        # dictionary in place either update it or reset it.
+        if self._columnar is not None:
+            return self._columnar.get_attribute_index()
+        if self._attribute_index is None:
+            self._attribute_index = AttributeIndex.from_dict(self.dataset)
+        return self._attribute_index
+
+    def _get_missingness(self):
+        # The missing-value filters count missing attributes in this matrix, which is kept or reset like the index
+        if isinstance(self._store, ColumnarView):
+            return self._store.get_missingness()
+        if self._columnar is not None:
+            return self._columnar.get_missingness()
+        if self._missingness is None:
+            entries = [(country, category, attribute, not self._attr_has_missing_values(attribute_val))
+                       for country, categories in self.dataset.items()
+                       for category, attributes in categories.items()
+                       for attribute, attribute_val in attributes.items()]
+            countries, categories, attributes, complete = zip(*entries) if entries else ((), (), (), ())
+            self._missingness = MissingnessMatrix.from_entries(countries, categories, attributes, complete,
+                                                               all_countries=list(self.dataset.keys()))
+        return self._missingness
+
+    def _data_changed(self):
+        self._attribute_index = None
+        self._missingness = None
+
+    def _remove_countries(self, countries):
+        # removes countries of the dictionary, keeping the index and the missingness matrix up to date
+        attribute_index = self._get_attribute_index()
+        for country in countries:
+            del self.dataset[country]
+            attribute_index.remove_country(country)
+        if self._missingness is not None:
+            self._missingness = self._missingness.drop_countries(countries)
+
+    def _is_empty(self):
+        # Datasets backed by a store are checked without creating the dictionary
+        if self._dataset is None and self._store is not None:
+            return len(self._store) == 0
+        return not self.dataset
+
     @staticmethod
-    def load(json_file_path="output/fairisk_dataset.json", datasets_list=ALL_DATASETS_LIST, force_fetch=False):
+    def load(json_file_path="output/fairisk_dataset.json", datasets_list=ALL_DATASETS_LIST, force_fetch=False,
+             file_format=None,
+             countries: Union[str, List[str], None] = None,
+             categories: Union[str, List[str], None] = None,
+             attributes: Union[Tuple[str, str], List[Tuple[str, str]], None] = None,
+             cache_dir: str = None,
+             engine: str = 'dict'):
         """
-        Load the dataset. If json file does not exist locally, all datasets will be downloaded.
+        Load the dataset. If the dataset file does not exist locally, all datasets will be downloaded.
+        The time keys of each time series are parsed once, when loaded, into a typed index used by all time
+        operations (see utils.time_index). With the 'memmap' format, this happens when the series are first needed.
 
         Arguments:
-                    json_file_path {`str`} -- specifies the location to store the cached json file including the datasets
+                    json_file_path {`str`} -- specifies the location to store the cached file including the datasets
                     that were fetched. (default: "output/fairisk_dataset.json")
 
                     datasets_list {`List[str]`} -- there is a list of all datasets which are downloaded by default.
                     A different list may be selected (see sources.single_dataset). Only used if fetch from sources occurs.
 
-                    force_fetch {'bool'} -- if True, forces fetch from sources and overwrites json file if it exists.
+                    force_fetch {'bool'} -- if True, forces fetch from sources and overwrites the cached file if it exists.
                     (default: False)
 
+                    file_format {'str'} -- format of the cached file. Should be one of:
+
+                    * 'json': a single json document
+                    * 'parquet': a directory with columnar tables of values and attributes (requires pyarrow), faster to load
+                    * 'sharded': a directory with columnar tables per country and category and an index (requires
+                    pyarrow), only the shards selected by countries, categories and attributes are read
+                    * 'memmap': a directory with all values in a single memory-mapped float64 file, shared between
+                    processes through the page cache. Time series are views of the file, created when first needed
+
+                    By default, 'parquet' is used if the path ends with ".parquet", 'sharded' if it ends with ".shards",
+                    'memmap' if it ends with ".mmap" and 'json' otherwise.
+
+                    countries {str | List[str]} -- if given, only the data of these countries is loaded (see
+                    `filter_countries`).
+
+                    categories {str | List[str]} -- if given, only the data of these categories is loaded (see
+                    `filter_categories`).
+
+                    attributes {Tuple[str,str] | List[Tuple[str,str]]} -- if given, only these attributes are loaded
+                    (see `filter_attributes`). Each attribute is a tuple of a category and the attribute name.
+
+                    cache_dir {'str'} -- if given, raw downloads from sources are cached in this directory. When
+                    fetching again, sources are only downloaded and parsed if they changed (see
+                    sources.download_cache). Only used if fetch from sources occurs.
+
+                    engine {'str'} -- in-memory representation of the dataset. Should be one of:
+
+                    * 'dict': nested dictionaries of countries, categories and attributes, with VALUEs as pandas.Series
+                    (default)
+                    * 'columnar': typed arrays of all values and a table of attributes (see
+                    storage.columnar_store.ColumnarStore). Getters, filters, `resample` and `export` run as vectorized
+                    operations, and the dictionary is only created when needed, by `get` or by the other methods.
+                    From then on, the dataset uses the dictionary.
+
         Returns:
             `FAIRiskDataset` -- an instance of the FAIRiskDataset with loaded information
         """
+        file_format = get_file_format(json_file_path, file_format)
+        if engine not in ENGINES:
+            raise ValueError('Unknown engine %s' % engine)
+
+        # filter normalization and sanity check
+        if countries is not None and not isinstance(countries, list):
+            countries = [countries]
+        if categories is not None and not isinstance(categories, list):
+            categories = [categories]
+        if attributes is not None and not isinstance(attributes, list):
+            attributes = [attributes]
+
         if (not path.exists(json_file_path)) or force_fetch:
-            fetch_and_export(json_file_path=json_file_path, datasets_list=datasets_list)
+            fetch_and_export(json_file_path=json_file_path, datasets_list=datasets_list, file_format=file_format,
+                             cache_dir=cache_dir)
+
+        if engine == 'columnar':
+            return FAIRiskDataset._load_columnar(json_file_path, file_format, countries, categories, attributes)
+
+        # Columnar formats only read the selected data
+        if file_format == 'parquet':
+            return FAIRiskDataset._parse_time_indexes(
+                FAIRiskDataset(load_columnar(json_file_path, countries, categories, attributes)))
+        if file_format == 'sharded':
+            return FAIRiskDataset._parse_time_indexes(
+                FAIRiskDataset(load_sharded(json_file_path, countries, categories, attributes)))
+        if file_format == 'memmap':
+            return FAIRiskDataset(store=MemmapStore(json_file_path).select(countries, categories, attributes))
 
         with open(json_file_path) as f:
-            dataset = json.load(f)
-            for categories in dataset.values():
-                for attributes in categories.values():
-                    for attribute in attributes.values():
-                        if 'VALUE' in attribute and isinstance(attribute['VALUE'], dict):
-                            attribute['VALUE'] = pd.Series(attribute['VALUE'])
+            dataset = FAIRiskDataset(json.load(f))
+
+        # Filters are applied before creating the time series, so that discarded data is never converted
+        if countries is not None:
+            dataset.filter_countries(countries)
+        if categories is not None:
+            dataset.filter_categories(categories)
+        if attributes is not None:
+            dataset.filter_attributes(attributes)
+
+        for categories_val in dataset.dataset.values():
+            for attributes_val in categories_val.values():
+                for attribute in attributes_val.values():
+                    if 'VALUE' in attribute and isinstance(attribute['VALUE'], dict):
+                        attribute['VALUE'] = pd.Series(attribute['VALUE'])
+
+        return FAIRiskDataset._parse_time_indexes(dataset)
+
+    @staticmethod
+    def _parse_time_indexes(dataset):
+        # Time keys are parsed once, when loaded, and kept with each series index (see utils.time_index)
+        for categories_val in dataset.dataset.values():
+            for attributes_val in categories_val.values():
+                for attribute in attributes_val.values():
+                    if 'FREQUENCY' in attribute:
+                        get_time_index(attribute['VALUE'].index)
+
+        return dataset
+
+    @staticmethod
+    def _load_columnar(json_file_path, file_format, countries, categories, attributes):
+        if any(selection is not None and len(selection) == 0 for selection in (countries, categories, attributes)):
+            return FAIRiskDataset(store=ColumnarStore.from_dict(dict()))
 
-            return FAIRiskDataset(dataset)
+        # The parquet tables are already columnar, so the dictionary is never created
+        if file_format == 'parquet':
+            return FAIRiskDataset(store=ColumnarStore.from_frames(
+                *read_columnar(json_file_path, countries, categories, attributes)))
+
+        dataset = FAIRiskDataset.load(json_file_path, file_format=file_format, countries=countries,
+                                      categories=categories, attributes=attributes)
+        return FAIRiskDataset(store=ColumnarStore.from_dict(dataset.get()))
+
+    # VIEWS
+    def view(self):
+        """
+        Returns a view of the dataset: a new dataset whose filters select data instead of deleting it, sharing the
+        data of this one, which is not changed. The selected data is only copied when needed by another method (e.g.
+        `get` or `export`), so a single loaded dataset can serve many queries, as in
+        `dataset.view().filter_countries(...).filter_time_interval(...).export()`.
+        The data is shared with the 'columnar' engine (see `load`). With the 'dict' engine, the dataset is converted to
+        the columnar representation on each call.
+
+        Returns:
+            `FAIRiskDataset` -- the view.
+        """
+        if self._is_empty():
+            logger.warning('Dataset is empty. Please load and redo this operation.')
+            return FAIRiskDataset()
+
+        if isinstance(self._store, ColumnarView):
+            view = ColumnarView(self._store.store, self._store.selection)
+        elif self._columnar is not None:
+            self._columnar.shared = True
+            view = ColumnarView(self._columnar)
+        else:
+            view = ColumnarView(ColumnarStore.from_dict(self.dataset))
+
+        dataset_view = FAIRiskDataset(store=view)
+        dataset_view._age_groups_granularity = self._age_groups_granularity
+        dataset_view.indicatorsNormalized = self.indicatorsNormalized
+        dataset_view.scoresNormalized = self.scoresNormalized
+        return dataset_view
+
+    def lazy(self):
+        """
+        Returns a deferred version of the dataset, whose methods record a plan of operations which only runs on
+        `collect()` or `export()`, on a view of this dataset (see `view`). Filters of whole attributes are moved ahead
+        of the expensive operations that do not depend on them, e.g.
+        `dataset.lazy().resample('MONTHLY').filter_countries(['Portugal']).export('timeseries')` only resamples the
+        data of Portugal. `explain()` shows the optimized plan.
+
+        Returns:
+            `LazyFAIRiskDataset` -- the deferred dataset.
+        """
+        return LazyFAIRiskDataset(self)
 
     # GETTERS
     def get(self):
+        # the dictionary may be changed by the caller, so its index and missingness matrix are recreated when needed
+        self._data_changed()
         return self.dataset
 
-    def get_interval(self):
+    def get_interval(self, countries: Union[str, List[str], None] = None,
+                     categories: Union[str, List[str], None] = None):
         """
-        Defines the current interval represented in the dataset (considering all time series).
+        Defines the current interval represented in the dataset (considering all time series, or those of the given
+        countries and categories). The bounds of each time series are computed once and kept with it (see
+        `utils.time_index.TimeIndex.bounds`), so this is a reduction over them.
+
+        Arguments:
+            countries {str | List[str]} -- specifies a country or list of countries that will be considered.
+            categories {str | List[str]} -- specifies a category or list of categories that will be considered.
 
         Returns:
             `pandas.Interval` -- a pandas interval limited by the oldest and most recent dates available in the dataset.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return None
 
-        start, end = datetime.datetime.max, datetime.datetime.min
-        open_start, open_end = False, False
+        if countries is not None and not isinstance(countries, list):
+            countries = [countries]
+        if categories is not None and not isinstance(categories, list):
+            categories = [categories]
 
-        for country_val in self.dataset.values():
-            for category_val in country_val.values():
-                for attribute_val in category_val.values():
-                    if 'FREQUENCY' in attribute_val:  # indicates it is a timeseries
-                        t0 = safe_date_parse(attribute_val['VALUE'].index[0])
-                        tf = safe_date_parse(attribute_val['VALUE'].index[-1])
-                        open_t0 = False
-                        open_tf = False
-
-                        if isinstance(t0, pd.Interval):
-                            open_t0 = t0.open_left
-                            open_tf = tf.open_right
-                            t0 = t0.left
-                            tf = tf.right
-
-                        open_start = open_t0 if t0 < start else open_start
-                        start = t0 if t0 < start else start
-
-                        open_end = open_tf if tf > end else open_end
-                        end = tf if tf > end else end
-
-        if open_start and open_end:
-            closed_str = 'neither'
-        elif open_start:
-            closed_str = 'right'
-        elif open_end:
-            closed_str = 'left'
+        if isinstance(self._store, ColumnarView):
+            start, end = self._store.get_bounds(countries, categories)
+        elif self._columnar is not None:
+            start, end = self._columnar.get_bounds(countries, categories)
         else:
-            closed_str = 'both'
+            starts, ends = [], []
+            for country, country_val in self.dataset.items():
+                if countries is None or country in countries:
+                    for category, category_val in country_val.items():
+                        if categories is None or category in categories:
+                            for attribute_val in category_val.values():
+                                if 'FREQUENCY' in attribute_val:  # indicates it is a timeseries
+                                    series_start, series_end = get_time_index(attribute_val['VALUE'].index).bounds
+                                    starts.append(series_start)
+                                    ends.append(series_end)
+
+            starts, ends = np.array(starts, dtype='datetime64[ns]'), np.array(ends, dtype='datetime64[ns]')
+            valid = ~np.isnat(starts)
+            start, end = (starts[valid].min(), ends[valid].max()) if valid.any() else (None, None)
+
+        if start is None:
+            logger.warning('There are no time series to define an interval.')
+            return None
 
-        return pd.Interval(start, end, closed=closed_str)
+        # time keys are parsed as closed intervals (see utils.time_index)
+        return pd.Interval(pd.Timestamp(start), pd.Timestamp(end), closed='both')
 
     def get_countries(self):
         """
@@ -120,11 +367,11 @@ class FAIRiskDataset:
         Returns:
             `list` -- the list of countries
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return None
 
-        return list(self.dataset.keys())
+        return self._get_attribute_index().get_countries()
 
     def get_categories(self, countries: Union[str, List[str], None] = None):
         """
@@ -136,19 +383,14 @@ class FAIRiskDataset:
         Returns:
             `list[tuple]` -- a list of tuples with (country, category)
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return None
 
         if countries is not None and not isinstance(countries, list):
             countries = [countries]
 
-        cat_list = []
-        for country, dataCategories in self.dataset.items():
-            if countries is None or country in countries:
-                for dataCategory in dataCategories.keys():
-                    cat_list.append((country, dataCategory))
-        return cat_list
+        return self._get_attribute_index().get_categories(countries)
 
     def get_attributes(self, countries: Union[str, List[str], None] = None, categories: Union[str, List[str], None] = None):
         """
@@ -161,7 +403,7 @@ class FAIRiskDataset:
         Returns:
             `list[tuple]` -- a list of tuples of (country, category, attribute)
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return None
 
@@ -170,14 +412,47 @@ class FAIRiskDataset:
         if categories is not None and not isinstance(categories, list):
             categories = [categories]
 
-        attrs_list = []
-        for country, dataCategories in self.dataset.items():
-            if countries is None or country in countries:
-                for dataCategory, datasetCategoryEntries in dataCategories.items():
-                    if categories is None or dataCategory in categories:
-                        for parameter in datasetCategoryEntries.keys():
-                            attrs_list.append((country, dataCategory, parameter))
-        return attrs_list
+        return self._get_attribute_index().get_attributes(countries, categories)
+
+    def missingness_matrix(self):
+        """
+        Returns which attributes are missing for each country: those the country does not have or which have missing
+        values, as counted by the missing-value filters (e.g. `filter_countries_missing_value_attributes_below`).
+
+        Returns:
+            `pandas.DataFrame` -- a boolean matrix of countries (rows) by (category, attribute) (columns), True where
+            the attribute is missing.
+        """
+        if self._is_empty():
+            logger.warning('Dataset is empty. Please load and redo this operation.')
+            return None
+
+        return self._get_missingness().to_frame()
+
+    def age_cube(self, country: str, category: str = 'MORTALITY'):
+        """
+        Returns a copy of the attributes of a country and category with age groups (DEMOGRAPHIC or MORTALITY) as a
+        single age band x sex x time array, with the age groups parsed into numeric edges (see
+        `utils.age_cube.AgeCube`), e.g. to analyse or export the strata of a country together. The cube is created on
+        each call: the dataset keeps these attributes as they are, and `filter_age_group`, `resample_age_groups` and
+        `add_excess_mortality_estimation` work on the attributes, not on the cube.
+
+        Arguments:
+                    country {str} -- specifies the country.
+
+                    category {str} -- specifies the category (MORTALITY by default).
+
+        Returns:
+            `AgeCube` -- the cube, or None if the country has no attributes with age groups in the category.
+        """
+        if self._is_empty():
+            logger.warning('Dataset is empty. Please load and redo this operation.')
+            return None
+
+        if self._filterable is not None:
+            # only the attributes of the category are copied out of the store
+            return AgeCube.from_attributes(self._filterable.get_category(country, category))
+        return AgeCube.from_attributes(self.dataset.get(country, {}).get(category, {}))
 
     # FILTERS
     def filter_countries(self, countries: Union[str, List[str]]):
@@ -190,7 +465,7 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
@@ -198,11 +473,13 @@ class FAIRiskDataset:
         if not isinstance(countries, list):
             countries = [countries]
 
-        del_countries = []
-        for country in list(self.dataset.keys()):
-            if country not in countries:
-                del self.dataset[country]
-                del_countries.append(country)
+        if self._filterable is not None:
+            self._store = self._filterable.filter_countries(countries)
+            return self
+
+        kept = set(countries)
+        del_countries = [country for country in self.dataset.keys() if country not in kept]
+        self._remove_countries(del_countries)
 
         logger.debug(f'{del_countries} countries erased from the dataset.')
         logger.info(f'{len(del_countries)} countries erased from the dataset.')
@@ -219,7 +496,7 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
@@ -227,6 +504,10 @@ class FAIRiskDataset:
         if not isinstance(categories, list):
             categories = [categories]
 
+        if self._filterable is not None:
+            self._store = self._filterable.filter_categories(categories)
+            return self
+
         for country_val in self.dataset.values():
 
             for category in list(country_val.keys()):
@@ -248,7 +529,7 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
@@ -256,11 +537,14 @@ class FAIRiskDataset:
         if not isinstance(attributes, list):
             attributes = [attributes]
 
-        for country_val in self.dataset.values():
-            for category_key, category_val in country_val.items():
-                for attribute in list(category_val.keys()):
-                    if not any(attr for cat, attr in attributes if cat == category_key and attribute == attr):
-                        del category_val[attribute]
+        if self._filterable is not None:
+            self._store = self._filterable.filter_attributes(attributes)
+            return self
+
+        attribute_index = self._get_attribute_index()
+        for category, attribute in attribute_index.get_attribute_pairs() - set(map(tuple, attributes)):
+            for country in attribute_index.get_attribute_countries(category, attribute):
+                del self.dataset[country][category][attribute]
 
         self.dataset = self._clean_empty_entries(self.dataset)
 
@@ -276,38 +560,74 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
-        # filter normalization and sanity check
-        if isinstance(time_interval, pd.Period):
-            time_interval = pd.Interval(
-                time_interval.start_time, time_interval.end_time, closed='both')
-        time_interval = safe_interval_parse(time_interval)
-
-        def time_interval_validation(parsed):
-            if parsed is None or (isinstance(parsed, numbers.Number) and math.isnan(parsed)):
-                return False
+        time_interval = self._parse_time_interval(time_interval)
 
-            # year range like: 1984-2018
-            if isinstance(parsed, pd.Interval):
-                return time_interval.overlaps(parsed)
-
-            return parsed in time_interval
+        if self._filterable is not None:
+            self._store = self._filterable.filter_time_interval(time_interval)
+            return self
 
         for country_val in self.dataset.values():
             for category_val in country_val.values():
                 for attribute_val in category_val.values():
                     if 'FREQUENCY' in attribute_val:  # indicates it is a timeseries
-                        parsed = attribute_val['VALUE'].index.to_series().map(
-                            safe_date_parse).map(time_interval_validation)
-                        attribute_val['VALUE'] = attribute_val['VALUE'][parsed == True]
+                        # keys (including year ranges like 1984-2018) overlapping the interval are kept
+                        time_index = get_time_index(attribute_val['VALUE'].index)
+                        attribute_val['VALUE'] = self._select_keys(attribute_val['VALUE'], time_index,
+                                                                   time_index.select_overlapping(time_interval))
 
         self.dataset = self._clean_empty_entries(self.dataset)
 
         return self
 
+    def filter_time_intervals(self, time_intervals: List[Union[pd.Interval, pd.Period]]):
+        """
+        Filters the data by each of the time intervals at once (e.g. for rolling windows), as `filter_time_interval`.
+        The dataset is not changed: the time series of the resulting datasets share its data.
+
+        Arguments:
+                    time_intervals {List[pd.Interval | pd.Period]} -- the intervals or periods for which data will be filtered.
+
+        Returns:
+            `List[FAIRiskDataset]` -- the filtered dataset of each interval.
+        """
+        if self._is_empty():
+            logger.warning('Dataset is empty. Please load and redo this operation.')
+            return [FAIRiskDataset() for _ in time_intervals]
+
+        time_intervals = [self._parse_time_interval(time_interval) for time_interval in time_intervals]
+
+        if self._filterable is not None:
+            return [self.view().filter_time_interval(time_interval) for time_interval in time_intervals]
+
+        datasets = [dict() for _ in time_intervals]
+        for country, country_val in self.dataset.items():
+            for category, category_val in country_val.items():
+                for attribute, attribute_val in category_val.items():
+                    if 'FREQUENCY' in attribute_val:
+                        # the keys of all intervals are selected at once
+                        time_index = get_time_index(attribute_val['VALUE'].index)
+                        values = [self._select_keys(attribute_val['VALUE'], time_index, selected)
+                                  for selected in time_index.select_overlapping_all(time_intervals)]
+                    else:
+                        values = [copy.deepcopy(attribute_val['VALUE']) for _ in time_intervals]
+
+                    for dataset, value in zip(datasets, values):
+                        dataset.setdefault(country, dict()).setdefault(category, dict())[attribute] = \
+                            dict(attribute_val, VALUE=value)
+
+        filtered = []
+        for dataset in datasets:
+            filtered_dataset = FAIRiskDataset(self._clean_empty_entries(dataset))
+            filtered_dataset._age_groups_granularity = self._age_groups_granularity
+            filtered_dataset.indicatorsNormalized = self.indicatorsNormalized
+            filtered_dataset.scoresNormalized = self.scoresNormalized
+            filtered.append(filtered_dataset)
+        return filtered
+
     def filter_age_group(self, age_group: Tuple[Union[int, None], Union[int, None]]):
         """
         Filters the data of the specified age group. Data not pertaining age related information is maintained. The method changes the underlying data.
@@ -318,10 +638,14 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
+        if self._filterable is not None:
+            self._store = self._filterable.filter_age_group(age_group)
+            return self
+
         for country_val in self.dataset.values():
             for category_val in country_val.values():
                 for attribute_key in list(category_val.keys()):
@@ -348,19 +672,20 @@ class FAIRiskDataset:
         if not isinstance(attr_missing_values_country_filter, list):
             attr_missing_values_country_filter = [attr_missing_values_country_filter]
 
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
-        for country_key, country_val in list(self.dataset.items()):
-            if not all(category in country_val and
-                       attr in country_val[category] and not
-                       self._attr_has_missing_values(
-                           country_val[category][attr])
-                       for category, attr in attr_missing_values_country_filter):
-                logger.warning('%s has been erased as it contained missing values on at least one of the selected '
-                                'attributes.' % country_key)
-                del self.dataset[country_key]
+        if self._filterable is not None:
+            self._store = self._filterable.filter_countries_with_missing_values_on_attributes(
+                attr_missing_values_country_filter)
+            return self
+
+        erased = self._get_missingness().get_countries_missing_any(attr_missing_values_country_filter)
+        for country_key in erased:
+            logger.warning('%s has been erased as it contained missing values on at least one of the selected '
+                            'attributes.' % country_key)
+        self._remove_countries(erased)
 
         return self
 
@@ -374,30 +699,20 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
-        all_attrs = {(category, attribute) for categories in self.dataset.values(
-        ) for category, category_vals in categories.items() for attribute in category_vals.keys()}
-
-        def country_surpasses_missing_values_attributes(country_val):
-            count = 0
-            for category, attr in all_attrs:
-                if category not in country_val or (
-                    not attr in country_val[category]) or (
-                        self._attr_has_missing_values(country_val[category][attr])):
-                    count += 1
-                    if count > attr_count_missing_values_country_filter:
-                        return True
-
-            return False
+        if self._filterable is not None:
+            self._store = self._filterable.filter_countries_missing_value_attributes_below(
+                attr_count_missing_values_country_filter)
+            return self
 
-        for country_key, country_val in list(self.dataset.items()):
-            if country_surpasses_missing_values_attributes(country_val):
-                logger.warning('%s has be erased as it contained more than %d missing attributes.' % (
-                    country_key, attr_count_missing_values_country_filter))
-                del self.dataset[country_key]
+        erased = self._get_missingness().get_countries_missing_above(attr_count_missing_values_country_filter)
+        for country_key in erased:
+            logger.warning('%s has be erased as it contained more than %d missing attributes.' % (
+                country_key, attr_count_missing_values_country_filter))
+        self._remove_countries(erased)
 
         return self
 
@@ -411,42 +726,37 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning(
                 'Dataset is empty. Please load and redo this operation.')
             return self
 
-        all_attrs = {(category, attribute) for categories in self.dataset.values(
-        ) for category, category_vals in categories.items() for attribute in category_vals.keys()}
-
-        def number_of_countries_with_missing_values(attribute):
-            category, attr = attribute
-            count = 0
-
-            for country_val in self.dataset.values():
-                if category not in country_val or (
-                    not attr in country_val[category]) or (
-                        self._attr_has_missing_values(country_val[category][attr])):
-                    count += 1
-
-            return count
+        if self._filterable is not None:
+            self._store = self._filterable.filter_attributes_with_countries_nan_below(
+                country_count_missing_values_attribute_filter)
+            return self
 
-        attributes_to_remove = [attribute for attribute in all_attrs if number_of_countries_with_missing_values(
-            attribute) > country_count_missing_values_attribute_filter]
+        missingness = self._get_missingness()
+        attributes_to_remove = missingness.get_attributes_missing_above(country_count_missing_values_attribute_filter)
 
         logger.debug(
             f'Removing {len(attributes_to_remove)} for having a number of countries with missing values above {country_count_missing_values_attribute_filter}')
 
-        for country_val in self.dataset.values():
-            for category, attr in attributes_to_remove:
-                if category in country_val and attr in country_val[category]:
-                    del country_val[category][attr]
+        attribute_index = self._get_attribute_index()
+        for category, attr in attributes_to_remove:
+            for country in list(attribute_index.get_attribute_countries(category, attr)):
+                del self.dataset[country][category][attr]
+                attribute_index.remove_attribute(country, category, attr)
+        self._missingness = missingness.drop_attributes(attributes_to_remove)
 
         return self
 
     # RESAMPLERS
     def resample(self,
-                 frequency: str = 'WEEKLY'):
+                 frequency: str = 'WEEKLY',
+                 time_interval: pd.Interval = None,
+                 exact_totals: bool = False,
+                 max_processes: int = 1):
         """
         Resamples all time series of categories Mortality, COVID and Mobility in a consistent way. The method changes the underlying data.
 
@@ -458,61 +768,96 @@ class FAIRiskDataset:
                     * 'MONTHLY': time series data organized in months (mm-yyyy)
                     * 'YEARLY': time series data organized in years (yyyy)
 
+                    time_interval {pd.Interval} -- specifies the interval covered by the resampled time series. By
+                    default, the interval of the dataset (see `get_interval`).
+
+                    exact_totals {bool} -- when time series are resampled to a higher frequency, NEW and TOTAL values
+                    are spread over the days of their periods. By default, as fractions; if True, in whole units, so
+                    the new periods add up exactly to the original values.
+
+                    max_processes {int} -- if greater than 1, countries are distributed over a pool of processes, which
+                    receive their time series through shared memory. The result is the same as with a single process.
+
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
-        time_interval = self.get_interval()
+        if time_interval is None:
+            time_interval = self.get_interval()
+            if time_interval is None:
+                return self
 
-        resampler = Resampler(time_interval, frequency)
+        resampler = Resampler(time_interval, frequency, exact_totals)
 
-        for country_val in self.dataset.values():
-            for category_val in country_val.values():
-                for attribute_val in category_val.values():
-                    if 'FREQUENCY' in attribute_val:  # indicates it is a timeseries
-                        if attribute_val['FREQUENCY'] != 'UNDEFINED':
-                            attribute_val['VALUE'] = resampler.resample(attribute_val['VALUE'],
-                                                                        attribute_val['FREQUENCY'],
-                                                                        attribute_val['SERIES_TYPE'])
-                            attribute_val['FREQUENCY'] = frequency
+        if self._columnar is not None:
+            self._store = self._columnar.resample(resampler, frequency, max_processes)
+            return self
+
+        # series with the same keys (e.g. the weekly mortality series of all countries) are resampled at once
+        resampled = [(country, attribute_val)
+                     for country, country_val in self.dataset.items()
+                     for category_val in country_val.values()
+                     for attribute_val in category_val.values()
+                     if 'FREQUENCY' in attribute_val and attribute_val['FREQUENCY'] != 'UNDEFINED']
+        new_series = resampler.resample_all([attribute_val['VALUE'] for _, attribute_val in resampled],
+                                            [attribute_val['FREQUENCY'] for _, attribute_val in resampled],
+                                            [attribute_val['SERIES_TYPE'] for _, attribute_val in resampled],
+                                            partitions=[country for country, _ in resampled],
+                                            max_processes=max_processes)
+        for (_, attribute_val), time_series in zip(resampled, new_series):
+            attribute_val['VALUE'] = time_series
+            attribute_val['FREQUENCY'] = frequency
+        # missing values of the resampled time series
+        self._data_changed()
 
         return self
 
     def resample_age_groups(self,
-                            granularity: str = 'HIGH'):
+                            granularity: Union[str, List[int]] = 'HIGH',
+                            max_processes: int = 1):
         """
         Resamples all time series of categories Demographic and Mortality into new age groups. The method changes the underlying data.
 
         Arguments:
-                    granularity {str} -- specifies the target age granularity for all time series. Should be one of:
+                    granularity {str | List[int]} -- specifies the target age granularity for all time series. Should
+                    be one of:
 
                     * 'LOW': time series data organized into a single age group (Total)
                     * 'MEDIUM': time series data organized into three age groups (-14, 15-64, 65+)
                     * 'HIGH': time series data organized into five age groups (-14, 15-64, 65-74, 75-84, 85+)
 
+                    or the lower ages of the groups after the first one, e.g. [15, 65] for MEDIUM or [18, 50, 70] for
+                    the groups -17, 18-49, 50-69 and 70+. Groups can only be merged, so the edges should be some of the
+                    edges of the current groups.
+
+                    max_processes {int} -- if greater than 1, countries are distributed over a pool of processes (see
+                    `resample`).
+
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
-        if self._age_groups_granularity == granularity:
+        edges = AgeResampler.get_edges(granularity)
+        current_edges = None if self._age_groups_granularity is None else \
+            AgeResampler.get_edges(self._age_groups_granularity)
+        if current_edges == edges:
             return self
 
-        if (self._age_groups_granularity is None) or (self._age_groups_granularity == 'HIGH') or \
-                (self._age_groups_granularity == 'MEDIUM' and granularity == 'LOW'):
-
-            for country_val in self.dataset.values():
+        if current_edges is None or set(edges) <= set(current_edges):
 
-                for category_name, category_val in country_val.items():
-                    if category_name in ['DEMOGRAPHIC', 'MORTALITY']:
-                        # Each resampler will deal with one category
-                        age_resampler = AgeResampler(granularity)
-                        country_val[category_name] = age_resampler.resample(category_val)
+            # Each country is resampled category by category
+            resampled = AgeResampler(granularity).resample_countries(
+                {country: {category_name: category_val for category_name, category_val in country_val.items()
+                           if category_name in ['DEMOGRAPHIC', 'MORTALITY']}
+                 for country, country_val in self.dataset.items()}, max_processes)
+            for country, categories in resampled.items():
+                self.dataset[country].update(categories)
 
             self.dataset = self._clean_empty_entries(self.dataset)
             self._age_groups_granularity = granularity
@@ -531,7 +876,7 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset`.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
@@ -552,7 +897,7 @@ class FAIRiskDataset:
         Returns:
             `FAIRiskDataset`.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
@@ -570,7 +915,10 @@ class FAIRiskDataset:
     def add_excess_mortality_estimation(self,
                                         age_resampling_granularity: str = 'HIGH',
                                         time_interval: Union[pd.Interval, pd.Period] =
-                                        pd.Interval(pd.Timestamp('01-01-2020'), pd.Timestamp('31-12-2021'))):
+                                        pd.Interval(pd.Timestamp('01-01-2020'), pd.Timestamp('31-12-2021')),
+                                        max_processes: int = 1,
+                                        baseline_models: List[Union[str, BaselineModel]] = None,
+                                        prediction_intervals: bool = False):
 
         """
         Compute and add excess mortality estimation (P-score, Absolute) to MORTALITY category of FAIRiskDataset.
@@ -588,11 +936,29 @@ class FAIRiskDataset:
                     time_interval {pd.Interval | pd.Period} -- specifies the time interval for which excess mortality
                     should be calculated.
 
+                    max_processes {int} -- if greater than 1, countries are distributed over a pool of processes (see
+                    `resample`).
+
+                    baseline_models {List[str | BaselineModel]} -- models of the expected mortality, each fitted on all
+                    the series at once (see modelling.baseline_models). Should be some of:
+
+                    * 'mean': mean of the same period of the 5 previous years (default)
+                    * 'trend': linear trend of the 5 previous years
+                    * 'serfling': linear trend with yearly and half-yearly harmonics
+                    * 'quantile': median of the same period of the 5 previous years
+
+                    Attributes of models other than 'mean' have the model in their name (e.g.
+                    'ExcessSerflingAbs_Total_Total').
+
+                    prediction_intervals {bool} -- whether to also add the baseline and the bounds of its 95%
+                    prediction interval (e.g. 'ExcessBaseline_Total_Total', 'ExcessLower_Total_Total' and
+                    'ExcessUpper_Total_Total').
+
         Returns:
             `FAIRiskDataset` -- returns self to allow multiple calls in chain.
 
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return self
 
@@ -602,16 +968,20 @@ class FAIRiskDataset:
                 time_interval.start_time, time_interval.end_time, closed='both')
         time_interval = safe_interval_parse(time_interval)
 
-        self.resample_age_groups(age_resampling_granularity)
+        self.resample_age_groups(age_resampling_granularity, max_processes)
 
-        e = ExcessMortality()
+        # the excess mortality of all countries and age groups is estimated at once
+        mortality_dicts = dict()
         for country_name, country_val in self.dataset.items():
             if 'MORTALITY' in country_val.keys():
-                country_val['MORTALITY'] = e.compute_and_add_to_mortality_dict(country_val['MORTALITY'],
-                                                                               time_interval=time_interval)
+                mortality_dicts[country_name] = country_val['MORTALITY']
             else:
                 logger.warning(
                     'Not possible to compute excess mortality for %s. Missing MORTALITY category.' % country_name)
+        ExcessMortality(baseline_models, prediction_intervals).compute_and_add_to_mortality_dicts(
+            mortality_dicts, time_interval, max_processes)
+        # the MORTALITY attributes changed
+        self._data_changed()
 
         return self
 
@@ -631,10 +1001,19 @@ class FAIRiskDataset:
         Returns:
             `pandas.DataFrame` -- a pandas Dataframe with selected information.
         """
-        if not self.dataset:
+        if self._is_empty():
             logger.warning('Dataset is empty. Please load and redo this operation.')
             return None
 
+        if self._columnar is not None:
+            if type == 'parameters':
+                return self._columnar.export_parameters(column_separator)
+            elif type == 'all':
+                return self._columnar.export_all()
+            elif type == 'timeseries':
+                return self._columnar.export_timeseries(column_separator)
+            return None
+
         if type == 'parameters':
             return pd.DataFrame([
                 {
@@ -668,18 +1047,19 @@ class FAIRiskDataset:
                 for attribute_key, value in attribute_val['VALUE'].items()
             ])
         elif type == "timeseries":
-            # get all different timestamp keys
-            all_timestamps = {attribute_key
-                              for country_val in self.dataset.values()
-                              for category_val in country_val.values()
-                              for attribute_val in category_val.values()
-                              if 'FREQUENCY' in attribute_val
-                              for attribute_key in attribute_val['VALUE'].keys()}
+            # get all different timestamp keys, with their parsed start
+            all_timestamps = dict()
+            for country_val in self.dataset.values():
+                for category_val in country_val.values():
+                    for attribute_val in category_val.values():
+                        if 'FREQUENCY' in attribute_val:
+                            time_index = get_time_index(attribute_val['VALUE'].index)
+                            all_timestamps.update(zip(time_index.labels, time_index.sortable()))
             return pd.DataFrame([
                 {
                     'country': country,
                     'timestamp': timestamp,
-                    'parsed_timestamp': safe_sortable_date_parse(timestamp),
+                    'parsed_timestamp': all_timestamps[timestamp],
                     **{
                         column_separator.join(
                             [category, attribute]): attribute_val['VALUE'][timestamp]
@@ -715,6 +1095,21 @@ class FAIRiskDataset:
 
         return False
 
+    @staticmethod
+    def _parse_time_interval(time_interval):
+        # filter normalization and sanity check
+        if isinstance(time_interval, pd.Period):
+            time_interval = pd.Interval(
+                time_interval.start_time, time_interval.end_time, closed='both')
+        return safe_interval_parse(time_interval)
+
+    @staticmethod
+    def _select_keys(series, time_index, selected):
+        # selected keys of a time series: a slice of the series (which shares its data) if the keys are sorted
+        selected_series = series.iloc[selected]
+        set_time_index(selected_series.index, time_index.take(selected))
+        return selected_series
+
     @staticmethod
     def _clean_empty_entries(dataset: dict):
         country_empty = []
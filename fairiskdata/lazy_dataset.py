@@ -0,0 +1,228 @@
+from typing import List, Tuple, Union
+import pandas as pd
+
+from fairiskdata.modelling.baseline_models import BaselineModel
+
+ENTRY_FILTERS = ['filter_countries', 'filter_categories', 'filter_attributes', 'filter_age_group']
+""" Filters which select whole attributes, by their country, category or name, without looking at their data. """
+FILTERS = ENTRY_FILTERS + ['filter_time_interval', 'filter_countries_with_missing_values_on_attributes',
+                           'filter_countries_missing_value_attributes_below',
+                           'filter_attributes_with_countries_nan_below']
+EXPENSIVE_OPERATIONS = ['resample', 'resample_age_groups', 'add_excess_mortality_estimation']
+
+
+class Operation:
+    """
+    A recorded call of a `FAIRiskDataset` method.
+    """
+
+    def __init__(self, name: str, *args, **kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        # set by the optimizer: the operation the filter was pushed ahead of, and the interval captured for a resample
+        self.pushed_ahead_of = None
+        self.captured_interval = None
+
+    def __str__(self):
+        # arguments left to their default (None, False or a single process) are not shown
+        arguments = [repr(arg) for arg in self.args] + \
+            ['%s=%r' % (name, value) for name, value in self.kwargs.items()
+             if value is not None and value is not False and not (name == 'max_processes' and value == 1)]
+        return '%s(%s)' % (self.name, ', '.join(arguments))
+
+    def _argument(self, position, name, default=None):
+        if len(self.args) > position:
+            return self.args[position]
+        return self.kwargs.get(name, default)
+
+    def can_move_ahead_of(self, other):
+        """
+        Whether this operation, a filter of whole attributes, gives the same data when run before `other`.
+        """
+        if other.name == 'filter_time_interval' or other.name == 'resample':
+            # time series are resampled one by one (the interval of the dataset is captured, see `LazyFAIRiskDataset`)
+            return True
+        if other.name == 'resample_age_groups':
+            # age groups are resampled within each country and category
+            return self.name in ['filter_countries', 'filter_categories']
+        if other.name == 'add_excess_mortality_estimation':
+            # excess mortality is estimated for each country from its MORTALITY category
+            categories = self._argument(0, 'categories')
+            return self.name == 'filter_countries' or (self.name == 'filter_categories' and 'MORTALITY' in (
+                categories if isinstance(categories, list) else [categories]))
+        return False
+
+
+class CaptureInterval:
+    """
+    Step of an optimized plan which keeps the interval of the dataset for a resample run after filters pushed ahead
+    of it (see `FAIRiskDataset.resample`).
+    """
+
+    def __init__(self, resample: Operation):
+        self.name = 'capture_interval'
+        self.resample = resample
+
+    def __str__(self):
+        return 'capture_interval() -- for %s' % self.resample
+
+
+class LazyFAIRiskDataset:
+    """
+    Deferred version of a `FAIRiskDataset`, created by `FAIRiskDataset.lazy`. Its methods record the operations as a
+    plan, which only runs on `collect` or `export`, on a view of the dataset (which is not changed, see
+    `FAIRiskDataset.view`).
+
+    Before running, the plan is optimized: filters of whole attributes (countries, categories, attributes and age
+    groups) are moved ahead of the expensive operations they do not depend on (`resample`, `resample_age_groups` and
+    `add_excess_mortality_estimation`), so these run on less data, and consecutive filters narrow a single selection
+    of the data, which is copied once. `explain` shows the optimized plan.
+    """
+
+    def __init__(self, dataset):
+        self._dataset = dataset
+        self._operations = []
+
+    def _record(self, name, *args, **kwargs):
+        self._operations.append(Operation(name, *args, **kwargs))
+        return self
+
+    # FILTERS (see the corresponding methods of FAIRiskDataset)
+    def filter_countries(self, countries: Union[str, List[str]]):
+        return self._record('filter_countries', countries)
+
+    def filter_categories(self, categories: Union[str, List[str]]):
+        return self._record('filter_categories', categories)
+
+    def filter_attributes(self, attributes: Union[Tuple[str, str], List[Tuple[str, str]]]):
+        return self._record('filter_attributes', attributes)
+
+    def filter_time_interval(self, time_interval: Union[pd.Interval, pd.Period]):
+        return self._record('filter_time_interval', time_interval)
+
+    def filter_age_group(self, age_group: Tuple[Union[int, None], Union[int, None]]):
+        return self._record('filter_age_group', age_group)
+
+    def filter_countries_with_missing_values_on_attributes(self, attr_missing_values_country_filter):
+        return self._record('filter_countries_with_missing_values_on_attributes', attr_missing_values_country_filter)
+
+    def filter_countries_missing_value_attributes_below(self, attr_count_missing_values_country_filter: int):
+        return self._record('filter_countries_missing_value_attributes_below', attr_count_missing_values_country_filter)
+
+    def filter_attributes_with_countries_nan_below(self, country_count_missing_values_attribute_filter: int):
+        return self._record('filter_attributes_with_countries_nan_below',
+                            country_count_missing_values_attribute_filter)
+
+    # RESAMPLERS, NORMALIZERS AND EXCESS MORTALITY
+    def resample(self, frequency: str = 'WEEKLY', time_interval: pd.Interval = None, exact_totals: bool = False,
+                 max_processes: int = 1):
+        return self._record('resample', frequency, time_interval=time_interval, exact_totals=exact_totals,
+                            max_processes=max_processes)
+
+    def resample_age_groups(self, granularity: Union[str, List[int]] = 'HIGH', max_processes: int = 1):
+        return self._record('resample_age_groups', granularity, max_processes=max_processes)
+
+    def normalize_scores(self):
+        return self._record('normalize_scores')
+
+    def normalize_indicators(self):
+        return self._record('normalize_indicators')
+
+    def add_excess_mortality_estimation(self, age_resampling_granularity: str = 'HIGH',
+                                        time_interval: Union[pd.Interval, pd.Period] =
+                                        pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-12-31')),
+                                        max_processes: int = 1, baseline_models: List[Union[str, BaselineModel]] = None,
+                                        prediction_intervals: bool = False):
+        return self._record('add_excess_mortality_estimation', age_resampling_granularity, time_interval=time_interval,
+                            max_processes=max_processes, baseline_models=baseline_models,
+                            prediction_intervals=prediction_intervals)
+
+    # PLAN
+    def _optimize(self):
+        """
+        :return: List[Operation | CaptureInterval] -- the steps of the optimized plan
+        """
+        steps = []
+        for operation in self._operations:
+            operation.pushed_ahead_of, operation.captured_interval = None, None
+
+            position = target = len(steps)
+            if operation.name in ENTRY_FILTERS:
+                while position > 0 and isinstance(steps[position - 1], Operation) and \
+                        operation.can_move_ahead_of(steps[position - 1]):
+                    position -= 1
+                    if steps[position].name in EXPENSIVE_OPERATIONS:
+                        target = position
+                        operation.pushed_ahead_of = steps[position]
+                    if steps[position].name == 'resample':
+                        # the interval of the resample is the one before this filter, which changes it
+                        break
+
+            ahead_of = operation.pushed_ahead_of
+            if ahead_of is not None and ahead_of.name == 'resample' and ahead_of.captured_interval is None and \
+                    ahead_of.kwargs.get('time_interval') is None:
+                ahead_of.captured_interval = CaptureInterval(ahead_of)
+                steps.insert(target, ahead_of.captured_interval)
+                target += 1
+            steps.insert(target, operation)
+
+        return steps
+
+    def explain(self):
+        """
+        Prints the optimized plan: consecutive filters run as a single step, on a selection of the data.
+
+        Returns:
+            `str` -- the printed plan.
+        """
+        lines = ['Optimized plan (%d operations recorded):' % len(self._operations),
+                 '  view of the dataset']
+        previous_filter = False
+        for step in self._optimize():
+            is_filter = step.name in FILTERS
+            description = str(step)
+            if isinstance(step, Operation) and step.pushed_ahead_of is not None:
+                description += ' -- pushed ahead of %s' % step.pushed_ahead_of
+            if step.name == 'resample' and step.captured_interval is not None:
+                description += ' -- over the captured interval'
+
+            if is_filter and previous_filter:
+                lines.append('    + ' + description)
+            elif is_filter:
+                lines.append('  select: ' + description)
+            else:
+                lines.append('  ' + description)
+            previous_filter = is_filter
+
+        plan = '\n'.join(lines)
+        print(plan)
+        return plan
+
+    def collect(self):
+        """
+        Runs the optimized plan on a view of the dataset.
+
+        Returns:
+            `FAIRiskDataset` -- the resulting dataset.
+        """
+        dataset = self._dataset.view()
+        intervals = dict()
+        for step in self._optimize():
+            if isinstance(step, CaptureInterval):
+                intervals[id(step.resample)] = dataset.get_interval()
+            elif step.name == 'resample' and step.captured_interval is not None:
+                if intervals[id(step)] is not None:
+                    dataset.resample(step.args[0], time_interval=intervals[id(step)],
+                                     exact_totals=step.kwargs['exact_totals'],
+                                     max_processes=step.kwargs['max_processes'])
+            else:
+                getattr(dataset, step.name)(*step.args, **step.kwargs)
+
+        return dataset
+
+    def export(self, type: str = 'parameters', column_separator=':'):
+        """
+        Runs the plan (see `collect`) and exports the resulting dataset (see `FAIRiskDataset.export`).
+        """
+        return self.collect().export(type, column_separator)
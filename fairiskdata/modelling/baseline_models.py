@@ -0,0 +1,183 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+
+class BaselineModel:
+    """
+    Model of the expected mortality of the keys of some target years, fitted on the keys of previous years (see
+    `ExcessMortality`). Models fit all the series of a (series x key) matrix at once, and estimate a baseline and the
+    bounds of a prediction interval for each series and target key.
+    """
+
+    # prefix of the names of the attributes of the model (e.g. 'ExcessTrendAbs_Total_Total')
+    name = ''
+
+    def fit_predict(self, values: np.ndarray, times: np.ndarray, periods: np.ndarray, baseline_columns: np.ndarray,
+                    target_columns: np.ndarray, level: float):
+        """
+        :param values: numpy.ndarray -- (series x key) matrix of mortality, NaN where missing
+        :param times: numpy.ndarray -- time of each key, in years (e.g. 2019.5)
+        :param periods: numpy.ndarray -- period of the year of each key (e.g. its week), NaN if unknown
+        :param baseline_columns: numpy.ndarray -- the keys on which the model is fitted
+        :param target_columns: numpy.ndarray -- the keys whose baseline is estimated
+        :param level: float -- of the prediction intervals (e.g. 0.95)
+        :return: (numpy.ndarray, numpy.ndarray, numpy.ndarray) -- (series x target key) matrices of the baseline and
+        of the lower and upper bounds of its prediction interval
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def _gather_periods(values, periods, baseline_columns, target_columns):
+        # (series x period x year) values of the baseline keys of each period, padded with NaN, and the position of the
+        # period of each target key (-1 if the baseline has no key of that period)
+        period_codes, unique_periods = pd.factorize(periods[baseline_columns])
+        known = period_codes >= 0
+        period_codes, columns = period_codes[known], baseline_columns[known]
+
+        order = np.argsort(period_codes, kind='stable')
+        period_codes, columns = period_codes[order], columns[order]
+        sizes = np.bincount(period_codes, minlength=len(unique_periods))
+        ranks = np.arange(len(period_codes)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        # the padding refers to the last column of values, which is always missing
+        gather = np.full((len(unique_periods), sizes.max(initial=0)), values.shape[1] - 1)
+        gather[period_codes, ranks] = columns
+
+        return values[:, gather], pd.Index(unique_periods).get_indexer(periods[target_columns])
+
+    @staticmethod
+    def _take_periods(estimates, positions):
+        # (series x target key) estimates of the period of each target key
+        taken = estimates[:, np.maximum(positions, 0)] if estimates.shape[1] else \
+            np.full((len(estimates), len(positions)), np.nan)
+        taken[:, positions < 0] = np.nan
+        return taken
+
+
+class MeanBaseline(BaselineModel):
+    """
+    Mean of the same period (e.g. week) of the previous years. The prediction interval assumes normal errors, with the
+    variance of the values of the series around the means of their periods.
+    """
+
+    def fit_predict(self, values, times, periods, baseline_columns, target_columns, level):
+        stacked, positions = self._gather_periods(values, periods, baseline_columns, target_columns)
+        counts = (~np.isnan(stacked)).sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.nansum(stacked, axis=2) / counts
+            degrees = counts.sum(axis=1) - (counts > 0).sum(axis=1)
+            variances = np.nansum((stacked - means[:, :, None]) ** 2, axis=(1, 2)) / degrees
+            errors = np.sqrt(variances[:, None] * (1 + 1 / counts))
+
+        baseline = self._take_periods(means, positions)
+        margin = NormalDist().inv_cdf((1 + level) / 2) * self._take_periods(errors, positions)
+        return baseline, baseline - margin, baseline + margin
+
+
+class QuantileBaseline(BaselineModel):
+    """
+    Median of the same period (e.g. week) of the previous years. The prediction interval does not assume normal errors:
+    its bounds are the empirical quantiles of the errors of the median out of sample (each value of the previous years
+    against the median of the other years of its period), pooled over all the periods of the series.
+    """
+
+    name = 'Quantile'
+
+    def fit_predict(self, values, times, periods, baseline_columns, target_columns, level):
+        stacked, positions = self._gather_periods(values, periods, baseline_columns, target_columns)
+        medians = self._quantiles(stacked, [0.5])[0]
+
+        years = stacked.shape[2]
+        errors = np.stack([stacked[:, :, year] - self._quantiles(np.delete(stacked, year, axis=2), [0.5])[0]
+                           for year in range(years)], axis=2) if years else stacked
+        lower, upper = self._quantiles(errors.reshape(len(errors), -1), [(1 - level) / 2, (1 + level) / 2])
+
+        baseline = self._take_periods(medians, positions)
+        return baseline, baseline + lower[:, None], baseline + upper[:, None]
+
+    @staticmethod
+    def _quantiles(values, quantiles):
+        # quantiles of the last axis without its missing values, NaN if all are missing (the linear interpolation of
+        # numpy.nanquantile, which is much slower along an axis)
+        if not values.shape[-1]:
+            return [np.full(values.shape[:-1], np.nan) for _ in quantiles]
+
+        ordered = np.sort(values, axis=-1)
+        last = np.maximum((~np.isnan(ordered)).sum(axis=-1, keepdims=True) - 1, 0)
+        estimates = []
+        for quantile in quantiles:
+            rank = quantile * last
+            below = np.floor(rank).astype(int)
+            low = np.take_along_axis(ordered, below, axis=-1)
+            high = np.take_along_axis(ordered, np.minimum(below + 1, last), axis=-1)
+            estimates.append((low + (high - low) * (rank - below))[..., 0])
+        return estimates
+
+
+class RegressionBaseline(BaselineModel):
+    """
+    Linear regression on time, with `harmonics` pairs of sine and cosine terms of periods of 1, 1/2, ... years (a
+    Serfling model; a linear trend without them). All the series with the same missing keys are fitted with one least
+    squares solve (one design matrix, many right-hand sides). The prediction interval assumes normal errors.
+    """
+
+    def __init__(self, harmonics: int = 0, name: str = None):
+        self.harmonics = harmonics
+        self.name = name if name is not None else ('Serfling' if harmonics else 'Trend')
+
+    def _design(self, times, origin):
+        columns = [np.ones(len(times)), times - origin]
+        for harmonic in range(1, self.harmonics + 1):
+            columns += [np.sin(2 * np.pi * harmonic * times), np.cos(2 * np.pi * harmonic * times)]
+        return np.stack(columns, axis=1)
+
+    def fit_predict(self, values, times, periods, baseline_columns, target_columns, level):
+        baseline_columns = baseline_columns[~np.isnan(times[baseline_columns])]
+        origin = times[baseline_columns].mean() if len(baseline_columns) else 0
+        design, target_design = self._design(times[baseline_columns], origin), self._design(times[target_columns], origin)
+        z = NormalDist().inv_cdf((1 + level) / 2)
+
+        baseline, lower, upper = (np.full((len(values), len(target_columns)), np.nan) for _ in range(3))
+        observed = values[:, baseline_columns]
+        present = ~np.isnan(observed)
+        patterns, series_patterns = np.unique(present, axis=0, return_inverse=True)
+        for pattern, mask in enumerate(patterns):
+            series = np.flatnonzero(series_patterns.reshape(-1) == pattern)
+            pattern_design = design[mask]
+            degrees = len(pattern_design) - design.shape[1]
+            if degrees <= 0 or np.linalg.matrix_rank(pattern_design) < design.shape[1]:
+                continue
+
+            coefficients = np.linalg.lstsq(pattern_design, observed[series][:, mask].T, rcond=None)[0]
+            residuals = observed[series][:, mask] - (pattern_design @ coefficients).T
+            variances = (residuals ** 2).sum(axis=1) / degrees
+            leverages = np.einsum('ij,jk,ik->i', target_design, np.linalg.inv(pattern_design.T @ pattern_design),
+                                  target_design)
+
+            baseline[series] = (target_design @ coefficients).T
+            margin = z * np.sqrt(variances[:, None] * (1 + leverages))
+            lower[series], upper[series] = baseline[series] - margin, baseline[series] + margin
+
+        return baseline, lower, upper
+
+
+BASELINE_MODELS = {
+    'mean': MeanBaseline,
+    'quantile': QuantileBaseline,
+    'trend': lambda: RegressionBaseline(harmonics=0),
+    'serfling': lambda: RegressionBaseline(harmonics=2),
+}
+""" The baseline models of excess mortality, by name (see `FAIRiskDataset.add_excess_mortality_estimation`). """
+
+
+def get_baseline_model(model):
+    """
+    :param model: str | BaselineModel -- a model or the name of one (see `BASELINE_MODELS`)
+    :return: BaselineModel
+    """
+    if isinstance(model, BaselineModel):
+        return model
+    if model not in BASELINE_MODELS:
+        raise ValueError('Unknown baseline model %s' % model)
+    return BASELINE_MODELS[model]()
@@ -1,18 +1,38 @@
 from fairiskdata.sources import *
-from typing import Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Union
 import pandas as pd
 import numpy as np
-import numbers
-import math
 
 import logging
 logger = logging.getLogger('fairisk')
 
-from fairiskdata.utils.time_parsers import safe_date_parse
+from fairiskdata.modelling.baseline_models import BaselineModel, get_baseline_model
+from fairiskdata.utils.age_cube import union_time_keys
+from fairiskdata.utils.shared_objects import SharedObject, distribute
+from fairiskdata.utils.time_index import get_time_index
 
 
 class ExcessMortality:
 
+    # number of data points of at least 2 previous years needed to estimate a baseline
+    MIN_BASELINE_LENGTH = {DAILY_STR: 2 * 365, WEEKLY_STR: 2 * 52, MONTHLY_STR: 2 * 12, YEARLY_STR: 2}
+
+    def __init__(self, baseline_models: List[Union[str, BaselineModel]] = None, prediction_intervals: bool = False,
+                 level: float = 0.95):
+        """
+        :param baseline_models: List[str | BaselineModel] -- the models of the baseline (see
+        baseline_models.BASELINE_MODELS), the mean of the same period of previous years by default
+        :param prediction_intervals: bool -- whether to add the baseline and the bounds of its prediction interval
+        :param level: float -- of the prediction intervals
+        """
+        self.baseline_models = [get_baseline_model(model) for model in (baseline_models or ['mean'])]
+        names = [model.name for model in self.baseline_models]
+        if len(set(names)) < len(names):
+            raise ValueError('Baseline models should have different names: %s' % names)
+        self.prediction_intervals = prediction_intervals
+        self.level = level
+
     def compute_and_add_to_mortality_dict(self, mortality_dict, time_interval: pd.Interval):
         """
         Estimate different types of excess mortality and add them to the original mortality dictionary.
@@ -20,143 +40,252 @@ class ExcessMortality:
         :param time_interval: pandas.Interval
         :return: mortality_dict: dict
         """
+        return self.compute_and_add_to_mortality_dicts({None: mortality_dict}, time_interval)[None]
+
+    def compute_and_add_to_mortality_dicts(self, mortality_dicts: dict, time_interval: pd.Interval,
+                                           max_processes: int = 1):
+        """
+        Estimate excess mortality for the mortality dictionaries of many countries at once (see `compute_excess`) and
+        add them to the original dictionaries.
+        :param mortality_dicts: dict -- mortality dictionary by country
+        :param time_interval: pandas.Interval
+        :param max_processes: int -- with more than one, countries are distributed over a pool of processes, which
+        receive their mortality dictionaries through shared memory (see utils.shared_objects); the results are the same
+        :return: mortality_dicts: dict
+        """
+        if max_processes > 1 and len(mortality_dicts) > 1:
+            excess = self._compute_in_processes(mortality_dicts, time_interval, max_processes)
+        else:
+            excess = self.compute_excess(mortality_dicts, time_interval)
 
-        start_excess, end_excess = time_interval.left, time_interval.right
+        for country, excess_attrs in excess.items():
+            mortality_dicts[country].update(excess_attrs)
+        return mortality_dicts
 
-        start_baseline = pd.Timestamp(day=1, month=1, year=start_excess.year - 5)
-        end_baseline = pd.Timestamp(day=31, month=12, year=end_excess.year - 1)
+    def compute_excess(self, mortality_dicts: dict, time_interval: pd.Interval):
+        """
+        Estimate excess mortality (Abs and PScore) of every attribute of the mortality dictionaries, with each baseline
+        model, and the baseline and its prediction interval (Baseline, Lower and Upper) if `prediction_intervals`. The
+        attributes of a model are named 'Excess' + model name + metric + '_' + age (e.g. 'ExcessAbs_Total_Total' or
+        'ExcessSerflingUpper_Total_Total'), except for the series a model could not be fitted to (e.g. a Serfling model of
+        yearly data). The series of each frequency are stacked into a single matrix, on the calendar of all their keys,
+        so the baselines and the excess of all countries and age groups are computed together (see
+        `_create_mortality_baselines`).
+        :param mortality_dicts: dict -- mortality dictionary by country
+        :param time_interval: pandas.Interval
+        :return: dict -- the new attributes of each country
+        """
+        entries = [(country, age, age_mortality) for country, mortality_dict in mortality_dicts.items()
+                   for age, age_mortality in mortality_dict.items()]
+        frequencies = dict()
+        for position, (_, _, age_mortality) in enumerate(entries):
+            frequencies.setdefault(age_mortality[FREQ_STR], []).append(position)
+
+        baselines = [None] * len(entries)
+        for frequency, positions in frequencies.items():
+            for position, baseline in zip(positions, self._create_mortality_baselines(
+                    [entries[position][2][VALUE_STR] for position in positions], frequency, time_interval)):
+                baselines[position] = baseline
 
-        for age, age_mortality in list(mortality_dict.items()):
-            baseline_data = self._data_interval(age_mortality, pd.Interval(start_baseline, end_baseline))
-            excess_data = self._data_interval(age_mortality, time_interval)
-            baseline = self._create_mortality_baseline(age_mortality, baseline_data, excess_data, start_excess.year,
-                                                       end_excess.year)
+        excess = {country: dict() for country in mortality_dicts.keys()}
+        unfitted = dict()
+        for (country, age, age_mortality), baseline in zip(entries, baselines):
+            if baseline is None:
+                continue
 
-            if baseline is not None:
-                metrics = {'Abs': self._estimate_absolute(baseline),
-                           'PScore': self._estimate_p_score(baseline)}
+            keys, mortality_in_period, estimates = baseline
+            for model, (mortality_baseline, lower, upper) in zip(self.baseline_models, estimates):
+                if np.isnan(mortality_baseline).all():
+                    # e.g. a regression with more parameters than keys, or with harmonics of yearly data
+                    unfitted[model.name or 'Mean'] = unfitted.get(model.name or 'Mean', 0) + 1
+                    continue
+
+                metrics = {'Abs': self._estimate_absolute(mortality_baseline, mortality_in_period),
+                           'PScore': self._estimate_p_score(mortality_baseline, mortality_in_period)}
+                if self.prediction_intervals:
+                    metrics.update({'Baseline': mortality_baseline, 'Lower': lower, 'Upper': upper})
 
-                timestamps = baseline[:, 0]  # Timestamps estimated in baseline
                 for name, values in metrics.items():
-                    data = {time: m for time, m in zip(timestamps, values)}
-                    new_key = 'Excess' + name + '_' + age
+                    new_key = 'Excess' + model.name + name + '_' + age
                     source_mortality = 'Computed using ' + age_mortality[SOURCE_STR]
-                    mortality_dict[new_key] = {}
-                    mortality_dict[new_key] = {ATTR_NAME_STR: new_key, SOURCE_STR: source_mortality, UNIT_STR: 'Number',
-                                               FREQ_STR: WEEKLY_STR,
-                                               TSTYPE_STR: NEW_STR if name == 'Abs' else CURRENT_STR,
-                                               VALUE_STR: pd.Series(data=data)}
+                    excess[country][new_key] = {ATTR_NAME_STR: new_key, SOURCE_STR: source_mortality,
+                                                UNIT_STR: 'Number', FREQ_STR: age_mortality[FREQ_STR],
+                                                TSTYPE_STR: CURRENT_STR if name == 'PScore' else NEW_STR,
+                                                VALUE_STR: pd.Series(values, index=keys)}
+
+        for name, count in unfitted.items():
+            logger.warning('Baseline model %s could not be fitted to %d time series.' % (name, count))
+        return excess
+
+    def _compute_in_processes(self, mortality_dicts, time_interval, max_processes):
+        countries = list(mortality_dicts.keys())
+        chunks = distribute([len(mortality_dicts[country]) for country in countries], max_processes)
+        logger.info('Estimating excess mortality of %d countries with %d processes' % (len(countries), len(chunks)))
+
+        shared = [SharedObject({countries[i]: mortality_dicts[countries[i]] for i in chunk}) for chunk in chunks]
+        excess = dict()
+        try:
+            with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                futures = [executor.submit(_compute_shared_excess, shared_dicts, time_interval, self)
+                           for shared_dicts in shared]
+                for future in futures:
+                    excess.update(future.result())
+        finally:
+            for shared_dicts in shared:
+                shared_dicts.release()
 
-        return mortality_dict
+        return {country: excess[country] for country in countries}
 
     @staticmethod
-    def _estimate_p_score(baseline):
+    def _estimate_p_score(mortality_baseline, mortality_in_period):
         """
         Estimate excess mortality based on p-score.
-        :param baselines: list
-        :return: p_score: list
+        :param mortality_baseline: numpy.ndarray
+        :param mortality_in_period: numpy.ndarray
+        :return: p_score: numpy.ndarray
         """
-        mortality_in_period = baseline[:, 2].astype(float)
-        mortality_baseline = baseline[:, 1].astype(float)
         return (mortality_in_period - mortality_baseline) / mortality_baseline * 100
 
     @staticmethod
-    def _estimate_absolute(baseline):
+    def _estimate_absolute(mortality_baseline, mortality_in_period):
         """
         Estimate excess mortality absolute values.
-        :param baseline: list ['time', 'baseline_mortality', 'target_mortality'
-        :return: z_score: list
+        :param mortality_baseline: numpy.ndarray
+        :param mortality_in_period: numpy.ndarray
+        :return: numpy.ndarray
         """
-        mortality_in_period = baseline[:, 2].astype(float)
-        mortality_baseline = baseline[:, 1].astype(float)
         return mortality_in_period - mortality_baseline
 
     @staticmethod
-    def _create_mortality_baseline(mortality_dict, baseline_data, target_data, start_excess_year, end_excess_year):
+    def _get_periods(keys: pd.Index, frequency):
         """
-        Create mortality baseline with previous two to five years (depending on the data available) and select mortality
-        data from the year in study.
-        :param mortality_dict: dict
-        :param baseline_data: list
-        :param target_data: list
-        :return: baselines: list
+        Year and period of the year of each key: the week of 'yyyyWww' keys, the month of 'mm-yyyy' keys or the day of
+        'dd-mm-yyyy' keys (as month * 100 + day). Keys of a year are compared with the same period of previous years.
+        :param keys: pandas.Index
+        :param frequency: str
+        :return: (numpy.ndarray, numpy.ndarray) -- years (of the end of each key) and periods, NaN if unknown
         """
+        years = pd.DatetimeIndex(get_time_index(keys).end).year.values.astype('float64')
 
-        def get_year(time):
-            parsed = safe_date_parse(time)
-            if isinstance(parsed, pd.Interval):
-                return parsed.right.year
-            else:
-                return parsed.year
-
-        frequency = mortality_dict[FREQ_STR]
-        baseline_data = baseline_data.dropna()
-        target_data = target_data.dropna()
-
-        baseline = []
-        for target_year in range(start_excess_year, end_excess_year + 1):
-            # Select data to estimate a baseline for each year (5 previous years)
-            # 2019 is the maximum baseline year since the pandemic started in 2020
-
-            baseline_end = target_year - 1 if target_year < 2021 else 2019
-            past_years = list(range(baseline_end - 4, baseline_end + 1))
-
-            current_data = baseline_data[pd.Series(baseline_data.index).apply(get_year).isin(past_years).values]
-            current_data_year = target_data[pd.Series(target_data.index).apply(get_year).values == target_year]
-
-            if len(current_data_year) >= 0:  # if data available for the given year, estimate baseline
-                if frequency == DAILY_STR:
-                    if len(current_data) >= 2 * 365:
-                        for deaths_day, d in zip(current_data_year, current_data_year.index):
-                            # TODO is there a way to assert the weeks without looking for the string?
-                            deaths = current_data[current_data.index.str.contains(str(d[-5:]))].mean()
-                            baseline.append([d, deaths, deaths_day])
-                    else:  # if no data available of at least 2 previous years
-                        logger.warning('Not enough mortality data available from 2 previous years.')
-
-                elif frequency == WEEKLY_STR:
-                    if len(current_data) >= 2 * 52:  # if no data available of at least 2 previous years
-                        for deaths_week, w in zip(current_data_year, current_data_year.index):
-                            deaths = current_data[current_data.index.str.contains(str(w[-3:]))].mean()
-                            baseline.append([w, deaths, deaths_week])
-                    else:
-                        logger.warning('Not enough mortality data available from 2 previous years.')
-
-                elif frequency == MONTHLY_STR:
-                    if len(current_data) >= 2 * 12:  # if no data available of at least 2 previous years
-                        for deaths_month, m in zip(current_data_year, current_data_year.index):
-                            deaths = current_data[current_data.index.str.contains(str(m[:3]))].mean()
-                            baseline.append([m, deaths, deaths_month])
-                    else:
-                        logger.warning('Not enough mortality data available from 2 previous years.')
-
-                elif frequency == YEARLY_STR:
-                    if len(current_data) >= 2:  # if no data available of at least 2 previous years
-                        for deaths_year, y in zip(current_data_year, current_data_year.index):
-                            deaths = current_data.mean()
-                            baseline.append([y, deaths, deaths_year])
-                    else:
-                        logger.warning('Not enough mortality data available from 2 previous years.')
+        labels = keys.astype(str)
+        if frequency == WEEKLY_STR:
+            periods = pd.to_numeric(labels.str[-2:], errors='coerce')
+        elif frequency == MONTHLY_STR:
+            periods = pd.to_numeric(labels.str[:2], errors='coerce')
+        elif frequency == DAILY_STR:
+            periods = pd.to_numeric(labels.str[3:5], errors='coerce') * 100 + \
+                pd.to_numeric(labels.str[:2], errors='coerce')
+        else:
+            periods = np.zeros(len(keys))
+        return years, np.asarray(periods, dtype='float64')
+
+    @staticmethod
+    def _get_times(keys: pd.Index, periods, frequency):
+        """
+        Time of each key in years (the year of its label plus the fraction of the year before its period), for the
+        baseline models of trends and seasonality.
+        :param keys: pandas.Index
+        :param periods: numpy.ndarray -- see `_get_periods`
+        :param frequency: str
+        :return: numpy.ndarray -- NaN if unknown
+        """
+        labels = keys.astype(str)
+        if frequency == WEEKLY_STR:
+            return pd.to_numeric(labels.str[:4], errors='coerce').values + (periods - 1) / 52.18
+        years = pd.to_numeric(labels.str[-4:], errors='coerce').values.astype('float64')
+        if frequency == MONTHLY_STR:
+            return years + (periods - 1) / 12
+        elif frequency == DAILY_STR:
+            # day of the year, counting 29 February in every year
+            months = np.nan_to_num(periods // 100, nan=1).astype(int).clip(1, 12)
+            days_before = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])[months - 1]
+            return years + (days_before + periods % 100 - 1) / 366
+        return years
 
+    def _create_mortality_baselines(self, time_series, frequency, time_interval: pd.Interval):
+        """
+        Create mortality baselines with previous two to five years (depending on the data available) and select
+        mortality data from the years in study. The baseline of a key is estimated by each baseline model from the 5
+        previous years (up to 2019, since the pandemic started in 2020), e.g. the mean of the same period (see
+        `_get_periods`) in those years.
+        The series are stacked into a (series x key) matrix, on the calendar of all their keys, and each model fits
+        all series at once, once for the target years with the same previous years.
+        :param time_series: List[pandas.Series] -- series of the same frequency
+        :param frequency: str
+        :param time_interval: pandas.Interval
+        :return: List[(pandas.Index, numpy.ndarray, List[(numpy.ndarray, numpy.ndarray, numpy.ndarray)])] -- for each
+        series, the keys in the time interval, their mortality and the baseline, lower and upper bound of each model,
+        or None if there are none
+        """
+        if frequency not in ExcessMortality.MIN_BASELINE_LENGTH or not time_series:
+            return [None] * len(time_series)
+
+        calendar = union_time_keys([series.index for series in time_series])
+        # one more column, always missing (see `BaselineModel.fit_predict`)
+        values = np.full((len(time_series), len(calendar) + 1), np.nan)
+        for position, series in enumerate(time_series):
+            if series.index.equals(calendar):
+                values[position, :-1] = series.to_numpy(dtype='float64')
             else:
-                logger.warning('No mortality data available for %d.' % target_year)
+                values[position, calendar.get_indexer(series.index)] = series.to_numpy(dtype='float64')
+        present = ~np.isnan(values)
 
-        if not baseline:
-            return None
+        time_index = get_time_index(calendar)
+        years, periods = ExcessMortality._get_periods(calendar, frequency)
+        times = ExcessMortality._get_times(calendar, periods, frequency)
+        start_excess_year, end_excess_year = time_interval.left.year, time_interval.right.year
+        start_baseline = pd.Timestamp(day=1, month=1, year=start_excess_year - 5)
+        end_baseline = pd.Timestamp(day=31, month=12, year=end_excess_year - 1)
 
-        return np.array(baseline)
+        # the baseline of each target year (its position in target_years) are the keys of its 5 previous years
+        target_years = np.arange(start_excess_year, end_excess_year + 1)
+        baseline_end = np.where(target_years < 2021, target_years - 1, 2019)
+        baseline_columns = np.flatnonzero(time_index.overlaps(pd.Interval(start_baseline, end_baseline)))
+        baseline_years = years[baseline_columns]
+        in_baseline = (baseline_years >= baseline_end[:, None] - 4) & (baseline_years <= baseline_end[:, None])
+
+        # (series x target year) whether there is enough data to estimate a baseline
+        enough = present[:, baseline_columns].astype(int) @ in_baseline.T.astype(int) >= \
+            ExcessMortality.MIN_BASELINE_LENGTH[frequency]
+        for target_year, missing in zip(target_years, (~enough).sum(axis=0)):
+            if missing:
+                logger.warning('Not enough mortality data available from 2 previous years (%d) for %d time series.'
+                               % (target_year, missing))
+
+        # keys in the time interval of the target years, by year
+        target_columns = np.flatnonzero(time_index.overlaps(time_interval) &
+                                        (years >= start_excess_year) & (years <= end_excess_year))
+        target_columns = target_columns[np.argsort(years[target_columns], kind='stable')]
+        target_positions = (years[target_columns] - start_excess_year).astype(int)
+
+        # the models are fitted once for the target years with the same previous years (e.g. 2020 and 2021)
+        estimates = [tuple(np.full((len(time_series), len(target_columns)), np.nan) for _ in range(3))
+                     for _ in self.baseline_models]
+        for end in np.unique(baseline_end):
+            targets = np.isin(target_positions, np.flatnonzero(baseline_end == end))
+            if not targets.any():
+                continue
+            window = baseline_columns[in_baseline[np.flatnonzero(baseline_end == end)[0]]]
+            for model, model_estimates in zip(self.baseline_models, estimates):
+                for estimate, fitted in zip(model_estimates, model.fit_predict(
+                        values, times, periods, window, target_columns[targets], self.level)):
+                    estimate[:, targets] = fitted
+
+        mortality_in_period = values[:, target_columns]
+        selected = present[:, target_columns] & enough[:, target_positions]
+        target_keys = calendar[target_columns]
+        return [(target_keys[row_selected], mortality_in_period[row, row_selected],
+                 [tuple(estimate[row, row_selected] for estimate in model_estimates) for model_estimates in estimates])
+                if row_selected.any() else None
+                for row, row_selected in enumerate(selected)]
 
-    @staticmethod
-    def _data_interval(mortality_dict, time_interval: Union[pd.Interval, pd.Period]):
 
-        # TODO redundant method replicated in fairisk_dataset - should be moved to utils?
-        def time_interval_validation(parsed):
-            if parsed is None or (isinstance(parsed, numbers.Number) and math.isnan(parsed)):
-                return False
-            if isinstance(parsed, pd.Interval):
-                return time_interval.overlaps(parsed)
-            return parsed in time_interval
+def _compute_shared_excess(shared_dicts, time_interval, excess_mortality):
+    # estimates the excess mortality of some countries in a worker process (see
+    # `ExcessMortality.compute_and_add_to_mortality_dicts`); the new attributes have new arrays, which do not refer to
+    # the shared data
 
-        parsed = mortality_dict['VALUE'].index.to_series().map(safe_date_parse).map(time_interval_validation)
+    def compute(mortality_dicts):
+        return excess_mortality.compute_excess(mortality_dicts, time_interval)
 
-        return mortality_dict['VALUE'][parsed == True]
+    return shared_dicts.load(compute)
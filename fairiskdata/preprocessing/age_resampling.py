@@ -1,61 +1,195 @@
 
-from fairiskdata.utils.age_parsers import safe_parse_age_group, do_ranges_overlap
+import copy
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from fairiskdata.utils.age_cube import AgeCube, union_time_keys
+from fairiskdata.utils.age_parsers import safe_parse_age_group
 from fairiskdata.utils.parsers import safe_parse_sex
+from fairiskdata.utils.shared_objects import SharedObject, distribute
 
+import logging
+logger = logging.getLogger('fairisk')
 
-class AgeResampler:
 
-    GRANULARITY = {
-        'LOW': [(None, None)],
-        'MEDIUM': [(None, 14), (15, 64), (65, None)],
-        'HIGH': [(None, 14), (15, 64), (65, 74), (75, 84), (85, None)]
+class AgeResampler:
+    """
+    Sums the age groups of the attributes of a category (e.g. 'From 5 to 9 years_Males', 'D65_74_m') into coarser
+    groups, given by their lower edges: e.g. [15, 65] are the groups -14, 15-64 and 65+, and [] a single group of all
+    ages (Total). Each attribute is added to the groups its ages overlap, with the same sex.
+    """
+
+    EDGES = {
+        'LOW': [],
+        'MEDIUM': [15, 65],
+        'HIGH': [15, 65, 75, 85]
     }
 
     def __init__(self,
-                 granularity: str):
+                 granularity):
+        """
+        :param granularity: str | List[int] -- 'LOW', 'MEDIUM' or 'HIGH' (see `FAIRiskDataset.resample_age_groups`),
+        or the lower edges of the groups after the first one
+        """
         self.granularity = granularity
+        self.edges = self.get_edges(granularity)
+        # numeric edges (lower <= age < upper, see utils.age_cube.AgeCube) of the groups
+        self.lower = np.array([0] + self.edges, dtype='float64')
+        self.upper = np.array(self.edges + [np.inf], dtype='float64')
+        self.names = [self._group_name(lower, upper) for lower, upper in zip([None] + self.edges,
+                                                                             [edge - 1 for edge in self.edges] + [None])]
+
+    @staticmethod
+    def get_edges(granularity):
+        """
+        :param granularity: str | List[int]
+        :return: List[int] -- the lower edges of the groups after the first one
+        """
+        if isinstance(granularity, str):
+            if granularity not in AgeResampler.EDGES:
+                raise ValueError('Unknown age granularity %s' % granularity)
+            return list(AgeResampler.EDGES[granularity])
+
+        edges = [int(edge) for edge in granularity]
+        if any(edge <= 0 for edge in edges) or any(b <= a for a, b in zip(edges, edges[1:])):
+            raise ValueError('Age group edges should be positive and increasing: %s' % list(granularity))
+        return edges
+
+    @staticmethod
+    def _group_name(lower, upper):
+        if lower is None and upper is None:
+            return 'Total'
+        elif lower is None:
+            return '-' + str(upper)
+        elif upper is None:
+            return str(lower) + '+'
+        return str(lower) + '-' + str(upper)
 
     def resample(self,
                  attrs_dict: dict):
-
         """
-        Resamples the ages for attr_dict of category
-        :param attrs_dict:
-        :return:
+        Resamples the ages for attr_dict of category. Every new attribute has the fields of the first attribute summed
+        into it (in the order of attrs_dict) and a new series with the keys of that attribute only: keys of the other
+        attributes which it does not have are dropped, and its keys which another attribute does not have are missing
+        in the sum. The attributes of attrs_dict are not changed.
+        :param attrs_dict: dict
+        :return: dict -- the new attributes
         """
-
-        resampled = dict()
-
+        names, ages, sexes = [], [], []
         for attr_key, attr in attrs_dict.items():
+            if not self.edges and attr_key == 'population':
+                # Case of demographic data from COVID which only has total population
+                age, sex = (None, None), 'Total'
+            else:
+                age, sex = safe_parse_age_group(attr_key), safe_parse_sex(attr_key)
+            if age is not None and sex is not None:
+                names.append(attr_key)
+                ages.append(AgeCube.age_edges(age))
+                sexes.append(sex)
+
+        if not names:
+            return dict()
+
+        # (attribute, group) pairs whose ages overlap, by attribute (in order) and group, which is the order of the new
+        # attributes. Each new attribute is a group of a sex, and sums the attributes of its pairs.
+        ages = np.array(ages, dtype='float64')
+        overlap = (ages[:, 0, None] < self.upper) & (self.lower < ages[:, 1, None])
+        pair_attributes, pair_groups = np.nonzero(overlap)
+        new_names = np.array([self.names[group] + '_' + sexes[attribute]
+                              for attribute, group in zip(pair_attributes, pair_groups)], dtype=object)
+        codes, unique_names = pd.factorize(new_names)
+        aggregation = np.zeros((len(unique_names), len(names)))
+        aggregation[codes, pair_attributes] = 1
+
+        series = [attrs_dict[name]['VALUE'] for name in names]
+        keys = union_time_keys([s.index for s in series])
+        values = np.full((len(names), len(keys)), np.nan)
+        for position, s in enumerate(series):
+            if s.index.equals(keys):
+                values[position] = s.to_numpy(dtype='float64')
+            else:
+                values[position, keys.get_indexer(s.index)] = s.to_numpy(dtype='float64')
+
+        # a missing value of any attribute is missing in the sum
+        missing = np.isnan(values)
+        new_values = aggregation @ np.where(missing, 0, values)
+        new_values[(aggregation @ missing) > 0] = np.nan
+
+        # the series of each new attribute has the keys of its first attribute (the sums are computed over all keys)
+        first_pairs = np.unique(codes, return_index=True)[1]
+        first_attributes = pair_attributes[first_pairs]
+        self._validate(aggregation, ages, unique_names, pair_groups[first_pairs], overlap.sum(axis=1) > 1)
 
-            sex = safe_parse_sex(attr_key)
-            age = safe_parse_age_group(attr_key)
+        resampled = dict()
+        for position, (new_name, first) in enumerate(zip(unique_names, first_attributes)):
+            index = series[first].index
+            row = new_values[position] if index.equals(keys) else new_values[position, keys.get_indexer(index)]
+            resampled[new_name] = {**attrs_dict[names[first]], 'ATTR_NAME': new_name,
+                                   'VALUE': pd.Series(row, index=index)}
+
+        return resampled
+
+    def _validate(self, aggregation, ages, new_names, new_groups, in_several_groups):
+        # warns about new attributes that count some ages more than once (from attributes whose ages overlap or which
+        # are also summed into another group) or that do not have data for all the ages of their group
+        double_counted, not_covered = [], []
+        for new_name, group, members in zip(new_names, new_groups, aggregation.astype(bool)):
+            member_ages = ages[members][np.argsort(ages[members][:, 0], kind='stable')]
+            # the ages covered by the attributes up to each one
+            reach = np.maximum.accumulate(member_ages[:, 1])
+            if (member_ages[1:, 0] < reach[:-1]).any() or in_several_groups[members].any():
+                double_counted.append(new_name)
+            if member_ages[0, 0] > self.lower[group] or (member_ages[1:, 0] > reach[:-1]).any() or \
+                    reach[-1] < self.upper[group]:
+                not_covered.append(new_name)
+
+        if double_counted:
+            logger.warning('Age groups %s count some ages more than once.' % ', '.join(double_counted))
+        if not_covered:
+            logger.warning('Age groups %s do not have data for all their ages.' % ', '.join(not_covered))
+
+    def resample_countries(self,
+                           countries: dict,
+                           max_processes: int = 1):
+        """
+        Resamples the ages of the categories of many countries
+        :param countries: dict -- categories (attrs_dict) by country
+        :param max_processes: int -- with more than one, countries are resampled in a pool of processes, which receive
+        their categories through shared memory (see utils.shared_objects); the results are the same
+        :return: dict -- the resampled categories by country
+        """
+        if max_processes <= 1 or len(countries) <= 1:
+            return {country: {category_name: self.resample(category_val)
+                              for category_name, category_val in categories.items()}
+                    for country, categories in countries.items()}
 
-            # Case of demographic data from COVID which only has total population
-            if self.granularity == 'LOW' and attr_key == 'population':
-                resampled['Total_Total'] = attr
-                resampled['Total_Total']['ATTR_NAME'] = 'Total_Total'
+        names = list(countries.keys())
+        chunks = distribute([sum(len(category_val) for category_val in countries[country].values())
+                             for country in names], max_processes)
+        logger.info('Resampling the age groups of %d countries with %d processes' % (len(names), len(chunks)))
 
-            if age is None:
-                continue
+        shared = [SharedObject({names[i]: countries[names[i]] for i in chunk}) for chunk in chunks]
+        resampled = dict()
+        try:
+            with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                futures = [executor.submit(_resample_shared_countries, shared_countries, self.granularity)
+                           for shared_countries in shared]
+                for future in futures:
+                    resampled.update(future.result())
+        finally:
+            for shared_countries in shared:
+                shared_countries.release()
 
-            for group in self.GRANULARITY[self.granularity]:
-                if do_ranges_overlap(group, age):
+        # in the order of the countries
+        return {country: resampled[country] for country in names}
 
-                    if group[0] is None and group[1] is None:
-                        age_group = 'Total'
-                    elif group[0] is None:
-                        age_group = '-' + str(group[1])
-                    elif group[1] is None:
-                        age_group = str(group[0]) + '+'
-                    else:
-                        age_group = str(group[0]) + '-' + str(group[1])
 
-                    if age_group + '_' + sex not in resampled:
-                        resampled[age_group + '_' + sex] = attr
-                        resampled[age_group + '_' + sex]['ATTR_NAME'] = age_group + '_' + sex
+def _resample_shared_countries(shared_countries, granularity):
+    # resamples the ages of some countries in a worker process (see `AgeResampler.resample_countries`)
 
-                    else:
-                        resampled[age_group + '_' + sex]['VALUE'] += attr['VALUE']
+    def resample(countries):
+        # the resampled categories are copied, as they may refer to the shared data
+        return copy.deepcopy(AgeResampler(granularity).resample_countries(countries))
 
-        return resampled
\ No newline at end of file
+    return shared_countries.load(resample)
@@ -1,9 +1,95 @@
 import pandas as pd
 import datetime
 import numpy as np
-import math
-
-from fairiskdata.utils.time_parsers import safe_date_parse
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from fairiskdata.utils.time_index import get_time_index
+from fairiskdata.utils.shared_objects import SharedObject, distribute
+
+import logging
+logger = logging.getLogger('fairisk')
+
+_DAY_NS = 86400 * 10 ** 9
+
+
+class ResamplingPlan:
+    """
+    Mapping of the keys of a time series to the new intervals of a `Resampler`, shared by all series with the same keys
+    (e.g. the weekly mortality series of all countries of a source). It is kept as a sparse matrix of (key, new
+    interval) entries, sorted by new interval, with the part of each key in the interval, so the values of many series
+    stacked in a 2-D array are resampled at once.
+    """
+
+    def __init__(self, n_intervals, key, intervals, offsets, complete=None, previous_key=None,
+                 days_before=None, days_until=None, key_days=None):
+        self.n_intervals = n_intervals
+        # entries: the key of each entry, and the new intervals with entries (`intervals`) with the offset of their
+        # first entry (`offsets`)
+        self.key = key
+        self.intervals = intervals
+        self.offsets = offsets
+        self.last = np.append(offsets[1:], len(key))[:len(offsets)] - 1
+        # undersampling: whether the keys cover each new interval (otherwise, there is missing data)
+        self.complete = complete
+        # oversampling: the key before each key (or -1), and the days of each key before and until the end of the
+        # new interval of each entry, of the days of the key
+        self.oversampling = days_until is not None
+        self.previous_key = previous_key
+        self.days_before = days_before
+        self.days_until = days_until
+        self.key_days = key_days
+
+    def apply(self, values: np.ndarray, series_type: str, exact_totals: bool = False):
+        """
+        :param values: numpy.ndarray -- values of series with the keys of the plan, one series by row
+        :param series_type: str -- 'NEW', 'TOTAL' or 'CURRENT'
+        :param exact_totals: bool -- see `Resampler`
+        :return: numpy.ndarray -- the values of the resampled series, one series by row
+        """
+        new_values = np.full((len(values), self.n_intervals), np.nan)
+        if not len(self.key):
+            return new_values
+        entry_values = values[:, self.key]
+
+        if not self.oversampling:
+            if series_type == 'TOTAL':
+                aggregated = entry_values[:, self.last]
+            else:
+                sums = np.add.reduceat(entry_values, self.offsets, axis=1)
+                aggregated = sums if series_type == 'NEW' else sums / (self.last - self.offsets + 1)  # 'CURRENT'
+            new_values[:, self.intervals] = np.where(self.complete, aggregated, np.nan)
+
+        elif series_type == 'CURRENT':
+            # value of the last key of each new interval
+            new_values[:, self.intervals] = entry_values[:, self.last]
+
+        elif series_type == 'NEW':
+            # missing values are not spread
+            has_value = ~np.isnan(entry_values)
+            entry_values = np.where(has_value, entry_values, 0)
+            parts = self._spread(entry_values, self.days_until, exact_totals) - \
+                self._spread(entry_values, self.days_before, exact_totals)
+            new_values[:, self.intervals] = np.where(np.logical_or.reduceat(has_value, self.offsets, axis=1),
+                                                     np.add.reduceat(parts, self.offsets, axis=1), np.nan)
+
+        else:  # 'TOTAL', cumulative time series
+            # Each day adds to the total of the previous key, until the total of the key; the value of each new
+            # interval is the one at the end of its last key with a value
+            last_total = np.where(self.previous_key >= 0, values[:, self.previous_key], 0)
+            last_total[np.isnan(last_total)] = 0
+            totals = last_total + self._spread(entry_values - last_total, self.days_until, exact_totals)
+            last = np.maximum.reduceat(np.where(np.isnan(totals), -1, np.arange(len(self.key))), self.offsets, axis=1)
+            new_values[:, self.intervals] = np.where(
+                last >= 0, np.take_along_axis(totals, np.maximum(last, 0), axis=1), np.nan)
+
+        return new_values
+
+    def _spread(self, totals, days, exact_totals):
+        # part of the totals of the keys of the entries in their first `days` (in whole units, for exact totals)
+        if exact_totals:
+            return np.where(days >= self.key_days, totals, np.floor(totals * days / self.key_days))
+        return totals * days / self.key_days
 
 
 class Resampler:
@@ -17,163 +103,202 @@ class Resampler:
 
     def __init__(self,
                  time_interval: pd.Interval,
-                 frequency: str):
+                 frequency: str,
+                 exact_totals: bool = False):
+        """
+        :param time_interval: pandas.Interval -- the interval covered by the resampled time series
+        :param frequency: str -- the target frequency (see FREQUENCY)
+        :param exact_totals: bool -- when oversampling, spread NEW and TOTAL values over days in whole units, so the
+        new intervals add up exactly to the original values (which are otherwise spread as fractions)
+        """
         self.time_interval = time_interval
         self.frequency = frequency
+        self.exact_totals = exact_totals
 
         self.frequency_alias = self._get_frequency_alias(frequency)
         self.timestamp_strformat = self._get_timestamp_strformat(frequency)
 
         self.interval_index = pd.interval_range(time_interval.left, time_interval.right,
                                                 freq=self.frequency_alias, closed='left')
+        self.interval_days = (self.interval_index.right - self.interval_index.left).days.to_numpy()
+        # days of the new intervals (see `_oversampling_plan`)
+        self.n_days = int(self.interval_days.sum())
+        self.interval_offsets = np.cumsum(self.interval_days) - self.interval_days
+
+        # all resampled series share the same index, so its time keys (and their bounds) are parsed once
+        self.new_index = pd.Index([datetime.datetime.strftime(i.left, self.timestamp_strformat)
+                                   for i in self.interval_index])
+        get_time_index(self.new_index)
+
+        # plans by source frequency and keys (see `get_plan`)
+        self._plans = dict()
 
     def resample(self,
                  time_series: pd.Series,
                  current_frequency: str,
                  series_type: str):
 
-        def validate_series_type():
-            if series_type in ['NEW', 'TOTAL', 'CURRENT']:
-                return
-            else:
+        return self.resample_all([time_series], [current_frequency], [series_type])[0]
+
+    def resample_all(self,
+                     time_series: List[pd.Series],
+                     current_frequencies: List[str],
+                     series_types: List[str],
+                     partitions: List = None,
+                     max_processes: int = 1):
+        """
+        Resamples many series: series with the same keys, source frequency and series type are resampled at once,
+        with a shared plan (see `get_plan`).
+        :param partitions: List -- the partition of each series (e.g. its country), by default one for each series.
+        With more than one process, partitions are resampled in a pool of processes, which receive the series through
+        shared memory (see utils.shared_objects); the results are the same
+        :param max_processes: int
+        :return: List[pandas.Series] -- the resampled series
+        """
+        for current_frequency, series_type in set(zip(current_frequencies, series_types)):
+            if series_type not in ['NEW', 'TOTAL', 'CURRENT']:
                 raise ValueError('Unknown series type %s' % series_type)
+            if current_frequency not in self.FREQUENCY:
+                raise ValueError('Unknown current frequency %s' % current_frequency)
 
-        if self.FREQUENCY[current_frequency] >= self.FREQUENCY[self.frequency]:
-            validate_series_type()
-            return self._undersample(time_series, series_type)
-        elif self.FREQUENCY[current_frequency] < self.FREQUENCY[self.frequency]:
-            validate_series_type()
-            return self._oversample(time_series, series_type)
+        if max_processes > 1 and len(time_series) > 1:
+            new_values = self._resample_in_processes(time_series, current_frequencies, series_types,
+                                                     np.arange(len(time_series)) if partitions is None else partitions,
+                                                     max_processes)
         else:
-            raise ValueError('Unknown current frequency %s' % current_frequency)
-
-    def _undersample(self, time_series, series_type):
-
-        new_time_series = pd.Series(index=[datetime.datetime.strftime(i.left, self.timestamp_strformat)
-                                           for i in self.interval_index])
-
-        parsed = list(map(safe_date_parse, time_series.index.tolist()))
-
-        for i in self.interval_index:
-
-            def time_interval_validation(p):
-                if isinstance(p, pd.Interval):
-                    return i.overlaps(p)
-                return p in i
-
-            val = list(map(time_interval_validation, parsed))
-            if any(val):
-
-                # Get time delta of i
-                i_time_delta = i.right - i.left
-                # Get time delta of overlap with i
-                overlap = np.array(parsed)[val]
-                if isinstance(overlap[-1], pd.Interval):
-                    overlap_time_delta = overlap[-1].right - overlap[0].left + pd.Timedelta(days=1)
-                else:
-                    overlap_time_delta = overlap[-1] - overlap[0] + pd.Timedelta(days=1)
-
-                # Only perform operations if overlap has the expected size (otherwise, there is missing data)
-                if i_time_delta.days <= overlap_time_delta.days:
-                    if series_type == 'NEW':
-                        x = time_series.values[val]
-                        value = x.sum()
-                    elif series_type == 'TOTAL':
-                        value = time_series.values[val][-1]
-                    else:  # 'CURRENT'
-                        x = time_series.values[val]
-                        value = x.mean()
-                else:
-                    value = np.nan
-
-                new_time_series[datetime.datetime.strftime(i.left, self.timestamp_strformat)] = value
-
-        return new_time_series
-
-    def _oversample(self, time_series, series_type):
-        new_time_series = pd.Series(index=[datetime.datetime.strftime(i.left, self.timestamp_strformat)
-                                           for i in self.interval_index])
-
-        big_intervals = list(map(safe_date_parse, time_series.index.tolist()))
+            new_values = self._resample_values(time_series, current_frequencies, series_types)
+
+        return [pd.Series(values, index=self.new_index) for values in new_values]
+
+    def _resample_values(self, time_series, current_frequencies, series_types):
+        # values of the resampled series, one series by row
+        groups = dict()
+        for position, (series, current_frequency, series_type) in \
+                enumerate(zip(time_series, current_frequencies, series_types)):
+            key = (current_frequency, self._hash_keys(series.index), series_type)
+            groups.setdefault(key, []).append(position)
+
+        new_values = np.empty((len(time_series), len(self.interval_index)))
+        for (current_frequency, _, series_type), positions in groups.items():
+            plan = self.get_plan(time_series[positions[0]].index, current_frequency)
+            values = np.stack([time_series[position].to_numpy(dtype='float64') for position in positions])
+            new_values[positions] = plan.apply(values, series_type, self.exact_totals)
+
+        return new_values
+
+    def _resample_in_processes(self, time_series, current_frequencies, series_types, partitions, max_processes):
+        codes, _ = pd.factorize(np.asarray(partitions, dtype=object))
+        chunks = [np.flatnonzero(np.isin(codes, process_partitions))
+                  for process_partitions in distribute(np.bincount(codes), max_processes)]
+
+        logger.info('Resampling %d time series with %d processes' % (len(time_series), len(chunks)))
+
+        shared = [SharedObject(([time_series[position] for position in positions],
+                                [current_frequencies[position] for position in positions],
+                                [series_types[position] for position in positions])) for positions in chunks]
+        new_values = np.empty((len(time_series), len(self.interval_index)))
+        try:
+            with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                futures = [executor.submit(_resample_shared_series, shared_series, self.time_interval, self.frequency,
+                                           self.exact_totals) for shared_series in shared]
+                for positions, future in zip(chunks, futures):
+                    new_values[positions] = future.result()
+        finally:
+            for shared_series in shared:
+                shared_series.release()
+
+        return new_values
+
+    def get_plan(self, index: pd.Index, current_frequency: str):
+        """
+        Returns the plan of series with the keys of `index` and of the `current_frequency`, created only the first time.
+        :return: ResamplingPlan
+        """
+        key = (current_frequency, self._hash_keys(index))
+        plan = self._plans.get(key)
+        if plan is None:
+            time_index = get_time_index(index)
+            plan = self._undersampling_plan(time_index) \
+                if self.FREQUENCY[current_frequency] >= self.FREQUENCY[self.frequency] \
+                else self._oversampling_plan(time_index)
+            self._plans[key] = plan
+        return plan
 
-        for idx_big_i, big_i in enumerate(big_intervals):
-
-            def time_interval_validation(small_i):
-                if isinstance(small_i, pd.Interval):
-                    return small_i.overlaps(big_i)
-                return small_i in big_i
-
-            idx_bool_overlap_small_i = list(map(time_interval_validation, self.interval_index))
-
-            if series_type == 'CURRENT':
-                if any(idx_bool_overlap_small_i):
-                    new_time_series[idx_bool_overlap_small_i] = time_series.values[idx_big_i]
-
-            elif series_type == 'NEW':
-                if any(idx_bool_overlap_small_i):
-                    total_new = time_series.values[idx_big_i]
-
-                    if not math.isnan(total_new):
-
-                        # Get number of days of current big interval
-                        n_days_big_i = (big_i.right - big_i.left).round('d').days
-
-                        # Get number of NEW / day
-                        new_per_day = int(total_new / n_days_big_i)
-
-                        # Add number of NEW * n days of small interval in current big interval
-                        def number_of_overlapping_days(i):
-                            return min(i.right - big_i.left, big_i.right - i.left, i.right - i.left).round('d').days
-
-                        overlapping_days = list(map(number_of_overlapping_days,
-                                                    self.interval_index[idx_bool_overlap_small_i]))
-                        array_new = np.array(overlapping_days) * new_per_day
-
-                        for i in range(array_new.shape[0]):
-                            if not math.isnan(new_time_series[idx_bool_overlap_small_i][i]):
-                                array_new[i] += new_time_series[idx_bool_overlap_small_i][i]
+    @staticmethod
+    def _hash_keys(index):
+        return pd.util.hash_array(np.asarray(index, dtype=object)).tobytes()
 
-                        new_time_series[idx_bool_overlap_small_i] = array_new
+    def _undersampling_plan(self, time_index):
 
-            elif series_type == 'TOTAL':  # Cumulative time series
+        order = self._time_order(time_index)
+        time_index = time_index.take(order)
 
-                if any(idx_bool_overlap_small_i):
+        if time_index.is_sorted:
+            # The keys overlapping each new interval are a range of positions (found by binary search)
+            first, stop = time_index.overlapping_ranges(self.interval_index)
+            intervals = np.flatnonzero(stop > first)
+            lengths = stop[intervals] - first[intervals]
+            offsets = np.cumsum(lengths) - lengths
+            key = np.arange(lengths.sum()) - np.repeat(offsets - first[intervals], lengths)
+        else:
+            # (keys in time order may still overlap, e.g. '2010-2015' and '2012')
+            overlaps = (time_index.end[None, :] >= self.interval_index.left.values[:, None]) & \
+                (time_index.start[None, :] < self.interval_index.right.values[:, None])
+            intervals, key = np.nonzero(overlaps)
+            intervals, offsets = np.unique(intervals, return_index=True)
 
-                    current_total = time_series.values[idx_big_i]
+        plan = ResamplingPlan(len(self.interval_index), order[key], intervals, offsets)
 
-                    if not math.isnan(current_total):
+        # Only perform operations if overlap has the expected size (otherwise, there is missing data)
+        overlap_days = (time_index.end[key[plan.last]] - time_index.start[key[offsets]]) // np.timedelta64(1, 'D') + 1
+        plan.complete = self.interval_days[intervals] <= overlap_days
 
-                        if idx_big_i - 1 >= 0:
-                            last_total = 0 if math.isnan(time_series.values[idx_big_i - 1]) \
-                                else time_series.values[idx_big_i - 1]
-                        else:
-                            last_total = 0
+        return plan
 
-                        total_in_period = current_total - last_total
+    def _oversampling_plan(self, time_index):
 
-                        # Get number of days of current big interval
-                        n_days_big_i = (big_i.right - big_i.left).round('d').days
+        if not len(self.interval_index):
+            return ResamplingPlan(0, np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=int))
 
-                        # Get number of NEW / day
-                        new_per_day = int(total_in_period / n_days_big_i)
+        order = self._time_order(time_index)
+        previous_key = np.append(-1, order[:-1])
 
-                        # Add number of NEW * n days + last_total of small interval in current big interval
-                        def number_of_overlapping_days(i):
-                            return min(i.right - big_i.left, big_i.right - i.left, i.right - i.left).round('d').days
+        # Each key (a coarser interval) is spread over its days, which are aggregated into the new intervals
+        first = self._days_since_start(time_index.start[order])
+        stop = self._days_since_start(time_index.end[order])
+        key_days = np.maximum(stop - first, 1)
 
-                        overlapping_days = list(map(number_of_overlapping_days,
-                                                    self.interval_index[idx_bool_overlap_small_i]))
-                        array_new = np.cumsum(np.array(overlapping_days) * new_per_day)
+        # new intervals overlapping the days of each key (clipped to the days of the new intervals)
+        interval_stops = self.interval_offsets + self.interval_days
+        first_interval = np.searchsorted(interval_stops, np.clip(first, 0, self.n_days), side='right')
+        stop_interval = np.searchsorted(self.interval_offsets, np.clip(stop, 0, self.n_days), side='left')
+        lengths = np.where(stop > first, np.maximum(stop_interval - first_interval, 0), 0)
+        sorted_key = np.repeat(np.arange(len(order)), lengths)
+        intervals = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - first_interval, lengths)
 
-                        for i in range(array_new.shape[0]):
-                            if not math.isnan(new_time_series[idx_bool_overlap_small_i][i]):
-                                array_new[i] += new_time_series[idx_bool_overlap_small_i][i]
-                            else:
-                                array_new[i] += last_total
+        # entries by new interval, then by key
+        entries = np.lexsort((sorted_key, intervals))
+        sorted_key, intervals = sorted_key[entries], intervals[entries]
+        days_before = np.maximum(self.interval_offsets[intervals], first[sorted_key]) - first[sorted_key]
+        days_until = np.minimum(interval_stops[intervals], stop[sorted_key]) - first[sorted_key]
 
-                        new_time_series[idx_bool_overlap_small_i] = array_new
+        intervals, offsets = np.unique(intervals, return_index=True)
+        return ResamplingPlan(len(self.interval_index), order[sorted_key], intervals, offsets,
+                              previous_key=previous_key[sorted_key], days_before=days_before,
+                              days_until=days_until, key_days=key_days[sorted_key])
 
-        return new_time_series
+    @staticmethod
+    def _time_order(time_index):
+        # positions of the keys in time order (keys which could not be parsed are ignored)
+        if time_index.is_sorted:
+            return np.arange(len(time_index))
+        order = np.flatnonzero(time_index.valid)
+        return order[np.argsort(time_index.start[order], kind='stable')]
+
+    def _days_since_start(self, timestamps):
+        # whole days (rounded, as keys end one nanosecond before the next one starts) since the first new interval
+        delta = (timestamps - self.interval_index.left.values[0]).astype('int64')
+        return (delta + _DAY_NS // 2) // _DAY_NS
 
     @staticmethod
     def _get_frequency_alias(frequency):
@@ -200,3 +325,12 @@ class Resampler:
             return '%Y'
         else:
             raise ValueError('Unknown resampling frequency', frequency)
+
+
+def _resample_shared_series(shared_series, time_interval, frequency, exact_totals):
+    # resamples a partition of the series in a worker process (see `Resampler.resample_all`)
+
+    def resample(series):
+        return Resampler(time_interval, frequency, exact_totals)._resample_values(*series)
+
+    return shared_series.load(resample)
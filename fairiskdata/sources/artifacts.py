@@ -0,0 +1,106 @@
+import os
+import json
+import pickle
+import hashlib
+import pandas as pd
+
+MANIFEST_FILE = 'manifest.json'
+
+
+class StructuredArtifacts:
+    """
+    Structured output of each source, stored in a directory together with the hash of the raw (fetched) data it was
+    structured from and a hash of its own content. Used by `single_dataset.fetch_and_export` to only structure again
+    the sources whose raw data changed since the previous run.
+    """
+
+    def __init__(self, artifacts_dir='output/artifacts'):
+        self.artifacts_dir = artifacts_dir
+        os.makedirs(artifacts_dir, exist_ok=True)
+
+    def _path(self, dataset_name, suffix):
+        return os.path.join(self.artifacts_dir, dataset_name + suffix)
+
+    @staticmethod
+    def hash_raw_data(data):
+        """
+        Content hash of fetched data (a DataFrame or a dict of DataFrames, as in `Dataset.data`).
+        :param data: pandas.DataFrame | dict
+        :return: str
+        """
+        h = hashlib.sha1()
+        frames = data.items() if isinstance(data, dict) else [('', data)]
+        for name, frame in frames:
+            h.update(repr((name, list(frame.columns), list(frame.dtypes.astype(str)))).encode('utf-8'))
+            try:
+                h.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+            except TypeError:  # unhashable cells (e.g. lists)
+                h.update(pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL))
+        return h.hexdigest()
+
+    def get_meta(self, dataset_name):
+        """
+        :param dataset_name: str
+        :return: dict with 'raw_hash', 'structured_hash' and 'source_str' of the stored artifact, or None
+        """
+        try:
+            with open(self._path(dataset_name, '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, dataset_name, raw_hash):
+        """
+        Returns the stored structured data of a source if it was structured from raw data with the given hash.
+        :param dataset_name: str
+        :param raw_hash: str
+        :return: (source_str, structured_data) | None
+        """
+        meta = self.get_meta(dataset_name)
+        if meta is None or meta['raw_hash'] != raw_hash:
+            return None
+
+        try:
+            with open(self._path(dataset_name, '.pkl'), 'rb') as f:
+                return meta['source_str'], pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def save(self, dataset_name, raw_hash, source_str, structured_data):
+        """
+        Stores the structured data of a source.
+        :param dataset_name: str
+        :param raw_hash: str
+        :param source_str: str
+        :param structured_data: dict
+        :return: structured_hash: str
+        """
+        content = pickle.dumps(structured_data, protocol=pickle.HIGHEST_PROTOCOL)
+        meta = {'raw_hash': raw_hash, 'structured_hash': hashlib.sha1(content).hexdigest(), 'source_str': source_str}
+
+        # the metadata is replaced last, so that it never points to a partially written artifact
+        with open(self._path(dataset_name, '.pkl.tmp'), 'wb') as f:
+            f.write(content)
+        os.replace(self._path(dataset_name, '.pkl.tmp'), self._path(dataset_name, '.pkl'))
+        with open(self._path(dataset_name, '.json'), 'w') as f:
+            json.dump(meta, f)
+
+        return meta['structured_hash']
+
+    def read_manifest(self):
+        """
+        :return: the manifest of the last export (see `write_manifest`), or None
+        """
+        try:
+            with open(os.path.join(self.artifacts_dir, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self, manifest):
+        """
+        Records which structured artifacts (by hash) were merged into an exported file.
+        :param manifest: dict
+        """
+        with open(os.path.join(self.artifacts_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f)
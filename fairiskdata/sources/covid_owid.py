@@ -3,11 +3,7 @@ from . import *
 import numpy as np
 import logging
 import re
-
-try:
-    from urllib.request import Request, urlopen  # Python 3
-except ImportError:
-    from urllib2 import Request, urlopen  # Python 2
+from io import BytesIO
 
 logger = logging.getLogger('fairisk')
 
@@ -46,6 +42,9 @@ class CovidOWiD(Dataset):
     EXCLUDE_GROUPS = ['Africa', 'Asia', 'Europe', 'European Union', 'North America', 'Oceania', 'South America',
                       'World', 'International', 'Northern Cyprus']
 
+    # OWID data is updated daily
+    CACHE_TTL = 12 * 3600
+
     def __init__(self):
         self.metadata_host = 'https://covid.ourworldindata.org/data/owid-covid-codebook.csv'
         self.metadata = pd.DataFrame()
@@ -62,19 +61,14 @@ class CovidOWiD(Dataset):
 
         try:
             # Fake user agent added to avoid request blockage from server
-            req = Request(host)
-            req.add_header('User-Agent', 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:77.0) Gecko/20100101 Firefox/77.0')
-            content = urlopen(req)
+            headers = {'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:77.0) Gecko/20100101 Firefox/77.0'}
 
             # Load .csv to DataFrame
-            self.data = pd.read_csv(content)
+            self.data = self._download(host, lambda content: pd.read_csv(BytesIO(content)), headers=headers)
 
             # Load .csv metadata
-            req = Request(self.metadata_host)
-            req.add_header('User-Agent', 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:77.0) Gecko/20100101 Firefox/77.0')
-            content = urlopen(req)
-
-            self.metadata = pd.read_csv(content)
+            self.metadata = self._download(self.metadata_host, lambda content: pd.read_csv(BytesIO(content)),
+                                           headers=headers)
 
             success = True
         except Exception as e:
@@ -1,16 +1,30 @@
 
 import pandas as pd
+import requests
 import logging
 
 logger = logging.getLogger('fairisk')
 
 class Dataset:
 
+    CACHE_TTL = None
+    """ Seconds during which cached downloads of this source are used without revalidation (see download_cache). """
+
     def __init__(self):
 
         self.source_str = ''
         self.data = pd.DataFrame()
         self.structured_data = dict()
+        self.download_cache = None
+
+    def _download(self, url, parser, headers=None):
+        '''Downloads url and returns its content converted by parser (through the download cache, if set)'''
+        if self.download_cache is not None:
+            return self.download_cache.read(url, parser, ttl=self.CACHE_TTL, headers=headers)
+
+        response = requests.get(url, headers=headers)
+        response.raise_for_status()
+        return parser(response.content)
 
     def _fetch(self, host='', source_str=''):
         '''To be implemented by each subclass'''
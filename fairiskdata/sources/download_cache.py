@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import requests
+
+import logging
+logger = logging.getLogger('fairisk')
+
+
+class DownloadCache:
+    """
+    Local cache of raw source downloads, keyed by URL. For each URL, the downloaded bytes are kept together with the
+    ETag / Last-Modified validators returned by the server, the time of the last fetch and the parsed object.
+
+    Within the time-to-live (ttl) of an entry, no request is sent at all. Afterwards, a conditional request is sent and
+    when the server answers 304 (Not Modified), neither the download nor the parse are repeated.
+    """
+
+    def __init__(self, cache_dir='output/cache'):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, suffix):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + suffix)
+
+    def _read_meta(self, url):
+        try:
+            with open(self._path(url, '.json')) as f:
+                meta = json.load(f)
+            return meta if os.path.exists(self._path(url, '.bin')) else None
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, url, suffix, write, mode='wb'):
+        # write to a temporary file first, so that an interrupted write never leaves a corrupted entry
+        file_path = self._path(url, suffix)
+        with open(file_path + '.tmp', mode) as f:
+            write(f)
+        os.replace(file_path + '.tmp', file_path)
+
+    def fetch(self, url, ttl=None, headers=None):
+        """
+        Returns the content of the URL, downloading it only when needed.
+        :param url: str
+        :param ttl: float -- seconds during which a cached entry is used without contacting the server
+        :param headers: dict -- additional request headers
+        :return: content: bytes, changed: bool -- whether the content was (re)downloaded
+        """
+        meta = self._read_meta(url)
+
+        if meta is not None and ttl is not None and time.time() - meta['fetched_at'] < ttl:
+            logger.debug('Using cached %s (fetched %.0fs ago)' % (url, time.time() - meta['fetched_at']))
+            with open(self._path(url, '.bin'), 'rb') as f:
+                return f.read(), False
+
+        request_headers = dict(headers or {})
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        response = requests.get(url, headers=request_headers)
+
+        if meta is not None and response.status_code == 304:
+            logger.info('Cached %s was not modified' % url)
+            meta['fetched_at'] = time.time()
+            self._write(url, '.json', lambda f: json.dump(meta, f), mode='w')
+            with open(self._path(url, '.bin'), 'rb') as f:
+                return f.read(), False
+
+        response.raise_for_status()
+        content = response.content
+
+        meta = {'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+                'size': len(content)}
+        self._write(url, '.bin', lambda f: f.write(content))
+        self._write(url, '.json', lambda f: json.dump(meta, f), mode='w')
+        if os.path.exists(self._path(url, '.pkl')):
+            os.remove(self._path(url, '.pkl'))
+        logger.info('Downloaded %s (%d bytes)' % (url, len(content)))
+
+        return content, True
+
+    def read(self, url, parser, ttl=None, headers=None):
+        """
+        Returns the parsed content of the URL. The parsed object is cached as well, so it is only parsed again when
+        the content was (re)downloaded.
+        :param url: str
+        :param parser: callable -- converts the downloaded bytes (e.g. into a pandas.DataFrame)
+        :param ttl: float -- see `fetch`
+        :param headers: dict -- see `fetch`
+        :return: the parsed object
+        """
+        content, changed = self.fetch(url, ttl=ttl, headers=headers)
+
+        if not changed:
+            try:
+                with open(self._path(url, '.pkl'), 'rb') as f:
+                    return pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+
+        parsed = parser(content)
+        self._write(url, '.pkl', lambda f: pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+        return parsed
@@ -8,6 +8,8 @@ logger = logging.getLogger('fairisk')
 
 class EurostatDataset(Dataset):
 
+    CACHE_TTL = 24 * 3600
+
     def __init__(self):
         super().__init__()
 
@@ -34,12 +36,14 @@ class EurostatDataset(Dataset):
                 # create final host
                 fhost = "/".join([host, db_code + query])
 
+                data = self._download(fhost, lambda content:
+                                      pyjstat.Dataset.read(content.decode('utf-8')).write('dataframe'))
                 if index == 0:
                     # Load data to DataFrame
-                    self.data = pyjstat.Dataset.read(fhost).write('dataframe').dropna()
+                    self.data = data.dropna()
                 else:
                     # add DataFrame to existing DataFrame
-                    self.data = self.data.append(pyjstat.Dataset.read(fhost).write('dataframe')).dropna()
+                    self.data = self.data.append(data).dropna()
 
             self.data = self.data.reset_index(drop=True)
 
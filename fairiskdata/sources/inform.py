@@ -1,12 +1,16 @@
 from . import *
 
 import numpy as np
+from io import BytesIO
 
 import logging
 logger = logging.getLogger('fairisk')
 
 class INFORMDataset(Dataset):
 
+    # INFORM Epidemic Risk is a yearly release
+    CACHE_TTL = 30 * 24 * 3600
+
     def __init__(self):
         super().__init__()
 
@@ -26,7 +30,7 @@ class INFORMDataset(Dataset):
 
         try:
             # Load .xlsx to DataFrame
-            self.data = pd.read_excel(host, sheet_name=None)
+            self.data = self._download(host, lambda content: pd.read_excel(BytesIO(content), sheet_name=None))
             success = True
         except Exception as e:
             logger.critical('[%s] Cannot fetch data due to exception: %s' % (self.source_str, e))
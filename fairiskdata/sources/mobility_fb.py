@@ -4,7 +4,6 @@ from hdx.hdx_configuration import Configuration
 from hdx.data.dataset import Dataset as dataset_hdx
 from io import BytesIO
 from zipfile import ZipFile
-import requests
 
 import logging
 logger = logging.getLogger('fairisk')
@@ -15,6 +14,9 @@ class MobilityFbDataset(Dataset):
 
     AGG_METRICS = ['mean', 'std']
 
+    # Movement Range Maps are updated daily
+    CACHE_TTL = 24 * 3600
+
     def __init__(self):
         super().__init__()
 
@@ -29,16 +31,18 @@ class MobilityFbDataset(Dataset):
             Configuration.create(hdx_site='prod', user_agent='FAIRisk', hdx_read_only=True)
             resources = dataset_hdx.read_from_hdx("movement-range-maps").get_resources()
             Configuration.delete()
-            for res in resources:
+            def read_zip(content):
+                file = ZipFile(BytesIO(content))
 
-                if res['name'][-3:] == 'zip':
-                    req = requests.get(res['url'])
-                    file = ZipFile(BytesIO(req.content))
+                names = file.namelist()
+                names.remove('README.txt')
 
-                    names = file.namelist()
-                    names.remove('README.txt')
+                return pd.read_csv(file.open(names[0]), sep='\t', low_memory=False)
 
-                    self.data = pd.read_csv(file.open(names[0]), sep='\t', low_memory=False)
+            for res in resources:
+
+                if res['name'][-3:] == 'zip':
+                    self.data = self._download(res['url'], read_zip)
 
                     success = True
 
@@ -1,10 +1,14 @@
 from . import *
 
+from io import BytesIO
 import logging
 logger = logging.getLogger('fairisk')
 
 class MortalityHMDDataset(Dataset):
 
+    # STMF data is updated weekly
+    CACHE_TTL = 24 * 3600
+
     def __init__(self):
         super().__init__()
 
@@ -19,7 +23,7 @@ class MortalityHMDDataset(Dataset):
 
         try:
             # Load .csv to DataFrame
-            self.data = pd.read_csv(host, comment='#')
+            self.data = self._download(host, lambda content: pd.read_csv(BytesIO(content), comment='#'))
             success = True
         except Exception as e:
             logger.critical('[%s] Cannot fetch data due to exception: %s' % (self.source_str, e))
@@ -1,4 +1,6 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from mergedeep import merge
 import simplejson as json
 
@@ -8,7 +10,16 @@ from .covid_owid import CovidOWiD
 from .gho import GHODataset
 from .mobility_fb import MobilityFbDataset
 from .mortality_hmd import MortalityHMDDataset
+from .download_cache import DownloadCache
+from .artifacts import StructuredArtifacts
 from . import *
+from fairiskdata.storage.columnar import export_columnar
+from fairiskdata.storage.sharded import export_sharded
+from fairiskdata.storage.memmap_store import export_memmap
+from fairiskdata.utils.shared_objects import SharedObject
+
+FILE_FORMATS = ['json', 'parquet', 'sharded', 'memmap']
+""" The supported formats of the exported dataset file. """
 
 PREVALENCE_DICT = {MORTALITY_STR: [MORT_EUROSTAT, MORTALITY],
                    DEMOGRAPHIC_STR: [DEMO_EUROSTAT, COVID, INFORM],
@@ -17,67 +28,162 @@ PREVALENCE_DICT = {MORTALITY_STR: [MORT_EUROSTAT, MORTALITY],
 import logging
 logger = logging.getLogger('fairisk')
 
-def fetch_data(datasets_list=ALL_DATASETS_LIST):
+def create_dataset(dataset_name):
 
-    datasets = dict()
+    # COVID dataset
+    if dataset_name == COVID:
+        return CovidOWiD()
 
-    for dataset_name in datasets_list:
+    # DEMOGRAPHIC EUROSTAT dataset
+    elif dataset_name == DEMO_EUROSTAT:
+        return DemographicEurostatDataset()
 
-        logger.info('Fetching %s data' % dataset_name)
+    # MORTALITY EUROSTAT dataset
+    elif dataset_name == MORT_EUROSTAT:
+        return MortalityEurostatDataset()
 
-        # COVID dataset
-        if dataset_name == COVID:
-            datasets[COVID] = CovidOWiD()
+    # GHO dataset
+    elif dataset_name == GHO:
+        return GHODataset()
 
-        # DEMOGRAPHIC EUROSTAT dataset
-        elif dataset_name == DEMO_EUROSTAT:
-            datasets[DEMO_EUROSTAT] = DemographicEurostatDataset()
+    # INFORM dataset
+    elif dataset_name == INFORM:
+        return INFORMDataset()
 
-        # MORTALITY EUROSTAT dataset
-        elif dataset_name == MORT_EUROSTAT:
-            datasets[MORT_EUROSTAT] = MortalityEurostatDataset()
+    # MOBILITY dataset
+    elif dataset_name == MOBILITY:
+        return MobilityFbDataset()
 
-        # GHO dataset
-        elif dataset_name == GHO:
-            datasets[GHO] = GHODataset()
+    # MORTALITY dataset
+    elif dataset_name == MORTALITY:
+        return MortalityHMDDataset()
 
-        # INFORM dataset
-        elif dataset_name == INFORM:
-            datasets[INFORM] = INFORMDataset()
+    return None
 
-        # MOBILITY dataset
-        elif dataset_name == MOBILITY:
-            datasets[MOBILITY] = MobilityFbDataset()
 
-        # MORTALITY dataset
-        elif dataset_name == MORTALITY:
-            datasets[MORTALITY] = MortalityHMDDataset()
+def _timed_fetch(dataset_name, dataset):
 
-        else:
+    start = time.perf_counter()
+    try:
+        success = dataset.fetch()
+    except Exception as e:
+        # a failing source never stops the others
+        logger.critical('[%s] Fetch failed due to exception: %s' % (dataset_name, e))
+        success = False
+    elapsed = time.perf_counter() - start
+
+    logger.info('Fetched %s data in %.1fs | Success: %s' % (dataset_name, elapsed, success))
+
+    return success, elapsed
+
+
+def fetch_data(datasets_list=ALL_DATASETS_LIST, max_workers=1, cache_dir=None):
+
+    datasets = dict()
+
+    # Raw downloads are kept in cache_dir and only repeated when the sources changed (see download_cache)
+    download_cache = DownloadCache(cache_dir) if cache_dir is not None else None
+
+    for dataset_name in datasets_list:
+        dataset = create_dataset(dataset_name)
+        if dataset is None:
             logger.warning('Skipping unknown dataset: %s' % dataset_name)
             continue
+        dataset.download_cache = download_cache
+        datasets[dataset_name] = dataset
+
+    start = time.perf_counter()
+
+    # Sources are network-bound, so they are fetched concurrently by threads
+    if max_workers > 1 and len(datasets) > 1:
+        logger.info('Fetching %s data with %d workers' % (', '.join(datasets.keys()), max_workers))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {dataset_name: executor.submit(_timed_fetch, dataset_name, dataset)
+                       for dataset_name, dataset in datasets.items()}
+            results = {dataset_name: future.result() for dataset_name, future in futures.items()}
+    else:
+        results = dict()
+        for dataset_name, dataset in datasets.items():
+            logger.info('Fetching %s data' % dataset_name)
+            results[dataset_name] = _timed_fetch(dataset_name, dataset)
+
+    elapsed = time.perf_counter() - start
+
+    if results:
+        slowest = max(results, key=lambda dataset_name: results[dataset_name][1])
+        logger.info('Fetched %d of %d sources in %.1fs (sum of sources: %.1fs, slowest: %s in %.1fs)'
+                    % (sum(success for success, _ in results.values()), len(results), elapsed,
+                       sum(t for _, t in results.values()), slowest, results[slowest][1]))
 
-        success = datasets[dataset_name].fetch()
-        if not success:
-            del datasets[dataset_name]
+    # Keep the order of datasets_list, which defines the merge order
+    return {dataset_name: dataset for dataset_name, dataset in datasets.items() if results[dataset_name][0]}
 
-    return datasets
 
+def _structure_shared_dataset(shared_dataset):
 
-def structure_data(datasets_dict):
+    def structure(dataset):
+        success = dataset.structure()
+        return success, dataset.get_structured_data(), dataset.get_source_str()
+
+    return shared_dataset.load(structure)
+
+
+def structure_data(datasets_dict, max_processes=1, artifacts=None):
 
     datasets_list = list(datasets_dict.keys())
     for dataset_name in datasets_list:
-
         if dataset_name not in ALL_DATASETS_LIST:
             logger.warning('Skipping unknown dataset: %s' % dataset_name)
-            continue
-
-        logger.info('Structuring %s data' % dataset_name)
-
-        success = datasets_dict[dataset_name].structure()
-        if not success:
-            del datasets_dict[dataset_name]
+    datasets_list = [dataset_name for dataset_name in datasets_list if dataset_name in ALL_DATASETS_LIST]
+
+    # Sources whose raw data did not change since the previous run reuse their stored structured data (see artifacts)
+    raw_hashes = dict()
+    if artifacts is not None:
+        for dataset_name in list(datasets_list):
+            raw_hashes[dataset_name] = artifacts.hash_raw_data(datasets_dict[dataset_name].get_data())
+            stored = artifacts.load(dataset_name, raw_hashes[dataset_name])
+            if stored is not None:
+                logger.info('Reusing structured %s data (raw data unchanged)' % dataset_name)
+                datasets_dict[dataset_name].source_str, datasets_dict[dataset_name].structured_data = stored
+                datasets_list.remove(dataset_name)
+
+    if max_processes > 1 and len(datasets_list) > 1:
+        # Structuring is CPU-bound, so each source is structured in its own process. The fetched frames are shared
+        # with the workers through pickle protocol 5 buffers in shared memory (see utils.shared_objects)
+        logger.info('Structuring %s data with %d processes' % (', '.join(datasets_list), max_processes))
+
+        shared = {dataset_name: SharedObject(datasets_dict[dataset_name]) for dataset_name in datasets_list}
+        try:
+            with ProcessPoolExecutor(max_workers=max_processes) as executor:
+                futures = {dataset_name: executor.submit(_structure_shared_dataset, shared_dataset)
+                           for dataset_name, shared_dataset in shared.items()}
+
+                for dataset_name, future in futures.items():
+                    success, structured_data, source_str = future.result()
+                    logger.info('[%s] Structure data | Success: %s' % (source_str, success))
+
+                    if success:
+                        datasets_dict[dataset_name].structured_data = structured_data
+                    else:
+                        del datasets_dict[dataset_name]
+        finally:
+            for shared_dataset in shared.values():
+                shared_dataset.release()
+
+    else:
+        for dataset_name in datasets_list:
+
+            logger.info('Structuring %s data' % dataset_name)
+
+            success = datasets_dict[dataset_name].structure()
+            if not success:
+                del datasets_dict[dataset_name]
+
+    if artifacts is not None:
+        for dataset_name in datasets_list:
+            if dataset_name in datasets_dict:
+                artifacts.save(dataset_name, raw_hashes[dataset_name], datasets_dict[dataset_name].get_source_str(),
+                               datasets_dict[dataset_name].get_structured_data())
 
     return datasets_dict
 
@@ -125,31 +231,80 @@ def set_prevalence(datasets_dict, sources_list):
     return datasets_dict
 
 
-def export_dataset(dataset, json_file_path='output/fairisk_dataset.json'):
+def get_file_format(file_path, file_format=None):
+
+    if file_format is None:
+        if file_path.endswith('.parquet'):
+            file_format = 'parquet'
+        elif file_path.endswith('.shards'):
+            file_format = 'sharded'
+        elif file_path.endswith('.mmap'):
+            file_format = 'memmap'
+        else:
+            file_format = 'json'
+
+    if file_format not in FILE_FORMATS:
+        raise ValueError('Unknown file format %s' % file_format)
+
+    return file_format
+
+
+def export_dataset(dataset, json_file_path='output/fairisk_dataset.json', file_format=None):
+
+    file_format = get_file_format(json_file_path, file_format)
 
     # Create output directory (if it doesn't exist)
     directory = os.path.abspath(os.path.join(json_file_path, os.pardir))
     os.makedirs(directory, exist_ok=True)
 
-    # Save data in json
-    with open(json_file_path, 'w+') as f:
-        json.dump(dataset, f, ignore_nan=True)
-
-    logger.info('Exported FAIRISK_DATASET in %s' % json_file_path)
+    if file_format == 'parquet':
+        # Save data in a directory of parquet tables (values and attributes' metadata)
+        export_columnar(dataset, json_file_path)
+    elif file_format == 'sharded':
+        # Save data in a directory of parquet tables per country and category, with an index
+        export_sharded(dataset, json_file_path)
+    elif file_format == 'memmap':
+        # Save data in a directory with a single float64 file of values, to be memory-mapped
+        export_memmap(dataset, json_file_path)
+    else:
+        # Save data in json
+        with open(json_file_path, 'w+') as f:
+            json.dump(dataset, f, ignore_nan=True)
+
+    logger.info('Exported FAIRISK_DATASET in %s (%s)' % (json_file_path, file_format))
 
     return
 
 
 def fetch_and_export(
         json_file_path="output/fairisk_dataset.json",
-        datasets_list=ALL_DATASETS_LIST):
-    # Fetch data from sources
+        datasets_list=ALL_DATASETS_LIST,
+        file_format=None,
+        max_workers=1,
+        max_processes=1,
+        cache_dir=None,
+        artifacts_dir=None):
+    # Fetch data from sources (concurrently if max_workers > 1, through a download cache if cache_dir is set)
     logger.info('Fetching data from sources')
-    datasets = fetch_data(datasets_list=datasets_list)  # Without GHO (for speed)
+    datasets = fetch_data(datasets_list=datasets_list, max_workers=max_workers, cache_dir=cache_dir)
 
-    # Structure all data according to FAIRisk data model
+    # Structured data of each source is kept in artifacts_dir, and only the sources whose raw data changed are
+    # structured again
+    artifacts = StructuredArtifacts(artifacts_dir) if artifacts_dir is not None else None
+
+    # Structure all data according to FAIRisk data model (in parallel processes if max_processes > 1)
     logger.info('Structure all data according to FAIRisk data model')
-    datasets = structure_data(datasets)
+    datasets = structure_data(datasets, max_processes=max_processes, artifacts=artifacts)
+
+    # Skip merge and export when the same structured data was already exported to the same file
+    if artifacts is not None:
+        manifest = {'file_path': os.path.abspath(json_file_path),
+                    'file_format': get_file_format(json_file_path, file_format),
+                    'sources': [[dataset_name, artifacts.get_meta(dataset_name)['structured_hash']]
+                                for dataset_name in datasets.keys() if dataset_name in ALL_DATASETS_LIST]}
+        if os.path.exists(json_file_path) and artifacts.read_manifest() == manifest:
+            logger.info('No source changed since the last export of %s, skipping merge and export' % json_file_path)
+            return
 
     # Merge all data in single dataset
     logger.info('Merge all data in single dataset')
@@ -159,9 +314,12 @@ def fetch_and_export(
     logger.info('Set prevalence between overlapping datasets')
     fairisk_dataset = set_prevalence(fairisk_dataset, sources_list)
 
-    # Export FAIRisk dataset as .pkl
+    # Export FAIRisk dataset
     logger.info('Exporting data')
-    export_dataset(fairisk_dataset, json_file_path=json_file_path)
+    export_dataset(fairisk_dataset, json_file_path=json_file_path, file_format=file_format)
+
+    if artifacts is not None:
+        artifacts.write_manifest(manifest)
 
 
 if __name__ == '__main__':
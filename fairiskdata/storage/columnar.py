@@ -0,0 +1,217 @@
+import os
+import numpy as np
+import pandas as pd
+
+from fairiskdata.sources import VALUE_STR
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only required by the columnar format
+    pa = None
+    pq = None
+
+import logging
+logger = logging.getLogger('fairisk')
+
+VALUES_FILE = 'values.parquet'
+ATTRIBUTES_FILE = 'attributes.parquet'
+
+ENTRY_COLUMNS = ['country', 'category', 'attribute']
+""" Columns identifying a single attribute entry in both tables of the columnar format. """
+
+
+def _check_pyarrow():
+    if pa is None:
+        raise ImportError('The columnar (parquet) format requires pyarrow. Install it with "pip install pyarrow".')
+
+
+def flatten_dataset(dataset: dict):
+    """
+    Flattens a FAIRisk dataset dictionary into one metadata row per attribute and the concatenation of the time keys
+    and values of all attributes (in the order of the rows).
+    :param dataset: dict
+    :return: rows: List[dict], keys: List[str], values: numpy.ndarray (float64), lengths: List[int]
+    """
+    rows = []
+    keys, values, lengths = [], [], []
+
+    for country, categories in dataset.items():
+        for category, attributes in categories.items():
+            for attribute, attribute_val in attributes.items():
+                rows.append({'country': country, 'category': category, 'attribute': attribute,
+                             **{k: v for k, v in attribute_val.items() if k != VALUE_STR}})
+
+                value = attribute_val.get(VALUE_STR)
+                if isinstance(value, pd.Series):
+                    keys.extend(value.index.astype(str))
+                    values.extend(value.values)
+                    lengths.append(len(value))
+                elif isinstance(value, dict):
+                    keys.extend(str(k) for k in value.keys())
+                    values.extend(value.values())
+                    lengths.append(len(value))
+                else:
+                    lengths.append(0)
+
+    values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype='float64')
+
+    return rows, keys, values, lengths
+
+
+def attributes_frame(rows):
+    """
+    Creates the attributes table from the metadata rows of `flatten_dataset`. The metadata columns keep the order in
+    which the keys first appear in the attribute dictionaries.
+    :param rows: List[dict]
+    :return: attributes: pandas.DataFrame
+    """
+    metadata_cols = [col for col in dict.fromkeys(k for r in rows for k in r) if col not in ENTRY_COLUMNS]
+
+    attributes_df = pd.DataFrame(rows, columns=ENTRY_COLUMNS + metadata_cols)
+    for col in ENTRY_COLUMNS:
+        attributes_df[col] = attributes_df[col].astype('category')
+
+    return attributes_df
+
+
+def dataset_to_frames(dataset: dict):
+    """
+    Flattens a FAIRisk dataset dictionary into two tables: a long table of values (one row per country, category,
+    attribute and time key) and an attributes table holding the remaining metadata of each attribute.
+    Rows of the values table are stored contiguously for each attribute, in the order of the attributes table.
+    :param dataset: dict
+    :return: values: pandas.DataFrame, attributes: pandas.DataFrame
+    """
+    rows, keys, values, lengths = flatten_dataset(dataset)
+
+    attributes_df = attributes_frame(rows)
+
+    entry_ids = np.repeat(np.arange(len(rows)), lengths)
+    values_df = pd.DataFrame({
+        **{col: attributes_df[col].take(entry_ids).values for col in ENTRY_COLUMNS},
+        'key': pd.Categorical(keys),
+        'value': values})
+
+    return values_df, attributes_df
+
+
+def frames_to_dataset(values_df: pd.DataFrame, attributes_df: pd.DataFrame):
+    """
+    Rebuilds the FAIRisk dataset dictionary from the tables created by `dataset_to_frames`. Each VALUE is created as a
+    pandas.Series indexed by the time keys.
+    :param values_df: pandas.DataFrame
+    :param attributes_df: pandas.DataFrame
+    :return: dataset: dict
+    """
+    # Rows are contiguous per attribute, so each attribute is a run of equal (country, category, attribute)
+    codes = np.stack([pd.Categorical(values_df[col]).codes for col in ENTRY_COLUMNS])
+    run_starts = np.flatnonzero(np.r_[True, (np.diff(codes, axis=1) != 0).any(axis=0)]) if len(values_df) else \
+        np.array([], dtype=int)
+    run_stops = np.r_[run_starts[1:], len(values_df)].astype(int)
+
+    first_rows = values_df.iloc[run_starts]
+    runs = {(country, category, attribute): (start, stop) for country, category, attribute, start, stop in
+            zip(first_rows['country'], first_rows['category'], first_rows['attribute'], run_starts, run_stops)}
+
+    keys = pd.Categorical(values_df['key'])
+    key_categories = np.asarray(keys.categories, dtype=object)
+    key_codes = keys.codes
+    value_array = values_df['value'].to_numpy(dtype='float64')
+
+    metadata_cols = [col for col in attributes_df.columns if col not in ENTRY_COLUMNS]
+
+    # Attributes with the same time keys (e.g. all daily COVID series of a country) share a single index object
+    indexes = dict()
+
+    def get_index(start, stop):
+        codes_key = key_codes[start:stop].tobytes()
+        if codes_key not in indexes:
+            indexes[codes_key] = pd.Index(key_categories[key_codes[start:stop]])
+        return indexes[codes_key]
+
+    dataset = dict()
+    for row in attributes_df.itertuples(index=False):
+        country, category, attribute = row[0:3]
+        attribute_val = {col: val for col, val in zip(metadata_cols, row[3:]) if not pd.isna(val)}
+
+        start, stop = runs.get((country, category, attribute), (0, 0))
+        attribute_val[VALUE_STR] = pd.Series(value_array[start:stop], index=get_index(start, stop), copy=False)
+
+        dataset.setdefault(country, dict()).setdefault(category, dict())[attribute] = attribute_val
+
+    return dataset
+
+
+def export_columnar(dataset: dict, dir_path: str):
+    """
+    Exports the dataset in the columnar format: a directory holding a values and an attributes parquet file.
+    :param dataset: dict
+    :param dir_path: str
+    """
+    _check_pyarrow()
+
+    values_df, attributes_df = dataset_to_frames(dataset)
+
+    os.makedirs(dir_path, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(values_df, preserve_index=False), os.path.join(dir_path, VALUES_FILE))
+    pq.write_table(pa.Table.from_pandas(attributes_df, preserve_index=False), os.path.join(dir_path, ATTRIBUTES_FILE))
+
+
+def get_row_filters(countries=None, categories=None, attributes=None):
+    """
+    Builds the parquet row filters (in disjunctive normal form) that select the given countries, categories and
+    attributes. None means no restriction.
+    :param countries: List[str]
+    :param categories: List[str]
+    :param attributes: List[Tuple[str, str]] -- pairs of category and attribute name
+    :return: filters: list | None
+    """
+    conjunction = []
+    if countries is not None:
+        conjunction.append(('country', 'in', list(countries)))
+    if categories is not None:
+        conjunction.append(('category', 'in', list(categories)))
+
+    if attributes is not None:
+        return [conjunction + [('category', '=', category), ('attribute', '=', attribute)]
+                for category, attribute in attributes]
+
+    return [conjunction] if conjunction else None
+
+
+def load_columnar(dir_path: str, countries=None, categories=None, attributes=None):
+    """
+    Loads a dataset exported with `export_columnar`. Only rows of the given countries, categories and attributes are
+    read (None means all).
+    :param dir_path: str
+    :param countries: List[str]
+    :param categories: List[str]
+    :param attributes: List[Tuple[str, str]]
+    :return: dataset: dict
+    """
+    _check_pyarrow()
+
+    if any(selection is not None and len(selection) == 0 for selection in (countries, categories, attributes)):
+        return dict()
+
+    return frames_to_dataset(*read_columnar(dir_path, countries, categories, attributes))
+
+
+def read_columnar(dir_path: str, countries=None, categories=None, attributes=None):
+    """
+    Reads the tables of a dataset exported with `export_columnar`, with the rows of the given countries, categories
+    and attributes only (None means all, selections must not be empty).
+    :param dir_path: str
+    :param countries: List[str]
+    :param categories: List[str]
+    :param attributes: List[Tuple[str, str]]
+    :return: values: pandas.DataFrame, attributes: pandas.DataFrame
+    """
+    _check_pyarrow()
+
+    filters = get_row_filters(countries, categories, attributes)
+    values_df = pq.read_table(os.path.join(dir_path, VALUES_FILE), filters=filters).to_pandas()
+    attributes_df = pq.read_table(os.path.join(dir_path, ATTRIBUTES_FILE), filters=filters).to_pandas()
+
+    return values_df, attributes_df
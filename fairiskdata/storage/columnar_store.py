@@ -0,0 +1,496 @@
+import numpy as np
+import pandas as pd
+
+from fairiskdata.sources import VALUE_STR
+from fairiskdata.storage.columnar import ENTRY_COLUMNS, flatten_dataset, attributes_frame
+from fairiskdata.utils.age_parsers import safe_parse_age_group, do_ranges_overlap
+from fairiskdata.utils.time_index import TimeIndex, set_time_index
+from fairiskdata.utils.attribute_index import AttributeIndex
+from fairiskdata.utils.missingness import MissingnessMatrix
+
+import logging
+logger = logging.getLogger('fairisk')
+
+
+class ColumnarStore:
+    """
+    In-memory columnar representation of a FAIRisk dataset. The metadata of each (country, category, attribute) is a
+    row of the `attributes` table, and the data points of all attributes are stored in typed arrays (the entry of
+    each point, its time key as a categorical and its float64 value), contiguously per attribute and in the order of
+    the table.
+
+    Getters, filters, resampling and exports of `FAIRiskDataset` run as vectorized operations on these arrays. Filters
+    return a new store. The dataset dictionary is only created by `to_dict`.
+    """
+
+    def __init__(self, attributes: pd.DataFrame, entry_ids: np.ndarray, keys: pd.Categorical, values: np.ndarray,
+                 key_index: TimeIndex = None, bounds: tuple = None):
+        self.attributes = attributes.reset_index(drop=True)
+        self.entry_ids = entry_ids
+        self.keys = keys
+        self.values = values
+
+        # typed time index of the categories of keys (shared between stores with the same categories)
+        self._key_index = key_index
+        # time bounds of each entry (kept by filters which do not change the data points of the entries)
+        self._bounds = bounds
+        # stores are not changed, so the index of their entries and their missingness matrix are created once
+        self._attribute_index = None
+        self._missingness = None
+        # set when views refer to the arrays of the store (see `FAIRiskDataset.view`)
+        self.shared = False
+
+    @staticmethod
+    def from_dict(dataset: dict):
+        """
+        :param dataset: dict -- a FAIRisk dataset dictionary (VALUEs as pandas.Series or dicts)
+        :return: ColumnarStore
+        """
+        rows, keys, values, lengths = flatten_dataset(dataset)
+        entry_ids = np.repeat(np.arange(len(rows)), lengths)
+        return ColumnarStore(attributes_frame(rows), entry_ids, pd.Categorical(keys), values)
+
+    @staticmethod
+    def from_frames(values_df: pd.DataFrame, attributes_df: pd.DataFrame):
+        """
+        :param values_df: pandas.DataFrame -- the values table of the columnar format (see storage.columnar)
+        :param attributes_df: pandas.DataFrame -- the attributes table of the columnar format
+        :return: ColumnarStore
+        """
+        entries = pd.MultiIndex.from_frame(attributes_df[ENTRY_COLUMNS].astype(object))
+        entry_ids = entries.get_indexer(pd.MultiIndex.from_frame(values_df[ENTRY_COLUMNS].astype(object)))
+
+        # values of attributes missing from the attributes table are dropped, the others are kept contiguous
+        order = np.argsort(entry_ids, kind='stable')
+        order = order[entry_ids[order] >= 0]
+
+        return ColumnarStore(attributes_df, entry_ids[order], pd.Categorical(values_df['key'])[order],
+                             values_df['value'].to_numpy(dtype='float64')[order])
+
+    def __len__(self):
+        return len(self.attributes)
+
+    # HELPERS
+    def _column(self, col):
+        return self.attributes[col].to_numpy(dtype=object) if col in self.attributes else \
+            np.full(len(self.attributes), np.nan, dtype=object)
+
+    def _is_series(self):
+        # attributes with FREQUENCY are time series
+        return self.attributes['FREQUENCY'].notna().to_numpy() if 'FREQUENCY' in self.attributes else \
+            np.zeros(len(self.attributes), dtype=bool)
+
+    def _lengths(self):
+        return np.bincount(self.entry_ids, minlength=len(self.attributes))
+
+    def _offsets(self, lengths):
+        return np.r_[0, np.cumsum(lengths)[:-1]].astype(int) if len(lengths) else np.zeros(0, dtype=int)
+
+    def _complete(self, rows):
+        # attributes without missing values in the selected data points
+        return np.bincount(self.entry_ids, weights=np.isnan(self.values) & rows, minlength=len(self.attributes)) == 0
+
+    def _attribute_pairs(self):
+        return pd.MultiIndex.from_arrays([self._column('category'), self._column('attribute')])
+
+    def _get_key_index(self):
+        # each distinct time key is parsed once
+        if self._key_index is None:
+            self._key_index = TimeIndex.parse(self.keys.categories)
+        return self._key_index
+
+    # SELECTIONS
+    # Filters are computed as selections: a mask of the entries and a mask of the data points of the store (which
+    # includes only points of selected entries). Each filter narrows a selection, and `compact` creates the store of a
+    # selection. A `ColumnarView` keeps the selection instead, sharing the arrays of the store.
+    def select_all(self):
+        return np.ones(len(self.attributes), dtype=bool), np.ones(len(self.values), dtype=bool)
+
+    def compact(self, selection):
+        """
+        :param selection: (numpy.ndarray, numpy.ndarray) -- masks of the entries and of the data points
+        :return: ColumnarStore -- the store with the selected entries and data points
+        """
+        entries, rows = selection
+        whole_entries = np.array_equal(rows, entries[self.entry_ids])
+        if whole_entries and entries.all():
+            return self
+
+        new_ids = np.cumsum(entries) - 1
+        bounds = None if self._bounds is None or not whole_entries else \
+            (self._bounds[0][entries], self._bounds[1][entries])
+
+        return ColumnarStore(self.attributes[entries], new_ids[self.entry_ids[rows]], self.keys[rows],
+                             self.values[rows], self._key_index, bounds)
+
+    def copy(self):
+        """
+        :return: ColumnarStore -- a store with copies of the arrays of this one
+        """
+        bounds = None if self._bounds is None else (self._bounds[0].copy(), self._bounds[1].copy())
+        return ColumnarStore(self.attributes.copy(), self.entry_ids.copy(), self.keys.copy(), self.values.copy(),
+                             self._key_index, bounds)
+
+    def _narrow(self, selection, entry_mask=None, row_mask=None, clean=False):
+        """
+        Narrows a selection to the entries of `entry_mask` and, within them, the data points of `row_mask`.
+        When `clean` is set, categories of a country left without data are removed as well (see
+        `FAIRiskDataset._clean_empty_entries`).
+        """
+        entries, rows = selection
+        if entry_mask is not None:
+            entries = entries & entry_mask
+            rows = rows & entries[self.entry_ids]
+        if row_mask is not None:
+            rows = rows & row_mask
+
+        if clean:
+            entries = entries & self._non_empty_categories(selection[0], entries, rows)
+            rows = rows & entries[self.entry_ids]
+
+        return entries, rows
+
+    def _non_empty_categories(self, previous_entries, entries, rows):
+        lengths = np.bincount(self.entry_ids[rows], minlength=len(self.attributes))
+        groups = self.attributes.groupby(['country', 'category'], sort=False, observed=True).ngroup().to_numpy()
+        n_groups = groups.max() + 1 if len(groups) else 0
+
+        non_empty = np.zeros(n_groups, dtype=bool)
+        non_empty[groups[entries & (lengths > 0)]] = True
+        # only categories which were selected are reported
+        selected = np.zeros(n_groups, dtype=bool)
+        selected[groups[previous_entries]] = True
+
+        if not non_empty[selected].all():
+            group_frame = self.attributes[['country', 'category']].drop_duplicates()
+            countries = group_frame['country'].to_numpy(dtype=object)
+            categories = group_frame['category'].to_numpy(dtype=object)
+
+            remaining = set(countries[non_empty])
+            empty_by_country = dict()
+            emptied = selected & ~non_empty
+            for country, category in zip(countries[emptied], categories[emptied]):
+                empty_by_country.setdefault(country, []).append(category)
+
+            for country, empty in empty_by_country.items():
+                if country in remaining:
+                    logger.warning('%s no longer has %s data.' % (country, ", ".join(empty)))
+                else:
+                    logger.warning('%s has been erased as it no longer had data.' % country)
+
+        return non_empty[groups]
+
+    # GETTERS
+    def _get_bounds(self, rows=None):
+        # earliest start and latest end of the keys of each time series (NaT for other entries), computed once for the
+        # whole store, or for the data points of `rows`
+        if rows is None and self._bounds is not None:
+            return self._bounds
+
+        key_index = self._get_key_index()
+        valid = self._is_series()[self.entry_ids] & key_index.valid[self.keys.codes]
+        if rows is not None:
+            valid &= rows
+        start = np.where(valid, key_index.start.view('int64')[self.keys.codes], np.iinfo('int64').max)
+        end = np.where(valid, key_index.end.view('int64')[self.keys.codes], pd.NaT.value)
+
+        # the data points of each entry are contiguous
+        lengths = self._lengths()
+        non_empty = lengths > 0
+        offsets = self._offsets(lengths)[non_empty]
+
+        entry_start = np.full(len(self.attributes), pd.NaT.value, dtype='int64')
+        entry_end = np.full(len(self.attributes), pd.NaT.value, dtype='int64')
+        if len(offsets):
+            entry_start[non_empty] = np.minimum.reduceat(start, offsets)
+            entry_end[non_empty] = np.maximum.reduceat(end, offsets)
+        entry_start[entry_end == pd.NaT.value] = pd.NaT.value
+
+        bounds = entry_start.view('datetime64[ns]'), entry_end.view('datetime64[ns]')
+        if rows is None:
+            self._bounds = bounds
+        return bounds
+
+    def get_bounds(self, countries=None, categories=None, selection=None):
+        """
+        :param selection: (numpy.ndarray, numpy.ndarray) -- if given, only the selected data is considered (see
+        SELECTIONS)
+        :return: (numpy.datetime64, numpy.datetime64) | (None, None) -- the earliest start and the latest end of the
+        time series of the given countries and categories (see `FAIRiskDataset.get_interval`)
+        """
+        if selection is None:
+            start, end = self._get_bounds()
+            mask = ~np.isnat(start)
+        else:
+            entries, rows = selection
+            # the cached bounds hold while whole entries are selected
+            start, end = self._get_bounds() if np.array_equal(rows, entries[self.entry_ids]) else \
+                self._get_bounds(rows)
+            mask = ~np.isnat(start) & entries
+
+        if countries is not None:
+            mask &= self.attributes['country'].isin(countries).to_numpy()
+        if categories is not None:
+            mask &= self.attributes['category'].isin(categories).to_numpy()
+
+        if not mask.any():
+            return None, None
+        return start[mask].min(), end[mask].max()
+
+    def get_missingness(self, selection=None):
+        """
+        :param selection: (numpy.ndarray, numpy.ndarray) -- if given, only the selected data is considered (see
+        SELECTIONS)
+        :return: MissingnessMatrix -- of the entries of the store, created once, or of the selected ones
+        """
+        if selection is None and self._missingness is not None:
+            return self._missingness
+
+        entries, rows = self.select_all() if selection is None else selection
+        missingness = MissingnessMatrix.from_entries(self._column('country')[entries],
+                                                     self._column('category')[entries],
+                                                     self._column('attribute')[entries],
+                                                     self._complete(rows)[entries])
+        if selection is None:
+            self._missingness = missingness
+        return missingness
+
+    def get_category(self, country, category, selection=None):
+        """
+        :param selection: (numpy.ndarray, numpy.ndarray) -- if given, only the selected data is considered (see
+        SELECTIONS)
+        :return: dict -- the attributes of a country and category, as in the dataset dictionary (see `to_dict`)
+        """
+        entry_mask = ((self._column('country') == country) & (self._column('category') == category))
+        dataset = self.compact(self._narrow(self.select_all() if selection is None else selection,
+                                            entry_mask)).to_dict()
+        return dataset.get(country, {}).get(category, {})
+
+    def get_attribute_index(self):
+        """
+        :return: AttributeIndex -- of the entries of the store, created once (see `FAIRiskDataset.get_attributes`)
+        """
+        if self._attribute_index is None:
+            self._attribute_index = AttributeIndex(zip(self._column('country'), self._column('category'),
+                                                       self._column('attribute')))
+        return self._attribute_index
+
+    # FILTERS
+    # (each filter of `FAIRiskDataset` narrows a selection, see SELECTIONS)
+    def select_countries(self, selection, countries):
+        keep = self.attributes['country'].isin(countries).to_numpy()
+
+        del_countries = list(pd.unique(self._column('country')[selection[0] & ~keep]))
+        logger.debug(f'{del_countries} countries erased from the dataset.')
+        logger.info(f'{len(del_countries)} countries erased from the dataset.')
+
+        return self._narrow(selection, keep)
+
+    def select_categories(self, selection, categories):
+        return self._narrow(selection, self.attributes['category'].isin(categories).to_numpy(), clean=True)
+
+    def select_attributes(self, selection, attributes):
+        return self._narrow(selection, self._attribute_pairs().isin(list(attributes)), clean=True)
+
+    def select_time_interval(self, selection, time_interval: pd.Interval):
+        # each distinct time key is validated once
+        valid_keys = self._get_key_index().overlaps(time_interval)
+        row_mask = ~self._is_series()[self.entry_ids] | valid_keys[self.keys.codes]
+
+        return self._narrow(selection, row_mask=row_mask, clean=True)
+
+    def select_age_group(self, selection, age_group):
+        names = self.attributes['attribute'].astype('category')
+        discard = np.array([parsed is not None and not do_ranges_overlap(parsed, age_group)
+                            for parsed in map(safe_parse_age_group, names.cat.categories)], dtype=bool)
+
+        return self._narrow(selection, ~discard[names.cat.codes.to_numpy()], clean=True)
+
+    def select_countries_with_missing_values_on_attributes(self, selection, attributes):
+        erased = self.get_missingness(selection).get_countries_missing_any(attributes)
+        for country in erased:
+            logger.warning('%s has been erased as it contained missing values on at least one of the selected '
+                           'attributes.' % country)
+
+        return self._narrow(selection, ~self.attributes['country'].isin(erased).to_numpy())
+
+    def select_countries_missing_value_attributes_below(self, selection, count):
+        erased = self.get_missingness(selection).get_countries_missing_above(count)
+        for country in erased:
+            logger.warning('%s has be erased as it contained more than %d missing attributes.' % (country, count))
+
+        return self._narrow(selection, ~self.attributes['country'].isin(erased).to_numpy())
+
+    def select_attributes_with_countries_nan_below(self, selection, count):
+        remove = self.get_missingness(selection).get_attributes_missing_above(count)
+
+        logger.debug(f'Removing {len(remove)} for having a number of countries with missing values above {count}')
+
+        return self._narrow(selection, ~self._attribute_pairs().isin(remove))
+
+    def filter_countries(self, countries):
+        return self.compact(self.select_countries(self.select_all(), countries))
+
+    def filter_categories(self, categories):
+        return self.compact(self.select_categories(self.select_all(), categories))
+
+    def filter_attributes(self, attributes):
+        return self.compact(self.select_attributes(self.select_all(), attributes))
+
+    def filter_time_interval(self, time_interval: pd.Interval):
+        return self.compact(self.select_time_interval(self.select_all(), time_interval))
+
+    def filter_age_group(self, age_group):
+        return self.compact(self.select_age_group(self.select_all(), age_group))
+
+    def filter_countries_with_missing_values_on_attributes(self, attributes):
+        return self.compact(self.select_countries_with_missing_values_on_attributes(self.select_all(), attributes))
+
+    def filter_countries_missing_value_attributes_below(self, count):
+        return self.compact(self.select_countries_missing_value_attributes_below(self.select_all(), count))
+
+    def filter_attributes_with_countries_nan_below(self, count):
+        return self.compact(self.select_attributes_with_countries_nan_below(self.select_all(), count))
+
+    # RESAMPLERS
+    def resample(self, resampler, frequency: str, max_processes: int = 1):
+        """
+        Resamples all time series (except those of UNDEFINED frequency) with a `preprocessing.resampling.Resampler`.
+        :param resampler: Resampler
+        :param frequency: str -- the target frequency
+        :param max_processes: int -- with more than one, the series of each country are resampled in a pool of processes
+        (see `Resampler.resample_all`)
+        :return: ColumnarStore
+        """
+        frequencies = self._column('FREQUENCY')
+        series_types = self._column('SERIES_TYPE')
+        resampled = np.flatnonzero(self._is_series() & (frequencies != 'UNDEFINED'))
+
+        lengths = self._lengths()
+        offsets = self._offsets(lengths)
+        key_categories = np.asarray(self.keys.categories, dtype=object)
+        key_index = self._get_key_index()
+
+        time_series = []
+        for entry in resampled:
+            start, stop = offsets[entry], offsets[entry] + lengths[entry]
+            series = pd.Series(self.values[start:stop], index=key_categories[self.keys.codes[start:stop]])
+            # the keys of the store are parsed once
+            set_time_index(series.index, key_index.take(self.keys.codes[start:stop]))
+            time_series.append(series)
+        new_series = resampler.resample_all(time_series, frequencies[resampled], series_types[resampled],
+                                            partitions=self._column('country')[resampled],
+                                            max_processes=max_processes)
+
+        keys, values, new_lengths = [], [], lengths.copy()
+        position = 0
+        for entry, series in zip(resampled, new_series):
+            # data points of the attributes before this one are kept as they are
+            keys.append(key_categories[self.keys.codes[position:offsets[entry]]])
+            values.append(self.values[position:offsets[entry]])
+
+            keys.append(np.asarray(series.index, dtype=object))
+            values.append(series.to_numpy(dtype='float64'))
+            new_lengths[entry] = len(series)
+            position = offsets[entry] + lengths[entry]
+
+        keys.append(key_categories[self.keys.codes[position:]])
+        values.append(self.values[position:])
+
+        attributes = self.attributes.copy()
+        if len(resampled):
+            attributes.loc[resampled, 'FREQUENCY'] = frequency
+
+        return ColumnarStore(attributes, np.repeat(np.arange(len(attributes)), new_lengths),
+                             pd.Categorical(np.concatenate(keys)), np.concatenate(values))
+
+    # EXPORTERS
+    def export_all(self):
+        metadata_cols = [col for col in self.attributes.columns if col not in ENTRY_COLUMNS]
+        rows = self.attributes.take(self.entry_ids)
+
+        # as in the dictionary, metadata which no exported attribute has is not a column
+        return pd.DataFrame({
+            **{col: rows[col].to_numpy(dtype=object) for col in ENTRY_COLUMNS},
+            **{col: rows[col].to_numpy() for col in metadata_cols if rows[col].notna().any()},
+            'key': np.asarray(self.keys, dtype=object),
+            'value': self.values})
+
+    def export_parameters(self, column_separator=':'):
+        lengths = self._lengths()
+        rows = ~self._is_series()[self.entry_ids]
+        entry_ids = self.entry_ids[rows]
+
+        names = pd.Series(self._column('category')) + column_separator + pd.Series(self._column('attribute'))
+        row_names = names.to_numpy(dtype=object)[entry_ids]
+        with_key = lengths[entry_ids] > 1
+        row_names[with_key] = row_names[with_key] + column_separator + np.asarray(self.keys[rows][with_key],
+                                                                                   dtype=object)
+
+        countries = pd.unique(self._column('country'))
+        country_codes = pd.Index(countries).get_indexer(self._column('country')[entry_ids])
+        column_codes, columns = pd.factorize(row_names)
+
+        table = np.full((len(countries), len(columns)), np.nan)
+        table[country_codes, column_codes] = self.values[rows]
+
+        return pd.concat([pd.DataFrame({'country': countries}),
+                          pd.DataFrame(table, columns=list(columns))], axis=1)
+
+    def export_timeseries(self, column_separator=':'):
+        rows = self._is_series()[self.entry_ids]
+        entry_ids = self.entry_ids[rows]
+
+        names = pd.Series(self._column('category')) + column_separator + pd.Series(self._column('attribute'))
+        column_codes, columns = pd.factorize(names.to_numpy(dtype=object)[entry_ids])
+        timestamp_codes, timestamps = pd.factorize(np.asarray(self.keys[rows], dtype=object))
+
+        countries = pd.unique(self._column('country'))
+        country_codes = pd.Index(countries).get_indexer(self._column('country')[entry_ids])
+
+        # one row per timestamp and country
+        table = np.full((len(timestamps) * len(countries), len(columns)), np.nan)
+        table[timestamp_codes * len(countries) + country_codes, column_codes] = self.values[rows]
+
+        parsed = self._get_key_index().take(self.keys.categories.get_indexer(timestamps)).sortable()
+
+        return pd.concat([pd.DataFrame({'country': np.tile(np.asarray(countries, dtype=object), len(timestamps)),
+                                        'timestamp': np.repeat(np.asarray(timestamps, dtype=object), len(countries)),
+                                        'parsed_timestamp': np.repeat(np.asarray(parsed, dtype=object),
+                                                                      len(countries))}),
+                          pd.DataFrame(table, columns=list(columns))], axis=1).sort_values('parsed_timestamp')
+
+    def to_dict(self):
+        """
+        Creates the FAIRisk dataset dictionary. Each VALUE is a pandas.Series (a view of the values array), and
+        attributes with the same time keys share a single index object, whose time index is already set (see
+        utils.time_index.get_time_index).
+        :return: dataset: dict
+        """
+        lengths = self._lengths()
+        offsets = self._offsets(lengths)
+        key_categories = np.asarray(self.keys.categories, dtype=object)
+        key_index = self._get_key_index()
+        key_codes = self.keys.codes
+        metadata_cols = [col for col in self.attributes.columns if col not in ENTRY_COLUMNS]
+
+        indexes = dict()
+
+        def get_index(start, stop):
+            codes_key = key_codes[start:stop].tobytes()
+            if codes_key not in indexes:
+                indexes[codes_key] = pd.Index(key_categories[key_codes[start:stop]])
+                # the keys of the store are parsed once
+                set_time_index(indexes[codes_key], key_index.take(key_codes[start:stop]))
+            return indexes[codes_key]
+
+        dataset = dict()
+        for row, start, length in zip(self.attributes.itertuples(index=False), offsets, lengths):
+            country, category, attribute = row[0:3]
+            attribute_val = {col: val for col, val in zip(metadata_cols, row[3:]) if not pd.isna(val)}
+            attribute_val[VALUE_STR] = pd.Series(self.values[start:start + length],
+                                                 index=get_index(start, start + length), copy=False)
+
+            dataset.setdefault(country, dict()).setdefault(category, dict())[attribute] = attribute_val
+
+        return dataset
@@ -0,0 +1,64 @@
+from fairiskdata.storage.columnar_store import ColumnarStore
+
+
+class ColumnarView:
+    """
+    Selection of the entries and data points of a `ColumnarStore`, kept as two boolean masks and sharing the arrays of
+    the store (see `FAIRiskDataset.view`). Filters narrow the masks, and the selected data is only copied into a new
+    store by `compact`, e.g. to create the dataset dictionary or to export it.
+    """
+
+    def __init__(self, store: ColumnarStore, selection=None):
+        self.store = store
+        self.selection = store.select_all() if selection is None else selection
+
+    def __len__(self):
+        return int(self.selection[0].sum())
+
+    def compact(self):
+        """
+        :return: ColumnarStore -- the store of the selected data, which never shares the arrays of the store of the
+        view (the dictionary of a store refers to its values, see `ColumnarStore.to_dict`)
+        """
+        compacted = self.store.compact(self.selection)
+        return compacted.copy() if compacted is self.store else compacted
+
+    def to_dict(self):
+        return self.compact().to_dict()
+
+    def get_bounds(self, countries=None, categories=None):
+        return self.store.get_bounds(countries, categories, self.selection)
+
+    def get_missingness(self):
+        return self.store.get_missingness(self.selection)
+
+    def get_category(self, country, category):
+        return self.store.get_category(country, category, self.selection)
+
+    # FILTERS (see the corresponding methods of ColumnarStore)
+    def filter_countries(self, countries):
+        return ColumnarView(self.store, self.store.select_countries(self.selection, countries))
+
+    def filter_categories(self, categories):
+        return ColumnarView(self.store, self.store.select_categories(self.selection, categories))
+
+    def filter_attributes(self, attributes):
+        return ColumnarView(self.store, self.store.select_attributes(self.selection, attributes))
+
+    def filter_time_interval(self, time_interval):
+        return ColumnarView(self.store, self.store.select_time_interval(self.selection, time_interval))
+
+    def filter_age_group(self, age_group):
+        return ColumnarView(self.store, self.store.select_age_group(self.selection, age_group))
+
+    def filter_countries_with_missing_values_on_attributes(self, attributes):
+        return ColumnarView(self.store,
+                            self.store.select_countries_with_missing_values_on_attributes(self.selection, attributes))
+
+    def filter_countries_missing_value_attributes_below(self, count):
+        return ColumnarView(self.store,
+                            self.store.select_countries_missing_value_attributes_below(self.selection, count))
+
+    def filter_attributes_with_countries_nan_below(self, count):
+        return ColumnarView(self.store,
+                            self.store.select_attributes_with_countries_nan_below(self.selection, count))
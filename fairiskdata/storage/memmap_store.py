@@ -0,0 +1,121 @@
+import os
+import copy
+import json
+import numpy as np
+import pandas as pd
+
+from fairiskdata.sources import VALUE_STR
+from fairiskdata.storage.columnar import flatten_dataset
+
+import logging
+logger = logging.getLogger('fairisk')
+
+VALUES_FILE = 'values.f8'
+KEY_IDS_FILE = 'key_ids.i4'
+INDEX_FILE = 'index.json'
+
+
+def export_memmap(dataset: dict, dir_path: str):
+    """
+    Exports the dataset as a memory-mappable store: all VALUEs concatenated in a single float64 file, the time key
+    of each value as an integer id into a shared dictionary of time keys, and a json index with the metadata, offset
+    and length of each (country, category, attribute).
+    :param dataset: dict
+    :param dir_path: str
+    """
+    rows, keys, values, lengths = flatten_dataset(dataset)
+
+    time_keys, key_ids = np.unique(np.asarray(keys, dtype=object), return_inverse=True) if keys else ([], [])
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]] if lengths else []
+
+    os.makedirs(dir_path, exist_ok=True)
+    np.asarray(values, dtype='<f8').tofile(os.path.join(dir_path, VALUES_FILE))
+    np.asarray(key_ids, dtype='<i4').tofile(os.path.join(dir_path, KEY_IDS_FILE))
+
+    entries = [dict(row, offset=int(offset), length=int(length)) for row, offset, length in zip(rows, offsets, lengths)]
+    with open(os.path.join(dir_path, INDEX_FILE), 'w+') as f:
+        json.dump({'time_keys': list(time_keys), 'entries': entries}, f)
+
+    logger.info('Exported %d values of %d attributes in %s' % (len(values), len(entries), dir_path))
+
+
+class MemmapStore:
+    """
+    Read access to a store exported with `export_memmap`. VALUEs are memory-mapped (copy-on-write), so processes
+    opening the same store share the page cache, and each time series is a view of the mapped file.
+    """
+
+    def __init__(self, dir_path: str):
+        self.dir_path = dir_path
+
+        with open(os.path.join(dir_path, INDEX_FILE)) as f:
+            index = json.load(f)
+
+        self.time_keys = np.asarray(index['time_keys'], dtype=object)
+        self.entries = index['entries']
+
+        self.values = self._open(VALUES_FILE, '<f8')
+        self.key_ids = self._open(KEY_IDS_FILE, '<i4')
+
+        self._indexes = dict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _open(self, file_name, dtype):
+        file_path = os.path.join(self.dir_path, file_name)
+        # numpy cannot map empty files
+        if os.path.getsize(file_path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(file_path, dtype=dtype, mode='c')
+
+    def select(self, countries=None, categories=None, attributes=None):
+        """
+        Returns a store restricted to the given countries, categories and attributes (None means all). The mapped
+        files are shared with this store.
+        :param countries: List[str]
+        :param categories: List[str]
+        :param attributes: List[Tuple[str, str]] -- pairs of category and attribute name
+        :return: MemmapStore
+        """
+        attributes = set(attributes) if attributes is not None else None
+        entries = [e for e in self.entries
+                   if (countries is None or e['country'] in countries) and
+                   (categories is None or e['category'] in categories) and
+                   (attributes is None or (e['category'], e['attribute']) in attributes)]
+
+        store = copy.copy(self)
+        store.entries = entries
+        return store
+
+    def _get_index(self, offset, length):
+        # Series with the same time keys share a single index object
+        ids = self.key_ids[offset:offset + length]
+        ids_key = ids.tobytes()
+        if ids_key not in self._indexes:
+            self._indexes[ids_key] = pd.Index(self.time_keys[ids])
+        return self._indexes[ids_key]
+
+    def get_series(self, entry: dict):
+        """
+        Creates the VALUE of an entry as a pandas.Series viewing the mapped values (no copy).
+        :param entry: dict
+        :return: pandas.Series
+        """
+        offset, length = entry['offset'], entry['length']
+        return pd.Series(self.values[offset:offset + length], index=self._get_index(offset, length), copy=False)
+
+    def to_dict(self):
+        """
+        Creates the FAIRisk dataset dictionary of the store entries, with VALUEs viewing the mapped values.
+        :return: dataset: dict
+        """
+        dataset = dict()
+        for entry in self.entries:
+            attribute_val = {k: v for k, v in entry.items() if k not in ('country', 'category', 'attribute',
+                                                                          'offset', 'length') and v is not None}
+            attribute_val[VALUE_STR] = self.get_series(entry)
+            dataset.setdefault(entry['country'], dict()).setdefault(entry['category'], dict())[
+                entry['attribute']] = attribute_val
+
+        return dataset
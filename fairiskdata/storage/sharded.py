@@ -0,0 +1,86 @@
+import os
+import json
+
+from fairiskdata.storage.columnar import export_columnar, load_columnar
+
+import logging
+logger = logging.getLogger('fairisk')
+
+INDEX_FILE = 'index.json'
+SHARDS_DIR = 'shards'
+
+
+def export_sharded(dataset: dict, dir_path: str):
+    """
+    Exports the dataset as one columnar shard (see `storage.columnar`) per country and category, plus a small json
+    index listing the country, category and attributes of each shard.
+    :param dataset: dict
+    :param dir_path: str
+    """
+    shards = []
+    for country, categories in dataset.items():
+        for category, attributes in categories.items():
+            shard_path = os.path.join(SHARDS_DIR, '%05d' % len(shards))
+            export_columnar({country: {category: attributes}}, os.path.join(dir_path, shard_path))
+            shards.append({'country': country, 'category': category, 'path': shard_path,
+                           'attributes': list(attributes.keys())})
+
+    # The index is written last, so that an interrupted export does not leave a readable partial store
+    with open(os.path.join(dir_path, INDEX_FILE), 'w+') as f:
+        json.dump({'shards': shards}, f)
+
+    logger.info('Exported %d shards in %s' % (len(shards), dir_path))
+
+
+def read_index(dir_path: str):
+    """
+    Reads the list of shards of a sharded store.
+    :param dir_path: str
+    :return: shards: List[dict]
+    """
+    with open(os.path.join(dir_path, INDEX_FILE)) as f:
+        return json.load(f)['shards']
+
+
+def load_sharded(dir_path: str, countries=None, categories=None, attributes=None):
+    """
+    Loads a dataset exported with `export_sharded`. Only the shards of the given countries, categories and attributes
+    are opened (None means all).
+    :param dir_path: str
+    :param countries: List[str]
+    :param categories: List[str]
+    :param attributes: List[Tuple[str, str]] -- pairs of category and attribute name
+    :return: dataset: dict
+    """
+    attributes_by_category = None
+    if attributes is not None:
+        attributes_by_category = dict()
+        for category, attribute in attributes:
+            attributes_by_category.setdefault(category, set()).add(attribute)
+
+    dataset = dict()
+    n_shards = 0
+    for shard in read_index(dir_path):
+        if countries is not None and shard['country'] not in countries:
+            continue
+        if categories is not None and shard['category'] not in categories:
+            continue
+
+        shard_attributes = None
+        if attributes_by_category is not None:
+            shard_attributes = [(shard['category'], a) for a in shard['attributes']
+                                if a in attributes_by_category.get(shard['category'], ())]
+            if not shard_attributes:
+                continue
+            # all attributes of the shard are requested, no need to filter its rows
+            if len(shard_attributes) == len(shard['attributes']):
+                shard_attributes = None
+
+        shard_dataset = load_columnar(os.path.join(dir_path, shard['path']), attributes=shard_attributes)
+        for country, shard_categories in shard_dataset.items():
+            dataset.setdefault(country, dict()).update(shard_categories)
+        n_shards += 1
+
+    logger.debug('Loaded %d shards from %s' % (n_shards, dir_path))
+
+    return dataset
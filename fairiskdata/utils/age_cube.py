@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from fairiskdata.utils.age_parsers import safe_parse_age_group
+from fairiskdata.utils.parsers import safe_parse_sex
+from fairiskdata.utils.time_index import get_time_index
+
+
+class AgeCube:
+    """
+    Age band x sex x time array of the attributes of a category of a country whose names encode an age group and a
+    sex (e.g. 'From 5 to 9 years_Males', 'D65_74_m' or '15-64_Total' in DEMOGRAPHIC and MORTALITY). The age groups are
+    parsed once, into numeric edges: band i covers the ages lower[i] <= age < upper[i], upper being inf for open
+    groups (e.g. '85 years or over'). Attributes of all ages (e.g. 'Total_Total') are not bands of the cube.
+    Cubes are copies of the attributes, created on demand (see `FAIRiskDataset.age_cube`); changes to a cube do not
+    change the dataset.
+    """
+
+    def __init__(self, bands: pd.Index, lower: np.ndarray, upper: np.ndarray, sexes: pd.Index, keys: pd.Index,
+                 values: np.ndarray, attributes: np.ndarray):
+        self.bands = bands
+        self.lower = lower
+        self.upper = upper
+        self.sexes = sexes
+        self.keys = keys
+        # NaN where a band has no attribute for a sex or no value for a key
+        self.values = values
+        # name of the attribute of each (band, sex), None where there is none
+        self.attributes = attributes
+
+    @staticmethod
+    def from_attributes(attrs_dict: dict):
+        """
+        :param attrs_dict: dict -- the attributes of a category (see `FAIRiskDataset.get`)
+        :return: AgeCube -- the cube of the attributes with an age group and a sex, None if there are none
+        """
+        bands, sexes, entries = dict(), dict(), []
+        for attr_key, attr in attrs_dict.items():
+            age, sex = safe_parse_age_group(attr_key), safe_parse_sex(attr_key)
+            if age is None or sex is None or not isinstance(attr['VALUE'], pd.Series):
+                continue
+            # the name of the band is the attribute name without the sex suffix
+            band = attr_key.rsplit('_', 1)[0]
+            if band not in bands:
+                bands[band] = (len(bands), age)
+            entries.append((bands[band][0], sexes.setdefault(sex, len(sexes)), attr_key, attr['VALUE']))
+
+        if not entries:
+            return None
+
+        keys = union_time_keys([series.index for _, _, _, series in entries])
+        values = np.full((len(bands), len(sexes), len(keys)), np.nan)
+        attributes = np.full((len(bands), len(sexes)), None, dtype=object)
+        for band, sex, attr_key, series in entries:
+            attributes[band, sex] = attr_key
+            if series.index.equals(keys):
+                values[band, sex] = series.to_numpy(dtype='float64')
+            else:
+                values[band, sex, keys.get_indexer(series.index)] = series.to_numpy(dtype='float64')
+
+        edges = np.array([AgeCube.age_edges(age) for _, age in bands.values()], dtype='float64')
+        lower, upper = edges[:, 0], edges[:, 1]
+        return AgeCube(pd.Index(list(bands.keys()), dtype=object), lower, upper,
+                       pd.Index(list(sexes.keys()), dtype=object), keys, values, attributes)
+
+    @staticmethod
+    def age_edges(age_group):
+        """
+        :param age_group: Tuple[int | None, int | None] -- an age group, with inclusive bounds (see
+        `age_parsers.safe_parse_age_group`); None represents an open bound
+        :return: Tuple[float, float] -- its numeric edges (lower <= age < upper)
+        """
+        lower, upper = age_group
+        return (0. if lower is None else float(lower)), (np.inf if upper is None else float(upper + 1))
+
+    def __len__(self):
+        return len(self.bands)
+
+    def overlapping(self, age_group):
+        """
+        :param age_group: Tuple[int | None, int | None]
+        :return: boolean array -- the bands which overlap the age group (as in `FAIRiskDataset.filter_age_group`)
+        """
+        lower, upper = self.age_edges(age_group)
+        return (self.lower < upper) & (lower < self.upper)
+
+    def filter_age_group(self, age_group):
+        """
+        :param age_group: Tuple[int | None, int | None]
+        :return: AgeCube -- the bands which overlap the age group
+        """
+        keep = self.overlapping(age_group)
+        return AgeCube(self.bands[keep], self.lower[keep], self.upper[keep], self.sexes, self.keys, self.values[keep],
+                       self.attributes[keep])
+
+    def get(self, sex: str):
+        """
+        :param sex: str -- 'Male', 'Female' or 'Total' (see `parsers.safe_parse_sex`)
+        :return: pandas.DataFrame -- the values of the bands (rows) by key (columns)
+        """
+        return pd.DataFrame(self.values[:, self.sexes.get_loc(sex)], index=self.bands, columns=self.keys)
+
+    def to_frame(self):
+        """
+        :return: pandas.DataFrame -- the values by (band, sex) (rows) and key (columns), for the bands and sexes with
+        an attribute
+        """
+        bands, sexes = np.nonzero(pd.notna(self.attributes))
+        return pd.DataFrame(self.values[bands, sexes], columns=self.keys,
+                            index=pd.MultiIndex.from_arrays([self.bands[bands], self.sexes[sexes]],
+                                                            names=['band', 'sex']))
+
+
+def union_time_keys(indexes):
+    """
+    :param indexes: List[pandas.Index] -- time keys of some series
+    :return: pandas.Index -- all the keys: those of the series if they all have the same keys, otherwise in time order
+    (keys which could not be parsed go last)
+    """
+    keys = indexes[0]
+    for index in indexes[1:]:
+        if not index.equals(keys):
+            keys = keys.append(index[~index.isin(keys)])
+    if keys is indexes[0]:
+        return keys
+
+    time_index = get_time_index(keys)
+    if time_index.is_sorted:
+        return keys
+    valid = np.flatnonzero(time_index.valid)
+    order = np.concatenate([valid[np.argsort(time_index.start[valid], kind='stable')],
+                            np.flatnonzero(~time_index.valid)])
+    return keys.take(order)
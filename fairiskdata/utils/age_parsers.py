@@ -1,5 +1,9 @@
 import re
+from functools import lru_cache
 
+
+# attribute names repeat across countries (and age groups are parsed by several methods), so each one is parsed once
+@lru_cache(maxsize=None)
 def safe_parse_age_group(attribute_key):
     # Demographics patterns
     match = re.match("from\s+(\d+)\s+to\s+(\d+)",
@@ -9,9 +13,9 @@ def safe_parse_age_group(attribute_key):
     match = re.match("(\d+).*or over", attribute_key, re.IGNORECASE)
     if match:
         return (int(match.group(1)), None)
-    match = re.match("less than.*(\d+)", attribute_key, re.IGNORECASE)
+    match = re.match("less than\s+(\d+)", attribute_key, re.IGNORECASE)
     if match:
-        return (None, int(match.group(1)))
+        return (None, int(match.group(1)) - 1)
 
     # Mortality pattern
     match = re.match("d(\d+)(?:_(\d+))?", attribute_key, re.IGNORECASE)
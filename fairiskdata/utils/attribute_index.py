@@ -0,0 +1,101 @@
+from itertools import chain
+
+
+class AttributeIndex:
+    """
+    Inverted index of the (country, category, attribute) entries of a FAIRisk dataset: the attributes of each country,
+    by category and in the order of the dataset, and the countries of each (category, attribute). Getters and filters
+    of `FAIRiskDataset` use it instead of walking the dataset, and the filters which remove whole countries or
+    attributes update it as they go.
+    """
+
+    def __init__(self, entries=()):
+        # country -> category -> attributes (dicts are used as ordered sets)
+        self.attributes_by_country = dict()
+        # (category, attribute) -> countries
+        self.countries_by_attribute = dict()
+        # country -> list of (country, category, attribute), created on first use
+        self._entries_by_country = dict()
+
+        for country, category, attribute in entries:
+            self.attributes_by_country.setdefault(country, dict()).setdefault(category, dict())[attribute] = None
+            self.countries_by_attribute.setdefault((category, attribute), set()).add(country)
+
+    @staticmethod
+    def from_dict(dataset: dict):
+        """
+        :param dataset: dict -- a FAIRisk dataset dictionary
+        :return: AttributeIndex
+        """
+        return AttributeIndex((country, category, attribute)
+                              for country, categories in dataset.items()
+                              for category, attributes in categories.items()
+                              for attribute in attributes.keys())
+
+    def _entries(self, country):
+        entries = self._entries_by_country.get(country)
+        if entries is None:
+            entries = [(country, category, attribute)
+                       for category, attributes in self.attributes_by_country[country].items()
+                       for attribute in attributes]
+            self._entries_by_country[country] = entries
+        return entries
+
+    def _countries(self, countries):
+        if countries is None:
+            return self.attributes_by_country.keys()
+        countries = set(countries)
+        return [country for country in self.attributes_by_country.keys() if country in countries]
+
+    # GETTERS
+    def get_countries(self):
+        return list(self.attributes_by_country.keys())
+
+    def get_categories(self, countries=None):
+        return [(country, category)
+                for country in self._countries(countries)
+                for category in self.attributes_by_country[country].keys()]
+
+    def get_attributes(self, countries=None, categories=None):
+        if categories is None:
+            return list(chain.from_iterable(self._entries(country) for country in self._countries(countries)))
+
+        categories = set(categories)
+        return [(country, category, attribute)
+                for country in self._countries(countries)
+                for category, attributes in self.attributes_by_country[country].items() if category in categories
+                for attribute in attributes]
+
+    def get_attribute_pairs(self):
+        """
+        :return: the (category, attribute) pairs of any country
+        """
+        return self.countries_by_attribute.keys()
+
+    def get_attribute_countries(self, category, attribute):
+        """
+        :return: Set[str] -- the countries with the attribute
+        """
+        return self.countries_by_attribute.get((category, attribute), set())
+
+    # UPDATES
+    def remove_country(self, country):
+        for category, attributes in self.attributes_by_country.pop(country, dict()).items():
+            for attribute in attributes:
+                self._discard_country(category, attribute, country)
+        self._entries_by_country.pop(country, None)
+
+    def remove_attribute(self, country, category, attribute):
+        """
+        Removes an entry. Categories left without attributes are kept, as in the dataset.
+        """
+        self.attributes_by_country[country][category].pop(attribute, None)
+        self._discard_country(category, attribute, country)
+        self._entries_by_country.pop(country, None)
+
+    def _discard_country(self, category, attribute, country):
+        countries = self.countries_by_attribute.get((category, attribute))
+        if countries is not None:
+            countries.discard(country)
+            if not countries:
+                del self.countries_by_attribute[(category, attribute)]
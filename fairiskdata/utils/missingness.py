@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+
+class MissingnessMatrix:
+    """
+    Country x (category, attribute) matrix of a FAIRisk dataset, telling which attributes each country has and which of
+    them have no missing values. An attribute is missing for a country if the country does not have it or if it has
+    missing values, as counted by the missing-value filters of `FAIRiskDataset`.
+    """
+
+    def __init__(self, countries: pd.Index, attributes: pd.MultiIndex, present: np.ndarray, complete: np.ndarray):
+        self.countries = countries
+        self.attributes = attributes
+        self.present = present
+        self.complete = complete
+
+    @staticmethod
+    def from_entries(countries, categories, attributes, complete, all_countries=None):
+        """
+        :param countries: array of the country of each (country, category, attribute) entry
+        :param categories: array of the category of each entry
+        :param attributes: array of the attribute name of each entry
+        :param complete: boolean array -- whether each entry has no missing values
+        :param all_countries: List[str] -- if given, the countries (rows) of the matrix, including countries without
+        entries; by default, those of the entries, in order of appearance
+        :return: MissingnessMatrix
+        """
+        if all_countries is None:
+            country_codes, unique_countries = pd.factorize(np.asarray(countries, dtype=object))
+            unique_countries = pd.Index(unique_countries, dtype=object)
+        else:
+            unique_countries = pd.Index(all_countries, dtype=object)
+            country_codes = unique_countries.get_indexer(np.asarray(countries, dtype=object))
+        pairs = pd.MultiIndex.from_arrays([np.asarray(categories, dtype=object), np.asarray(attributes, dtype=object)])
+        unique_pairs = pairs.drop_duplicates()
+        pair_codes = unique_pairs.get_indexer(pairs)
+
+        present = np.zeros((len(unique_countries), len(unique_pairs)), dtype=bool)
+        is_complete = np.zeros((len(unique_countries), len(unique_pairs)), dtype=bool)
+        present[country_codes, pair_codes] = True
+        is_complete[country_codes, pair_codes] = np.asarray(complete, dtype=bool)
+
+        return MissingnessMatrix(unique_countries, unique_pairs, present, is_complete)
+
+    @property
+    def missing(self):
+        return ~(self.present & self.complete)
+
+    def to_frame(self):
+        """
+        :return: pandas.DataFrame -- True where an attribute (column) is missing for a country (row)
+        """
+        return pd.DataFrame(self.missing, index=self.countries.rename('country'),
+                            columns=self.attributes.set_names(['category', 'attribute']))
+
+    # QUERIES
+    def get_countries_missing_any(self, attributes):
+        """
+        :param attributes: List[Tuple[str, str]] -- (category, attribute) pairs
+        :return: List[str] -- the countries for which any of the attributes is missing
+        """
+        positions = self.attributes.get_indexer(pd.MultiIndex.from_tuples([tuple(a) for a in attributes])) \
+            if len(attributes) else np.zeros(0, dtype=int)
+        if (positions < 0).any():
+            # attributes no country has are missing for all
+            return list(self.countries)
+        return list(self.countries[self.missing[:, positions].any(axis=1)])
+
+    def get_countries_missing_above(self, count):
+        """
+        :return: List[str] -- the countries for which more than `count` attributes are missing
+        """
+        return list(self.countries[self.missing.sum(axis=1) > count])
+
+    def get_attributes_missing_above(self, count):
+        """
+        :return: List[Tuple[str, str]] -- the attributes which are missing for more than `count` countries
+        """
+        return list(self.attributes[self.missing.sum(axis=0) > count])
+
+    # UPDATES
+    def drop_countries(self, countries):
+        keep = ~self.countries.isin(countries)
+        return MissingnessMatrix(self.countries[keep], self.attributes, self.present[keep], self.complete[keep])
+
+    def drop_attributes(self, attributes):
+        keep = ~self.attributes.isin(list(attributes))
+        return MissingnessMatrix(self.countries, self.attributes[keep], self.present[:, keep], self.complete[:, keep])
@@ -1,6 +1,8 @@
 import re
+from functools import lru_cache
 
 
+@lru_cache(maxsize=None)
 def safe_parse_sex(attribute_key: str):
 
     # TODO: change these verification to use regex?
@@ -0,0 +1,95 @@
+import gc
+import pickle
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory  # Python >= 3.8
+except ImportError:
+    shared_memory = None
+
+
+class SharedObject:
+    """
+    Picklable handle to send a large object (e.g. DataFrames or numpy arrays) to worker processes.
+    The object is pickled with protocol 5, and its out-of-band buffers (the raw data of arrays) are placed once in a
+    shared memory block, so workers rebuild the object from the shared block instead of receiving the data through
+    the pool's pipe. On Python < 3.8 the object is simply pickled in-band.
+
+    The process that creates the handle must call `release` when workers are done.
+    """
+
+    def __init__(self, obj):
+        self._shm = None
+        self.shm_name = None
+        self.offsets = []
+
+        if shared_memory is None:
+            self.payload = pickle.dumps(obj)
+            return
+
+        buffers = []
+        self.payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        raws = [b.raw() for b in buffers]
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(sum(r.nbytes for r in raws), 1))
+        self.shm_name = self._shm.name
+
+        position = 0
+        for raw in raws:
+            self._shm.buf[position:position + raw.nbytes] = raw
+            self.offsets.append((position, raw.nbytes))
+            position += raw.nbytes
+
+    def __getstate__(self):
+        # only the pickled payload and the name of the shared block are sent to workers
+        return {'payload': self.payload, 'shm_name': self.shm_name, 'offsets': self.offsets, '_shm': None}
+
+    def load(self, callback):
+        """
+        Rebuilds the object and calls `callback(obj)`. The object may be backed by the shared block, so it must not
+        be kept after the callback returns; the callback result should not reference it.
+        :param callback: callable
+        :return: the result of the callback
+        """
+        if self.shm_name is None:
+            return callback(pickle.loads(self.payload))
+
+        shm = shared_memory.SharedMemory(name=self.shm_name)
+        try:
+            obj = pickle.loads(self.payload, buffers=[shm.buf[o:o + n] for o, n in self.offsets])
+            result = callback(obj)
+            del obj
+            return result
+        finally:
+            gc.collect()
+            try:
+                shm.close()
+            except BufferError:
+                # some view of the block is still referenced, it is unmapped when the worker exits
+                pass
+
+    def release(self):
+        """
+        Frees the shared block (from the process that created the handle).
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def distribute(sizes, n_processes):
+    """
+    Distributes partitions of some work (e.g. the time series of each country) over processes, the largest first, so
+    the processes get similar sizes.
+    :param sizes: List[int] -- the size of each partition
+    :param n_processes: int
+    :return: List[numpy.ndarray] -- the positions of the partitions of each process (processes without partitions are
+    left out)
+    """
+    loads, process_of = np.zeros(n_processes, dtype=int), np.empty(len(sizes), dtype=int)
+    for partition in np.argsort(-np.asarray(sizes), kind='stable'):
+        process_of[partition] = np.argmin(loads)
+        loads[process_of[partition]] += sizes[partition]
+    return [partitions for partitions in (np.flatnonzero(process_of == process) for process in range(n_processes))
+            if len(partitions)]
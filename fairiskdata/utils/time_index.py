@@ -0,0 +1,190 @@
+import weakref
+from typing import List
+import numpy as np
+import pandas as pd
+
+from fairiskdata.utils.time_parsers import parse_time_keys, KIND_WEEK
+
+
+class TimeIndex:
+    """
+    Typed representation of the time keys of a series index ('2020W05', '03-2021', '2020-01-31', '2010-2015', ...),
+    as parsed by `time_parsers.safe_date_parse`: the start and end (both included) of each key as datetime64 arrays,
+    equal for keys that are a single date, and NaT for keys that could not be parsed, and the kind of each key (see
+    `time_parsers.KIND_*`). The original labels are kept, e.g. to be exported.
+    """
+
+    def __init__(self, labels: np.ndarray, start: np.ndarray, end: np.ndarray, kind: np.ndarray):
+        self.labels = labels
+        self.start = start
+        self.end = end
+        self.kind = kind
+
+        # computed on first use (see `bounds` and `is_sorted`)
+        self._bounds = None
+        self._sorted = None
+
+    @staticmethod
+    def parse(labels):
+        """
+        :param labels: Iterable[str] -- time keys
+        :return: TimeIndex
+        """
+        labels = np.asarray(labels, dtype=object)
+        start, end, kind = parse_time_keys(labels)
+
+        return TimeIndex(labels, start.view('datetime64[ns]'), end.view('datetime64[ns]'), kind)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def valid(self):
+        return ~np.isnat(self.start)
+
+    @property
+    def is_interval(self):
+        return self.kind >= KIND_WEEK
+
+    @property
+    def bounds(self):
+        """
+        The earliest start and the latest end of the keys (which need not be sorted), computed once. Both are included,
+        as the keys are closed intervals, and both are NaT if no key could be parsed.
+        :return: (numpy.datetime64, numpy.datetime64)
+        """
+        if self._bounds is None:
+            valid = self.valid
+            self._bounds = (self.start[valid].min(), self.end[valid].max()) if valid.any() else \
+                (np.datetime64('NaT', 'ns'), np.datetime64('NaT', 'ns'))
+        return self._bounds
+
+    @property
+    def is_sorted(self):
+        """
+        Whether all keys were parsed and both their starts and their ends are in ascending order, as in the series of
+        the sources, computed once. The keys overlapping an interval are then contiguous (see `select_overlapping`).
+        :return: bool
+        """
+        if self._sorted is None:
+            self._sorted = bool(self.valid.all() and (self.start[1:] >= self.start[:-1]).all() and
+                                (self.end[1:] >= self.end[:-1]).all())
+        return self._sorted
+
+    def take(self, indexer):
+        """
+        :param indexer: numpy array of positions, boolean mask or slice
+        :return: TimeIndex -- the selected keys
+        """
+        return TimeIndex(self.labels[indexer], self.start[indexer], self.end[indexer], self.kind[indexer])
+
+    def get(self, i):
+        """
+        :param i: int -- position
+        :return: pandas.Timestamp | pandas.Interval | None -- the key as returned by `safe_date_parse`
+        """
+        if np.isnat(self.start[i]):
+            return None
+        if self.is_interval[i]:
+            return pd.Interval(pd.Timestamp(self.start[i]), pd.Timestamp(self.end[i]), closed='both')
+        return pd.Timestamp(self.start[i])
+
+    def to_list(self):
+        return [self.get(i) for i in range(len(self))]
+
+    def sortable(self):
+        """
+        :return: List[pandas.Timestamp | None] -- the start of each key (see `time_parsers.safe_sortable_date_parse`)
+        """
+        return [pd.Timestamp(s) if not np.isnat(s) else None for s in self.start]
+
+    def overlaps(self, time_interval: pd.Interval):
+        """
+        Which keys overlap the interval (or are contained in it, for keys that are a single date).
+        :param time_interval: pandas.Interval
+        :return: numpy boolean array
+        """
+        left, right = np.datetime64(time_interval.left, 'ns'), np.datetime64(time_interval.right, 'ns')
+
+        after_left = self.end >= left if time_interval.closed_left else self.end > left
+        before_right = self.start <= right if time_interval.closed_right else self.start < right
+
+        return after_left & before_right & self.valid
+
+    def select_overlapping(self, time_interval: pd.Interval):
+        """
+        The keys which overlap the interval (see `overlaps`), as a slice if the keys are sorted (see `is_sorted`).
+        :param time_interval: pandas.Interval
+        :return: slice | numpy boolean array
+        """
+        return self.select_overlapping_all([time_interval])[0]
+
+    def select_overlapping_all(self, time_intervals: List[pd.Interval]):
+        """
+        Batch version of `select_overlapping`. If the keys are sorted, the first and last keys overlapping each
+        interval are found by binary search, on the ends and on the starts of the keys, respectively. Otherwise, the
+        keys are compared with each interval (see `overlaps`).
+        :param time_intervals: List[pandas.Interval]
+        :return: List[slice | numpy boolean array] -- the keys which overlap each interval
+        """
+        if not self.is_sorted:
+            return [self.overlaps(time_interval) for time_interval in time_intervals]
+
+        first, stop = self._search_overlapping(
+            np.array([np.datetime64(i.left, 'ns') for i in time_intervals], dtype='datetime64[ns]'),
+            np.array([np.datetime64(i.right, 'ns') for i in time_intervals], dtype='datetime64[ns]'),
+            np.array([i.closed_left for i in time_intervals], dtype=bool),
+            np.array([i.closed_right for i in time_intervals], dtype=bool))
+
+        return [slice(int(f), int(s)) for f, s in zip(first, stop)]
+
+    def overlapping_ranges(self, interval_index: pd.IntervalIndex):
+        """
+        Vectorized version of `select_overlapping_all` for sorted keys (see `is_sorted`), e.g. to resample a series.
+        :param interval_index: pandas.IntervalIndex
+        :return: first: numpy.ndarray, stop: numpy.ndarray -- the keys overlapping each interval are first[i]:stop[i]
+        """
+        return self._search_overlapping(interval_index.left.values, interval_index.right.values,
+                                        interval_index.closed_left, interval_index.closed_right)
+
+    def _search_overlapping(self, lefts, rights, closed_left, closed_right):
+        # keys from the first one ending at or after the left bound (after it if open), until the last one starting
+        # at or before the right bound (before it if open)
+        first = np.where(closed_left, np.searchsorted(self.end, lefts, side='left'),
+                         np.searchsorted(self.end, lefts, side='right'))
+        stop = np.where(closed_right, np.searchsorted(self.start, rights, side='right'),
+                        np.searchsorted(self.start, rights, side='left'))
+        return first, np.maximum(first, stop)
+
+
+# Time indexes by series index, kept while the series index exists. Series built on the same index object (e.g.
+# the series of a country loaded from a columnar file) share its time index.
+_time_indexes = dict()
+
+
+def _forget(key):
+    _time_indexes.pop(key, None)
+
+
+def get_time_index(index: pd.Index):
+    """
+    Returns the typed time index of a series index, parsing it only the first time.
+    :param index: pandas.Index
+    :return: TimeIndex
+    """
+    entry = _time_indexes.get(id(index))
+    if entry is not None and entry[0]() is index:
+        return entry[1]
+
+    time_index = TimeIndex.parse(index)
+    set_time_index(index, time_index)
+    return time_index
+
+
+def set_time_index(index: pd.Index, time_index: TimeIndex):
+    """
+    Sets the typed time index of a series index (e.g. of a series selected from another one, with `TimeIndex.take`).
+    :param index: pandas.Index
+    :param time_index: TimeIndex
+    """
+    _time_indexes[id(index)] = (weakref.ref(index, lambda _, key=id(index): _forget(key)), time_index)
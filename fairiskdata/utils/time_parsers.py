@@ -1,5 +1,6 @@
 import datetime
 import re
+import numpy as np
 import pandas as pd
 
 
@@ -88,3 +89,127 @@ def safe_interval_parse(interval):
         else:
             closed_str = 'both'
         return pd.Interval(interval.right, interval.left, closed=closed_str)
+
+
+KIND_NONE = 0
+""" Time key that could not be parsed. """
+KIND_TIMESTAMP = 1
+""" Single date (e.g. '2020-01-31'). The kinds below are intervals. """
+KIND_WEEK = 2
+""" Week (e.g. '2020W05'). """
+KIND_YEAR_RANGE = 3
+""" Range of years (e.g. '2010-2015'). """
+KIND_MONTH = 4
+""" Month (e.g. '03-2021' or '03/2021'). """
+KIND_YEAR = 5
+""" Year (e.g. '2019'). """
+
+_MIN_YEAR, _MAX_YEAR = pd.Timestamp.min.year + 1, pd.Timestamp.max.year - 1
+_NAT = np.iinfo('int64').min
+_DAY_NS = 86400 * 10 ** 9
+
+
+_WEEK_PATTERN = r"\d\d\d\dW\d(?:\d)?$"
+_YEAR_RANGE_PATTERN = r"(\d\d\d\d)-(\d\d\d\d)$"
+
+
+def _match(labels, pattern):
+    return labels.str.match(pattern).fillna(False).to_numpy(dtype=bool)
+
+
+def _year_start_ns(years):
+    return (np.asarray(years) - 1970).astype('datetime64[Y]').astype('datetime64[ns]').astype('int64')
+
+
+def _month_start_ns(years, months):
+    return ((np.asarray(years) - 1970) * 12 + np.asarray(months) - 1).astype('datetime64[M]') \
+        .astype('datetime64[ns]').astype('int64')
+
+
+def parse_time_keys(keys):
+    """
+    Bulk version of `safe_date_parse`: parses an array of time keys, with the same semantics, into the start and end
+    (both included) of each key in nanoseconds since the epoch, and its kind (see KIND_*). Keys that are a single date
+    start and end at the same time. Keys that could not be parsed have KIND_NONE and NaT (the minimum int64).
+
+    Each distinct key is parsed once. The formats are recognized with vectorized string operations and each format
+    is parsed at once; keys in other formats (e.g. '31-01-2020') fall back to `safe_date_parse`.
+    :param keys: Iterable[str]
+    :return: start: numpy.ndarray (int64), end: numpy.ndarray (int64), kind: numpy.ndarray (int8)
+    """
+    inverse, unique_keys = pd.factorize(np.asarray(keys, dtype=object))
+    # missing keys (e.g. NaN) are not parsed
+    unique_keys = np.append(np.asarray(unique_keys, dtype=object), None)
+    labels = pd.Series(unique_keys, dtype=object)
+
+    start = np.full(len(labels), _NAT, dtype='int64')
+    end = np.full(len(labels), _NAT, dtype='int64')
+    kind = np.full(len(labels), KIND_NONE, dtype='int8')
+    parsed = np.zeros(len(labels), dtype=bool)
+
+    year = pd.to_numeric(labels.str[:4], errors='coerce').to_numpy()
+    in_range = (year >= _MIN_YEAR) & (year <= _MAX_YEAR)
+
+    # Weeks: from the Monday of the week (as strptime '%YW%W-%w') minus 7 days, until that Monday (excluded)
+    week = pd.to_numeric(labels.str[5:], errors='coerce').to_numpy()
+    is_week = (_match(labels, _WEEK_PATTERN) & in_range & (week <= 53))
+    if is_week.any():
+        y, w = year[is_week].astype(int), week[is_week].astype(int)
+        jan1 = (y - 1970).astype('datetime64[Y]').astype('datetime64[D]').astype('int64')
+        first_weekday = (jan1 + 3) % 7  # Monday is 0 (1970-01-01 was a Thursday)
+        offset = np.where(w == 0, -first_weekday, (7 - first_weekday) % 7 + 7 * (w - 1))
+        monday_ns = (jan1 + offset) * _DAY_NS
+        start[is_week], end[is_week], kind[is_week] = monday_ns - 7 * _DAY_NS, monday_ns - 1, KIND_WEEK
+        parsed |= is_week
+
+    # Years ranges: from the first day of the first year until the end of the last year
+    last_year = pd.to_numeric(labels.str[5:9], errors='coerce').to_numpy()
+    # (descending ranges, like '2015-2010', fall back to `safe_date_parse`, which raises ValueError)
+    is_range = (_match(labels, _YEAR_RANGE_PATTERN) & in_range &
+                (last_year >= year) & (last_year <= _MAX_YEAR))
+    if is_range.any():
+        start[is_range] = _year_start_ns(year[is_range].astype(int))
+        end[is_range] = _year_start_ns(last_year[is_range].astype(int) + 1) - 1
+        kind[is_range] = KIND_YEAR_RANGE
+        parsed |= is_range
+
+    # Months: mm-yyyy or mm/yyyy
+    month = pd.to_numeric(labels.str[:2], errors='coerce').to_numpy()
+    month_year = pd.to_numeric(labels.str[3:7], errors='coerce').to_numpy()
+    is_month = (_match(labels, r"(\d\d)[-/](\d\d\d\d)$") & (month >= 1) & (month <= 12) &
+                (month_year >= _MIN_YEAR) & (month_year <= _MAX_YEAR))
+    if is_month.any():
+        y, m = month_year[is_month].astype(int), month[is_month].astype(int)
+        start[is_month] = _month_start_ns(y, m)
+        end[is_month] = _month_start_ns(y, m + 1) - 1
+        kind[is_month] = KIND_MONTH
+        parsed |= is_month
+
+    # Years
+    is_year = _match(labels, r"(\d\d\d\d)$") & in_range
+    if is_year.any():
+        start[is_year] = _year_start_ns(year[is_year].astype(int))
+        end[is_year] = _year_start_ns(year[is_year].astype(int) + 1) - 1
+        kind[is_year] = KIND_YEAR
+        parsed |= is_year
+
+    # Dates: yyyy-mm-dd (invalid dates, like 2021-02-30, are not parsed)
+    is_date = _match(labels, r"\d\d\d\d-\d\d-\d\d$") & in_range
+    if is_date.any():
+        dates = pd.to_datetime(labels[is_date], format='%Y-%m-%d', errors='coerce').to_numpy().astype('int64')
+        start[is_date], end[is_date] = dates, dates
+        kind[is_date] = np.where(dates == _NAT, KIND_NONE, KIND_TIMESTAMP)
+        parsed |= is_date
+
+    # Other formats, and keys of the formats above close to the limits of pandas.Timestamp
+    for i in np.flatnonzero(~parsed[:-1]):
+        p = safe_date_parse(unique_keys[i])
+        if isinstance(p, pd.Interval):
+            start[i], end[i] = p.left.value, p.right.value
+            kind[i] = KIND_WEEK if re.match(_WEEK_PATTERN, unique_keys[i]) else \
+                KIND_YEAR_RANGE if re.match(_YEAR_RANGE_PATTERN, unique_keys[i]) else \
+                KIND_YEAR if p.left.month == 1 and p.right.month == 12 else KIND_MONTH
+        elif isinstance(p, pd.Timestamp):
+            start[i], end[i], kind[i] = p.value, p.value, KIND_TIMESTAMP
+
+    return start[inverse], end[inverse], kind[inverse]
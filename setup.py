@@ -23,6 +23,9 @@ setuptools.setup(
         "requests-futures==1.0.0",
         "hdx-python-api==4.9.5"
     ],
+    extras_require={
+        "parquet": ["pyarrow>=3.0.0"]
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent",
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from fairiskdata.utils.age_cube import AgeCube
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+
+def _attr(name, values, keys):
+  return {'ATTR_NAME': name, 'SOURCE': 'Eurostat', 'UNIT': 'Number', 'FREQUENCY': 'YEARLY', 'SERIES_TYPE': 'CURRENT',
+          'VALUE': pd.Series(values, index=keys, dtype='float64')}
+
+
+class TestAgeCube(unittest.TestCase):
+
+  def setUp(self):
+    keys = ['2019', '2020']
+    self.attributes = {name: _attr(name, values, keys) for name, values in [
+      ('Total_Total', [10, 11]),
+      ('Less than 5 years_Males', [1, 2]),
+      ('Less than 5 years_Females', [3, 4]),
+      ('From 5 to 9 years_Males', [5, 6]),
+      ('85 years or over_Total', [7, 8])]}
+    # a band with a key the others do not have, given out of order
+    self.attributes['D65_74_m'] = _attr('D65_74_m', [9, 12], ['2021', '2018'])
+    self.cube = AgeCube.from_attributes(self.attributes)
+
+  def test_from_attributes(self):
+    self.assertEqual(list(self.cube.bands), ['Less than 5 years', 'From 5 to 9 years', '85 years or over', 'D65_74'])
+    self.assertEqual(self.cube.lower.tolist(), [0, 5, 85, 65])
+    self.assertEqual(self.cube.upper.tolist(), [5, 10, np.inf, 75])
+    self.assertEqual(list(self.cube.sexes), ['Male', 'Female', 'Total'])
+    self.assertEqual(list(self.cube.keys), ['2018', '2019', '2020', '2021'])
+    self.assertEqual(self.cube.values.shape, (4, 3, 4))
+
+    males = self.cube.get('Male')
+    self.assertEqual(males.loc['Less than 5 years'].tolist()[1:3], [1, 2])
+    self.assertEqual(males.loc['D65_74'].tolist()[::3], [12, 9])
+    self.assertTrue(np.isnan(self.cube.get('Female').loc['From 5 to 9 years']).all())
+    self.assertEqual(len(self.cube.to_frame()), 5)
+
+    self.assertIsNone(AgeCube.from_attributes({'Total_Total': self.attributes['Total_Total']}))
+
+  def test_filter_age_group(self):
+    self.assertEqual(list(self.cube.filter_age_group((None, 5)).bands), ['Less than 5 years', 'From 5 to 9 years'])
+    self.assertEqual(list(self.cube.filter_age_group((None, 4)).bands), ['Less than 5 years'])
+    self.assertEqual(list(self.cube.filter_age_group((9, 65)).bands), ['From 5 to 9 years', 'D65_74'])
+    self.assertEqual(list(self.cube.filter_age_group((80, None)).bands), ['85 years or over'])
+
+
+if __name__ == '__main__':
+  unittest.main()
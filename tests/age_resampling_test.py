@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from fairiskdata.preprocessing.age_resampling import AgeResampler
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+
+def _attr(name, values, keys=('2019', '2020')):
+  return {'ATTR_NAME': name, 'SOURCE': 'Eurostat', 'UNIT': 'Number', 'FREQUENCY': 'YEARLY', 'SERIES_TYPE': 'CURRENT',
+          'VALUE': pd.Series(values, index=list(keys), dtype='float64')}
+
+
+class TestAgeResampling(unittest.TestCase):
+
+  def setUp(self):
+    self.attributes = {name: _attr(name, values) for name, values in [
+      ('Total_Total', [100, 100]),
+      ('Less than 5 years_Males', [1, 2]),
+      ('Less than 5 years_Females', [3, 4]),
+      ('From 5 to 14 years_Males', [5, np.nan]),
+      ('From 15 to 64 years_Males', [6, 7]),
+      ('From 65 to 74 years_Males', [8, 9]),
+      ('75 years or over_Males', [10, 11])]}
+
+  def test_resample(self):
+    values = {name: attr['VALUE'].copy() for name, attr in self.attributes.items()}
+    resampled = AgeResampler('MEDIUM').resample(self.attributes)
+
+    self.assertEqual(list(resampled.keys()), ['-14_Male', '-14_Female', '15-64_Male', '65+_Male'])
+    self.assertEqual(resampled['-14_Male']['ATTR_NAME'], '-14_Male')
+    self.assertEqual(resampled['-14_Male']['VALUE'].iloc[0], 6)
+    # a missing value of an attribute is missing in the sum
+    self.assertTrue(np.isnan(resampled['-14_Male']['VALUE'].iloc[1]))
+    self.assertEqual(resampled['65+_Male']['VALUE'].tolist(), [18, 20])
+
+    # the attributes are not changed
+    self.assertEqual(self.attributes['Less than 5 years_Males']['ATTR_NAME'], 'Less than 5 years_Males')
+    for name, attr in self.attributes.items():
+      pd.testing.assert_series_equal(attr['VALUE'], values[name])
+      self.assertFalse(any(attr is new_attr or attr['VALUE'] is new_attr['VALUE'] for new_attr in resampled.values()))
+
+    total = AgeResampler('LOW').resample(self.attributes)
+    self.assertEqual(list(total.keys()), ['Total_Male', 'Total_Female'])
+    self.assertEqual(total['Total_Male']['VALUE'].iloc[0], 30)
+
+  def test_keys(self):
+    # the keys of the first attribute of each group
+    attributes = {'Less than 5 years_Males': _attr('Less than 5 years_Males', [1, 2], keys=['2019', '2020']),
+                  'From 5 to 14 years_Males': _attr('From 5 to 14 years_Males', [3, 4], keys=['2020', '2021'])}
+    resampled = AgeResampler('MEDIUM').resample(attributes)
+    pd.testing.assert_series_equal(resampled['-14_Male']['VALUE'],
+                                   pd.Series([np.nan, 5], index=['2019', '2020'], dtype='float64'))
+
+  def test_edges(self):
+    # 65-74 is summed into two groups
+    with self.assertLogs('fairisk', level='WARNING') as logs:
+      resampled = AgeResampler([5, 70]).resample(self.attributes)
+    self.assertIn('5-69_Male, 70+_Male', logs.output[0])
+
+    self.assertEqual(list(resampled.keys()), ['-4_Male', '-4_Female', '5-69_Male', '70+_Male'])
+    self.assertEqual(resampled['70+_Male']['VALUE'].tolist(), [18, 20])
+
+    with self.assertRaises(ValueError):
+      AgeResampler([65, 15])
+
+
+if __name__ == '__main__':
+  unittest.main()
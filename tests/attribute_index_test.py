@@ -0,0 +1,45 @@
+import unittest
+
+from fairiskdata.utils.attribute_index import AttributeIndex
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+DATASET = {
+  'Portugal': {'COVID': {'new_cases': {}, 'new_deaths': {}}, 'SCORES': {'score': {}}},
+  'Spain': {'COVID': {'new_cases': {}}, 'MORTALITY': {'D0_14_b': {}}},
+}
+
+
+class TestAttributeIndex(unittest.TestCase):
+
+  def test_getters(self):
+    attribute_index = AttributeIndex.from_dict(DATASET)
+
+    self.assertEqual(attribute_index.get_countries(), ['Portugal', 'Spain'])
+    self.assertEqual(attribute_index.get_categories(['Spain']), [('Spain', 'COVID'), ('Spain', 'MORTALITY')])
+    self.assertEqual(attribute_index.get_attributes(), [
+      ('Portugal', 'COVID', 'new_cases'), ('Portugal', 'COVID', 'new_deaths'), ('Portugal', 'SCORES', 'score'),
+      ('Spain', 'COVID', 'new_cases'), ('Spain', 'MORTALITY', 'D0_14_b')])
+    self.assertEqual(attribute_index.get_attributes(categories=['COVID']), [
+      ('Portugal', 'COVID', 'new_cases'), ('Portugal', 'COVID', 'new_deaths'), ('Spain', 'COVID', 'new_cases')])
+    self.assertEqual(attribute_index.get_attribute_countries('COVID', 'new_cases'), {'Portugal', 'Spain'})
+
+  def test_updates(self):
+    attribute_index = AttributeIndex.from_dict(DATASET)
+    attribute_index.get_attributes()
+
+    attribute_index.remove_attribute('Portugal', 'COVID', 'new_deaths')
+    self.assertNotIn(('COVID', 'new_deaths'), attribute_index.get_attribute_pairs())
+    self.assertEqual(attribute_index.get_attributes(['Portugal']),
+                     [('Portugal', 'COVID', 'new_cases'), ('Portugal', 'SCORES', 'score')])
+
+    attribute_index.remove_country('Spain')
+    self.assertEqual(attribute_index.get_countries(), ['Portugal'])
+    self.assertEqual(attribute_index.get_attribute_countries('COVID', 'new_cases'), {'Portugal'})
+    self.assertNotIn(('MORTALITY', 'D0_14_b'), attribute_index.get_attribute_pairs())
+
+
+if __name__ == '__main__':
+  unittest.main()
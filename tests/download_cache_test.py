@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+import threading
+import time
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pandas as pd
+
+from fairiskdata.sources.download_cache import DownloadCache
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+
+class SourceHandler(BaseHTTPRequestHandler):
+  """ Stand-in for a source server supporting conditional requests with ETag. """
+
+  content = b'date,value\n2020-01-01,1\n'
+  etag = '"v1"'
+  requests = []
+
+  def do_GET(self):
+    SourceHandler.requests.append(dict(self.headers))
+
+    if self.headers.get('If-None-Match') == self.etag:
+      self.send_response(304)
+      self.end_headers()
+      return
+
+    self.send_response(200)
+    self.send_header('ETag', self.etag)
+    self.send_header('Content-Length', str(len(self.content)))
+    self.end_headers()
+    self.wfile.write(self.content)
+
+  def log_message(self, format, *args):
+    pass
+
+
+class TestDownloadCache(unittest.TestCase):
+
+  def setUp(self):
+    SourceHandler.requests = []
+    self.server = HTTPServer(('127.0.0.1', 0), SourceHandler)
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    self.url = 'http://127.0.0.1:%d/data.csv' % self.server.server_port
+    self.tmp = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    self.tmp.cleanup()
+
+  def test_read(self):
+    parsed = []
+
+    def parser(content):
+      parsed.append(content)
+      return pd.read_csv(BytesIO(content))
+
+    cache = DownloadCache(self.tmp.name)
+
+    # first read downloads and parses
+    data = cache.read(self.url, parser)
+    self.assertEqual(data['value'].tolist(), [1])
+    self.assertEqual((len(SourceHandler.requests), len(parsed)), (1, 1))
+
+    # within the ttl, the server is not contacted
+    data = cache.read(self.url, parser, ttl=3600)
+    self.assertEqual(data['value'].tolist(), [1])
+    self.assertEqual((len(SourceHandler.requests), len(parsed)), (1, 1))
+
+    # after the ttl, a conditional request is answered with 304, so nothing is downloaded or parsed
+    time.sleep(0.01)
+    data = cache.read(self.url, parser, ttl=0)
+    self.assertEqual(data['value'].tolist(), [1])
+    self.assertEqual(SourceHandler.requests[-1].get('If-None-Match'), '"v1"')
+    self.assertEqual((len(SourceHandler.requests), len(parsed)), (2, 1))
+
+    # changed content is downloaded and parsed again
+    SourceHandler.content, SourceHandler.etag = b'date,value\n2020-01-01,2\n', '"v2"'
+    try:
+      data = DownloadCache(self.tmp.name).read(self.url, parser)
+    finally:
+      SourceHandler.content, SourceHandler.etag = b'date,value\n2020-01-01,1\n', '"v1"'
+    self.assertEqual(data['value'].tolist(), [2])
+    self.assertEqual((len(SourceHandler.requests), len(parsed)), (3, 2))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from fairiskdata.modelling.excess_mortality import ExcessMortality
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+
+def _mortality(keys, values, frequency):
+  return {'ATTR_NAME': 'Total_Total', 'SOURCE': 'Eurostat', 'UNIT': 'Number', 'FREQUENCY': frequency,
+          'SERIES_TYPE': 'NEW', 'VALUE': pd.Series(values, index=keys, dtype='float64')}
+
+
+class TestExcessMortality(unittest.TestCase):
+
+  def test_weekly_baseline(self):
+    # week w of year y has y - 2000 + w deaths
+    keys = ['%dW%02d' % (year, week) for year in range(2014, 2022) for week in range(1, 53)]
+    values = [int(key[:4]) - 2000 + int(key[-2:]) for key in keys]
+    mortality = {'Total_Total': _mortality(keys, values, 'WEEKLY')}
+    mortality['Total_Total']['VALUE']['2018W10'] = np.nan
+
+    interval = pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-12-31'))
+    ExcessMortality().compute_and_add_to_mortality_dict(mortality, interval)
+    excess = mortality['ExcessAbs_Total_Total']['VALUE']
+
+    self.assertEqual(mortality['ExcessAbs_Total_Total']['FREQUENCY'], 'WEEKLY')
+    # the baseline of 2020 are the years 2015 to 2019 and the baseline of 2021 is the same
+    self.assertEqual(excess['2020W05'], 20 + 5 - (17 + 5))
+    self.assertEqual(excess['2021W05'], 21 + 5 - (17 + 5))
+    self.assertEqual(excess['2020W10'], 20 + 10 - (15 + 16 + 17 + 19) / 4 - 10)
+    self.assertAlmostEqual(mortality['ExcessPScore_Total_Total']['VALUE']['2020W05'], 3 / 22 * 100)
+
+  def test_daily_baseline(self):
+    days = pd.date_range('2015-01-01', '2020-12-31')
+    keys = [day.strftime('%d-%m-%Y') for day in days]
+    mortality = {'Total_Total': _mortality(keys, days.year - 2000, 'DAILY')}
+
+    interval = pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2020-12-31'), closed='both')
+    ExcessMortality().compute_and_add_to_mortality_dict(mortality, interval)
+    excess = mortality['ExcessAbs_Total_Total']['VALUE']
+
+    self.assertEqual(len(excess), 366)
+    self.assertEqual(excess['15-03-2020'], 20 - 17)
+    self.assertEqual(excess['03-05-2020'], 20 - 17)
+    # 29 February is only compared with leap years
+    self.assertEqual(excess['29-02-2020'], 20 - 16)
+
+  def test_not_enough_data(self):
+    keys = ['%dW%02d' % (year, week) for year in range(2019, 2021) for week in range(1, 53)]
+    mortality = {'Total_Total': _mortality(keys, np.ones(len(keys)), 'WEEKLY')}
+
+    with self.assertLogs('fairisk', level='WARNING'):
+      ExcessMortality().compute_and_add_to_mortality_dict(mortality, pd.Interval(pd.Timestamp('2020-01-01'),
+                                                                                 pd.Timestamp('2020-12-31')))
+    self.assertEqual(list(mortality.keys()), ['Total_Total'])
+
+  def test_baseline_models(self):
+    # a trend with yearly and half-yearly seasonality, and some noise in 2017
+    keys = ['%dW%02d' % (year, week) for year in range(2014, 2022) for week in range(1, 53)]
+    times = np.array([int(key[:4]) + (int(key[-2:]) - 1) / 52.18 for key in keys])
+    values = 100 + 3 * (times - 2015) + 10 * np.sin(2 * np.pi * times) + 4 * np.cos(4 * np.pi * times)
+    values[(times >= 2017) & (times < 2018)] += np.tile([1, -1], 26)
+    mortality = {'Total_Total': _mortality(keys, values, 'WEEKLY')}
+
+    interval = pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-12-31'))
+    ExcessMortality(['mean', 'trend', 'serfling', 'quantile'], prediction_intervals=True) \
+      .compute_and_add_to_mortality_dict(mortality, interval)
+
+    # the default model keeps its names
+    self.assertIn('ExcessAbs_Total_Total', mortality)
+    for model in ['', 'Trend', 'Serfling', 'Quantile']:
+      baseline = mortality['Excess%sBaseline_Total_Total' % model]['VALUE']
+      self.assertEqual(len(baseline), 104)
+      self.assertTrue((mortality['Excess%sLower_Total_Total' % model]['VALUE'] <= baseline).all())
+      self.assertTrue((mortality['Excess%sUpper_Total_Total' % model]['VALUE'] >= baseline).all())
+      pd.testing.assert_series_equal(mortality['Excess%sAbs_Total_Total' % model]['VALUE'],
+                                     mortality['Total_Total']['VALUE'][baseline.index] - baseline, check_names=False)
+
+    # the Serfling model fits the seasonality and extrapolates the trend
+    np.testing.assert_allclose(mortality['ExcessSerflingAbs_Total_Total']['VALUE'], 0, atol=0.05)
+    self.assertGreater(mortality['ExcessTrendAbs_Total_Total']['VALUE'].abs().max(), 5)
+    self.assertEqual(mortality['ExcessQuantileBaseline_Total_Total']['VALUE']['2020W05'],
+                     mortality['Total_Total']['VALUE']['2017W05'])
+
+    with self.assertRaises(ValueError):
+      ExcessMortality(['arima'])
+
+  def test_prediction_intervals(self):
+    # without excess mortality, about 95% of the deaths are within the intervals of every model
+    rng = np.random.default_rng(0)
+    keys = ['%dW%02d' % (year, week) for year in range(2014, 2022) for week in range(1, 53)]
+    mortality_dicts = {country: {'Total_Total': _mortality(keys, rng.normal(100, 10, len(keys)), 'WEEKLY')}
+                       for country in range(100)}
+
+    interval = pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-12-31'))
+    excess = ExcessMortality(['mean', 'trend', 'serfling', 'quantile'], prediction_intervals=True) \
+      .compute_excess(mortality_dicts, interval)
+    for model in ['', 'Trend', 'Serfling', 'Quantile']:
+      inside = []
+      for country, mortality_dict in mortality_dicts.items():
+        observed = mortality_dict['Total_Total']['VALUE'][-104:]
+        inside.append((excess[country]['Excess%sLower_Total_Total' % model]['VALUE'] <= observed) &
+                      (observed <= excess[country]['Excess%sUpper_Total_Total' % model]['VALUE']))
+      self.assertAlmostEqual(np.mean(np.concatenate(inside)), 0.95, delta=0.02)
+
+  def test_unfitted_model(self):
+    # the 6 parameters of the Serfling model cannot be fitted to 5 previous years
+    keys = [str(year) for year in range(2012, 2022)]
+    mortality = {'Total_Total': _mortality(keys, np.arange(len(keys)) + 100, 'YEARLY')}
+
+    with self.assertLogs('fairisk', level='WARNING') as logs:
+      ExcessMortality(['trend', 'serfling']).compute_and_add_to_mortality_dict(
+        mortality, pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2020-12-31')))
+    self.assertIn('Baseline model Serfling could not be fitted to 1 time series.', logs.output[0])
+    self.assertEqual(list(mortality.keys()), ['Total_Total', 'ExcessTrendAbs_Total_Total',
+                                              'ExcessTrendPScore_Total_Total'])
+    self.assertAlmostEqual(mortality['ExcessTrendAbs_Total_Total']['VALUE']['2020'], 0)
+
+  def test_batched(self):
+    # countries with different keys, computed on the calendar of all of them
+    rng = np.random.default_rng(0)
+    mortality_dicts = dict()
+    for country, first_year in [('Portugal', 2014), ('Spain', 2015), ('France', 2016)]:
+      keys = ['%dW%02d' % (year, week) for year in range(first_year, 2022) for week in range(1, 53)]
+      mortality_dicts[country] = {age: _mortality(keys, rng.integers(50, 100, len(keys)), 'WEEKLY')
+                                  for age in ['-14_Total', '15-64_Total']}
+    interval = pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-12-31'))
+
+    separate = {country: ExcessMortality().compute_and_add_to_mortality_dict(
+      {age: dict(attr) for age, attr in mortality_dict.items()}, interval)
+      for country, mortality_dict in mortality_dicts.items()}
+    for max_processes in [1, 2]:
+      batched = ExcessMortality().compute_and_add_to_mortality_dicts(
+        {country: {age: dict(attr) for age, attr in mortality_dict.items()}
+         for country, mortality_dict in mortality_dicts.items()}, interval, max_processes=max_processes)
+      for country, mortality_dict in separate.items():
+        self.assertEqual(list(batched[country].keys()), list(mortality_dict.keys()))
+        for age, attr in mortality_dict.items():
+          pd.testing.assert_series_equal(batched[country][age]['VALUE'], attr['VALUE'])
+
+
+
+if __name__ == '__main__':
+  unittest.main()
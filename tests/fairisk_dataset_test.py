@@ -1,9 +1,11 @@
 import unittest
 import random
+import tempfile
 import pandas as pd
 import numpy as np
 
 from fairiskdata import FAIRiskDataset
+from fairiskdata.sources.single_dataset import export_dataset
 from fairiskdata.utils.time_parsers import safe_date_parse
 
 import logging.config
@@ -16,6 +18,132 @@ class TestFAIRiskDataset(unittest.TestCase):
     dataset = FAIRiskDataset.load()
     self.assertIsInstance(dataset, FAIRiskDataset)
 
+  def test_load_parquet(self):
+    dataset = FAIRiskDataset.load()
+
+    with tempfile.TemporaryDirectory() as tmp:
+      parquet_file_path = path.join(tmp, 'fairisk_dataset.parquet')
+      export_dataset(dataset.get(), parquet_file_path)
+      parquet_dataset = FAIRiskDataset.load(parquet_file_path)
+
+    self.assertEqual(dataset.get_attributes(), parquet_dataset.get_attributes())
+
+    attribute_data = dataset.get()['Portugal']['COVID']['total_deaths']
+    parquet_attribute_data = parquet_dataset.get()['Portugal']['COVID']['total_deaths']
+    self.assertEqual({k: v for k, v in attribute_data.items() if k != 'VALUE'},
+                     {k: v for k, v in parquet_attribute_data.items() if k != 'VALUE'})
+    self.assertTrue(attribute_data['VALUE'].astype(float).equals(parquet_attribute_data['VALUE']))
+
+  def test_load_sharded(self):
+    countries = ['Portugal', 'Spain']
+    categories = ['COVID', 'MORTALITY']
+    attributes = [('COVID', 'new_cases'), ('COVID', 'total_deaths'), ('MORTALITY', 'Total_Total')]
+
+    dataset = FAIRiskDataset.load()
+    filtered_dataset = FAIRiskDataset.load(countries=countries, categories=categories, attributes=attributes)
+
+    with tempfile.TemporaryDirectory() as tmp:
+      sharded_file_path = path.join(tmp, 'fairisk_dataset.shards')
+      export_dataset(dataset.get(), sharded_file_path)
+      sharded_dataset = FAIRiskDataset.load(sharded_file_path, countries=countries, categories=categories,
+                                            attributes=attributes)
+
+    self.assertEqual(filtered_dataset.get_attributes(), sharded_dataset.get_attributes())
+    self.assertEqual(set(sharded_dataset.get_countries()), set(countries))
+
+  def test_load_memmap(self):
+    dataset = FAIRiskDataset.load()
+
+    with tempfile.TemporaryDirectory() as tmp:
+      memmap_file_path = path.join(tmp, 'fairisk_dataset.mmap')
+      export_dataset(dataset.get(), memmap_file_path)
+      memmap_dataset = FAIRiskDataset.load(memmap_file_path)
+
+      self.assertEqual(dataset.get_attributes(), memmap_dataset.get_attributes())
+
+      values = memmap_dataset.get()['Portugal']['COVID']['total_deaths']['VALUE']
+      self.assertIsInstance(values.values.base, np.memmap)
+      self.assertTrue(dataset.get()['Portugal']['COVID']['total_deaths']['VALUE'].astype(float).equals(values))
+      del memmap_dataset, values
+
+  def test_columnar_engine(self):
+    dataset = FAIRiskDataset.load()
+    columnar_dataset = FAIRiskDataset.load(engine='columnar')
+
+    self.assertEqual(dataset.get_interval(), columnar_dataset.get_interval())
+    self.assertEqual(dataset.get_attributes(), columnar_dataset.get_attributes())
+
+    pd_interval = pd.Interval(pd.Timestamp('2020'), pd.Timestamp('2021'), closed='neither')
+    for d in [dataset, columnar_dataset]:
+      d.filter_countries(['Portugal', 'Spain'])\
+        .filter_categories(['COVID', 'MORTALITY', 'SCORES'])\
+        .filter_age_group((40, 80))\
+        .filter_time_interval(pd_interval)
+
+    self.assertEqual(dataset.get_attributes(), columnar_dataset.get_attributes())
+    pd.testing.assert_frame_equal(dataset.export(type='all'), columnar_dataset.export(type='all'), check_dtype=False)
+
+    attribute_data = dataset.get()['Portugal']['COVID']['total_deaths']
+    columnar_attribute_data = columnar_dataset.get()['Portugal']['COVID']['total_deaths']
+    self.assertTrue(attribute_data['VALUE'].astype(float).equals(columnar_attribute_data['VALUE']))
+
+
+  def test_view(self):
+    dataset = FAIRiskDataset.load(engine='columnar')
+    attributes = dataset.get_attributes()
+
+    pd_interval = pd.Interval(pd.Timestamp('2020'), pd.Timestamp('2021'), closed='neither')
+    view = dataset.view().filter_countries(['Portugal', 'Spain']).filter_age_group((40, 80))
+    time_view = view.view().filter_time_interval(pd_interval)
+
+    filtered_dataset = FAIRiskDataset.load().filter_countries(['Portugal', 'Spain']).filter_age_group((40, 80))
+    self.assertEqual(view.get_attributes(), filtered_dataset.get_attributes())
+    pd.testing.assert_frame_equal(time_view.export(type='all'),
+                                  filtered_dataset.filter_time_interval(pd_interval).export(type='all'),
+                                  check_dtype=False)
+
+    # the viewed datasets are not changed
+    self.assertEqual(dataset.get_attributes(), attributes)
+    self.assertNotEqual(view.get_interval(), time_view.get_interval())
+
+    # changes to the data of a view of the whole dataset do not change the dataset
+    dataset = FAIRiskDataset.load(engine='columnar')
+    exported = dataset.export(type='all')
+    dataset.view().get()['Portugal']['COVID']['total_deaths']['VALUE'].iloc[0] = -99
+    dataset.view().normalize_scores()
+    pd.testing.assert_frame_equal(dataset.export(type='all'), exported)
+
+    # nor do changes to the data of the dataset change its views
+    first_value = dataset.view().filter_countries(['Portugal']).get()['Portugal']['COVID']['total_deaths']['VALUE'] \
+      .iloc[0]
+    view = dataset.view().filter_countries(['Portugal'])
+    dataset.get()['Portugal']['COVID']['total_deaths']['VALUE'].iloc[0] = -99
+    self.assertEqual(view.get()['Portugal']['COVID']['total_deaths']['VALUE'].iloc[0], first_value)
+
+
+  def test_lazy(self):
+    dataset = FAIRiskDataset.load()
+    attributes = dataset.get_attributes()
+
+    lazy_dataset = dataset.lazy().resample('MONTHLY').filter_countries(['Portugal']).filter_categories('COVID')
+    plan = lazy_dataset.explain().splitlines()
+    self.assertTrue(plan[-1].startswith("  resample('MONTHLY')"))
+    self.assertEqual(len([step for step in plan if 'pushed ahead of' in step]), 2)
+
+    filtered_dataset = FAIRiskDataset.load().resample('MONTHLY').filter_countries(['Portugal']).filter_categories('COVID')
+    pd.testing.assert_frame_equal(lazy_dataset.export(type='all'), filtered_dataset.export(type='all'), check_dtype=False)
+
+    # the dataset is not changed
+    self.assertEqual(dataset.get_attributes(), attributes)
+
+    # the expensive operations run in a pool of processes
+    lazy_dataset = dataset.lazy().filter_countries(['Portugal', 'Spain']) \
+      .resample('MONTHLY', max_processes=2).resample_age_groups('MEDIUM', max_processes=2)
+    self.assertIn("resample('MONTHLY', max_processes=2)", lazy_dataset.explain())
+    filtered_dataset = FAIRiskDataset.load().filter_countries(['Portugal', 'Spain']) \
+      .resample('MONTHLY').resample_age_groups('MEDIUM')
+    pd.testing.assert_frame_equal(lazy_dataset.export(type='all'), filtered_dataset.export(type='all'), check_dtype=False)
+
 
   # GETTERS
 
@@ -28,6 +156,56 @@ class TestFAIRiskDataset(unittest.TestCase):
       time_interval = FAIRiskDataset.load().get_interval()
       self.assertIsInstance(time_interval, pd.Interval)
 
+  def test_get_interval_selection(self):
+    dataset = FAIRiskDataset.load()
+    columnar_dataset = FAIRiskDataset.load(engine='columnar')
+    time_interval = dataset.get_interval()
+
+    for countries, categories in [('Portugal', None), (None, 'COVID'), (['Portugal', 'Spain'], ['COVID', 'MORTALITY'])]:
+      sub_interval = dataset.get_interval(countries, categories)
+      self.assertEqual(sub_interval, columnar_dataset.get_interval(countries, categories))
+      self.assertTrue(time_interval.left <= sub_interval.left and sub_interval.right <= time_interval.right)
+
+    self.assertIsNone(dataset.get_interval(categories='SCORES'))
+    self.assertIsNone(columnar_dataset.get_interval(categories='SCORES'))
+
+    # bounds are kept up to date by filters
+    pd_interval = pd.Interval(pd.Timestamp('2020-03-01'), pd.Timestamp('2020-06-30'), closed='both')
+    for d in [dataset, columnar_dataset]:
+      d.filter_countries(['Portugal', 'Spain']).filter_time_interval(pd_interval)
+    self.assertEqual(dataset.get_interval(), columnar_dataset.get_interval())
+    self.assertTrue(dataset.get_interval().overlaps(pd_interval))
+
+  def test_missingness_matrix(self):
+    dataset = FAIRiskDataset.load()
+    matrix = dataset.missingness_matrix()
+
+    self.assertEqual(list(matrix.index), dataset.get_countries())
+    pd.testing.assert_frame_equal(matrix, FAIRiskDataset.load(engine='columnar').missingness_matrix())
+
+    # the filters count the missing attributes of the matrix
+    n_missing = matrix.sum(axis=1)
+    dataset.filter_countries_missing_value_attributes_below(int(n_missing.median()))
+    self.assertEqual(dataset.get_countries(), list(n_missing.index[n_missing <= n_missing.median()]))
+    self.assertFalse(dataset.missingness_matrix().sum(axis=1).gt(n_missing.median()).any())
+
+  def test_age_cube(self):
+    for engine in ['dict', 'columnar']:
+      dataset = FAIRiskDataset.load(engine=engine)
+      cube = dataset.age_cube('Portugal', 'MORTALITY')
+      attributes = dataset.get()['Portugal']['MORTALITY']
+
+      # the bands kept by filter_age_group are those the dataset filter keeps
+      age_attributes = dataset.filter_age_group((40, 80)).get()['Portugal']['MORTALITY'].keys()
+      self.assertEqual(set(cube.filter_age_group((40, 80)).to_frame().index.get_level_values('band')),
+                       {name.rsplit('_', 1)[0] for name in age_attributes if name in cube.attributes})
+
+      series = attributes['From 40 to 44 years_Females']['VALUE']
+      values = cube.get('Female').loc['From 40 to 44 years']
+      self.assertTrue(values.reindex(series.index).astype(float).equals(series.astype(float)))
+
+      self.assertIsNone(dataset.age_cube('Portugal', 'COVID'))
+
   def test_data_getters(self):
     dataset = FAIRiskDataset.load()
     print(f"Countries: {dataset.get_countries()}")
@@ -107,6 +285,24 @@ class TestFAIRiskDataset(unittest.TestCase):
     self.assertLessEqual(max_date, pd_interval.right)
 
 
+  def test_filter_time_intervals(self):
+    time_intervals = [pd.Interval(pd.Timestamp('2020'), pd.Timestamp('2021'), closed='neither'), pd.Period('2021-03')]
+
+    for engine in ['dict', 'columnar']:
+      dataset = FAIRiskDataset.load(engine=engine).filter_countries(['Portugal', 'Spain'])
+      attributes = dataset.get_attributes()
+
+      filtered_datasets = dataset.filter_time_intervals(time_intervals)
+      self.assertEqual(len(filtered_datasets), len(time_intervals))
+      for time_interval, filtered_dataset in zip(time_intervals, filtered_datasets):
+        expected = FAIRiskDataset.load(engine=engine).filter_countries(['Portugal', 'Spain'])\
+          .filter_time_interval(time_interval)
+        pd.testing.assert_frame_equal(filtered_dataset.export(type='all'), expected.export(type='all'))
+
+      # the dataset is not changed
+      self.assertEqual(dataset.get_attributes(), attributes)
+
+
   def test_filter_age_group(self):
     dataset = FAIRiskDataset.load()
 
@@ -190,6 +386,30 @@ class TestFAIRiskDataset(unittest.TestCase):
     self.assertEqual(len(dataset.get()[country][category_m].keys()), 15)
     self.assertEqual(len(dataset.get()[country][category_d].keys()), 15)
 
+    # groups given by their edges, which can only be merged afterwards
+    dataset = FAIRiskDataset.load()
+    dataset.filter_countries(country).resample_age_groups([15, 65])
+    self.assertEqual(list(dataset.get()[country][category_d].keys())[:3], ['-14_Male', '-14_Female', '-14_Total'])
+    dataset.resample_age_groups('HIGH')
+    self.assertEqual(len(dataset.get()[country][category_d].keys()), 9)
+    dataset.resample_age_groups([65])
+    self.assertEqual(len(dataset.get()[country][category_d].keys()), 6)
+
+  def test_resample_in_processes(self):
+    countries = ['Portugal', 'Spain', 'France']
+    for engine in ['dict', 'columnar']:
+      serial = FAIRiskDataset.load(engine=engine).filter_countries(countries)
+      serial.resample('MONTHLY').resample_age_groups('MEDIUM')
+      parallel = FAIRiskDataset.load(engine=engine).filter_countries(countries)
+      parallel.resample('MONTHLY', max_processes=2).resample_age_groups('MEDIUM', max_processes=2)
+      pd.testing.assert_frame_equal(serial.export(type='all'), parallel.export(type='all'))
+
+    # resampling a view does not change the viewed dataset
+    dataset = FAIRiskDataset.load(engine='columnar').filter_countries(countries)
+    exported = dataset.export(type='all')
+    dataset.view().resample('MONTHLY').resample_age_groups('MEDIUM')
+    pd.testing.assert_frame_equal(dataset.export(type='all'), exported)
+
 
   def test_normalize_scores(self):
     dataset = FAIRiskDataset.load()
@@ -0,0 +1,39 @@
+import unittest
+
+from fairiskdata.utils.missingness import MissingnessMatrix
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+
+class TestMissingnessMatrix(unittest.TestCase):
+
+  def setUp(self):
+    # Portugal has a missing value on new_deaths, Spain does not have new_deaths and Italy has no data
+    self.missingness = MissingnessMatrix.from_entries(
+      countries=['Portugal', 'Portugal', 'Spain'], categories=['COVID', 'COVID', 'COVID'],
+      attributes=['new_cases', 'new_deaths', 'new_cases'], complete=[True, False, True],
+      all_countries=['Portugal', 'Spain', 'Italy'])
+
+  def test_to_frame(self):
+    frame = self.missingness.to_frame()
+
+    self.assertEqual(list(frame.index), ['Portugal', 'Spain', 'Italy'])
+    self.assertEqual(list(frame.columns), [('COVID', 'new_cases'), ('COVID', 'new_deaths')])
+    self.assertEqual(frame.values.tolist(), [[False, True], [False, True], [True, True]])
+
+  def test_queries(self):
+    self.assertEqual(self.missingness.get_countries_missing_any([('COVID', 'new_cases')]), ['Italy'])
+    self.assertEqual(self.missingness.get_countries_missing_any([('COVID', 'total_cases')]),
+                     ['Portugal', 'Spain', 'Italy'])
+    self.assertEqual(self.missingness.get_countries_missing_above(1), ['Italy'])
+    self.assertEqual(self.missingness.get_attributes_missing_above(2), [('COVID', 'new_deaths')])
+
+  def test_updates(self):
+    missingness = self.missingness.drop_countries(['Italy']).drop_attributes([('COVID', 'new_deaths')])
+    self.assertEqual(missingness.to_frame().values.tolist(), [[False], [False]])
+
+
+if __name__ == '__main__':
+  unittest.main()
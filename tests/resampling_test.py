@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from fairiskdata.preprocessing.resampling import Resampler
+from fairiskdata.utils.time_index import get_time_index
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+
+class TestResampling(unittest.TestCase):
+
+  def test_undersample(self):
+    days = pd.date_range('2020-01-01', '2020-12-31', freq='D')
+    values = np.random.default_rng(0).integers(0, 100, len(days)).astype(float)
+    values[[10, 100]] = np.nan
+    # a month of missing data
+    keep = (days.month != 6)
+    time_series = pd.Series(values[keep], index=[day.strftime('%Y-%m-%d') for day in days[keep]])
+
+    for frequency in ['WEEKLY', 'MONTHLY', 'YEARLY']:
+      resampler = Resampler(pd.Interval(pd.Timestamp('2019-12-01'), pd.Timestamp('2021-01-01')), frequency)
+      for series_type in ['NEW', 'CURRENT']:
+        resampled = resampler.resample(time_series, 'DAILY', series_type)
+        # the same as with unsorted keys (whose plan compares each key with each new interval)
+        shuffled = time_series.sample(frac=1, random_state=0)
+        self.assertFalse(get_time_index(shuffled.index).is_sorted)
+        pd.testing.assert_series_equal(resampled, resampler.resample(shuffled, 'DAILY', series_type))
+
+    monthly = Resampler(pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-01-01')), 'MONTHLY')\
+      .resample(time_series, 'DAILY', 'NEW')
+    self.assertEqual(monthly['02-2020'], values[31:60].sum())
+    self.assertTrue(np.isnan(monthly['01-2020']))
+    self.assertTrue(np.isnan(monthly['06-2020']))
+
+  def test_oversample(self):
+    months = pd.period_range('2020-01', '2020-12', freq='M')
+    time_series = pd.Series(np.arange(100., 1300., 100.), index=[month.strftime('%m-%Y') for month in months])
+    time_series['05-2020'] = np.nan
+    time_interval = pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-01-01'))
+
+    daily = Resampler(time_interval, 'DAILY').resample(time_series, 'MONTHLY', 'NEW')
+    self.assertAlmostEqual(daily['01-01-2020'], 100 / 31)
+    self.assertAlmostEqual(daily['29-02-2020'], 200 / 29)
+    self.assertTrue(np.isnan(daily['15-05-2020']))
+    self.assertAlmostEqual(np.nansum(daily), time_series.sum())
+
+    # weeks across two months add the days of each
+    weekly = Resampler(time_interval, 'WEEKLY').resample(time_series, 'MONTHLY', 'NEW')
+    self.assertAlmostEqual(weekly['2020W03'], 6 * 100 / 31 + 200 / 29)
+
+    exact = Resampler(time_interval, 'DAILY', exact_totals=True).resample(time_series, 'MONTHLY', 'NEW')
+    np.testing.assert_array_equal(exact.dropna() % 1, 0)
+    self.assertEqual(exact.sum(), time_series.sum())
+
+    totals = Resampler(time_interval, 'DAILY', exact_totals=True).resample(time_series.cumsum(), 'MONTHLY', 'TOTAL')
+    self.assertEqual(totals['31-03-2020'], 600)
+    self.assertEqual(totals['30-06-2020'], time_series.cumsum()['06-2020'])
+    self.assertTrue(np.isnan(totals['31-05-2020']))
+
+    current = Resampler(time_interval, 'WEEKLY').resample(time_series, 'MONTHLY', 'CURRENT')
+    self.assertEqual(current['2020W03'], 200)
+    self.assertTrue(np.isnan(current['2020W19']))
+
+  def test_resample_all(self):
+    weeks = ['2020W%02d' % week for week in range(1, 53)]
+    rng = np.random.default_rng(0)
+    time_series = [pd.Series(rng.integers(0, 100, len(weeks)).astype(float), index=weeks) for _ in range(3)] + \
+      [pd.Series([1., 2., 3.], index=['2019', '2020', '2021'])]
+    time_series[1].iloc[5] = np.nan
+    current_frequencies = ['WEEKLY'] * 3 + ['YEARLY']
+    series_types = ['NEW', 'NEW', 'CURRENT', 'TOTAL']
+
+    resampler = Resampler(pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-01-01')), 'MONTHLY')
+    resampled = resampler.resample_all(time_series, current_frequencies, series_types)
+    for series, new_series, current_frequency, series_type in \
+        zip(time_series, resampled, current_frequencies, series_types):
+      pd.testing.assert_series_equal(new_series, resampler.resample(series, current_frequency, series_type))
+
+    # the weekly series share a plan
+    self.assertEqual(len(resampler._plans), 2)
+    self.assertIs(resampler.get_plan(pd.Index(weeks), 'WEEKLY'), resampler.get_plan(time_series[0].index, 'WEEKLY'))
+
+  def test_resample_in_processes(self):
+    weeks = ['2020W%02d' % week for week in range(1, 53)]
+    days = [day.strftime('%d-%m-%Y') for day in pd.date_range('2020-01-01', '2020-12-31')]
+    rng = np.random.default_rng(1)
+    time_series = [pd.Series(rng.random(len(weeks)), index=weeks) for _ in range(5)] + \
+      [pd.Series(rng.random(len(days)), index=days) for _ in range(5)]
+    current_frequencies = ['WEEKLY'] * 5 + ['DAILY'] * 5
+    series_types = ['NEW', 'TOTAL', 'CURRENT', 'NEW', 'TOTAL'] * 2
+    countries = ['PT', 'ES', 'FR', 'PT', 'DE'] * 2
+
+    resampler = Resampler(pd.Interval(pd.Timestamp('2020-01-01'), pd.Timestamp('2021-01-01')), 'MONTHLY')
+    serial = resampler.resample_all(time_series, current_frequencies, series_types)
+    parallel = resampler.resample_all(time_series, current_frequencies, series_types, partitions=countries,
+                                      max_processes=3)
+    for series, new_series in zip(serial, parallel):
+      pd.testing.assert_series_equal(new_series, series)
+
+
+if __name__ == '__main__':
+  unittest.main()
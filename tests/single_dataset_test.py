@@ -0,0 +1,102 @@
+import unittest
+import time
+import copy
+import tempfile
+from unittest import mock
+import pandas as pd
+
+from fairiskdata.sources import COVID, GHO, INFORM, MORTALITY, MORT_EUROSTAT
+from fairiskdata.sources.mortality_hmd import MortalityHMDDataset
+from fairiskdata.sources.single_dataset import fetch_data, structure_data
+from fairiskdata.sources.artifacts import StructuredArtifacts
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+
+class SleepingDataset:
+
+  def __init__(self, delay, success=True, error=None):
+    self.delay = delay
+    self.success = success
+    self.error = error
+
+  def fetch(self):
+    time.sleep(self.delay)
+    if self.error is not None:
+      raise self.error
+    return self.success
+
+
+class TestSingleDataset(unittest.TestCase):
+
+  def test_fetch_data_parallel(self):
+    sources = {COVID: SleepingDataset(0.3),
+               GHO: SleepingDataset(0.3, error=RuntimeError('connection reset')),
+               INFORM: SleepingDataset(0.3, success=False)}
+
+    with mock.patch('fairiskdata.sources.single_dataset.create_dataset', side_effect=sources.get):
+      start = time.perf_counter()
+      datasets = fetch_data([COVID, GHO, INFORM, 'UNKNOWN'], max_workers=3)
+      elapsed = time.perf_counter() - start
+
+    self.assertEqual(list(datasets.keys()), [COVID])
+    self.assertLess(elapsed, 0.8)
+
+  @staticmethod
+  def _hmd_dataset():
+    hmd = MortalityHMDDataset()
+    hmd.source_str = 'Human Mortality Database'
+    hmd.data = pd.DataFrame([{'CountryCode': country, 'Year': year, 'Week': week, 'Sex': sex,
+                              'D0_14': 1., 'D15_64': 2., 'D65_74': 3., 'D75_84': 4., 'D85p': 5., 'DTotal': 15.}
+                             for country in ['PRT', 'ESP'] for year in [2019, 2020] for week in range(1, 53)
+                             for sex in ['m', 'f', 'b']])
+    return hmd
+
+  def test_structure_data_parallel(self):
+    hmd = self._hmd_dataset()
+    other_hmd = copy.deepcopy(hmd)
+    other_hmd.data['CountryCode'] = other_hmd.data['CountryCode'].replace({'PRT': 'ITA', 'ESP': 'AUT'})
+    sources = {MORTALITY: hmd, MORT_EUROSTAT: other_hmd, 'UNKNOWN': None}
+
+    serial = structure_data(copy.deepcopy(sources))
+    parallel = structure_data(copy.deepcopy(sources), max_processes=2)
+
+    self.assertEqual(list(parallel.keys()), [MORTALITY, MORT_EUROSTAT, 'UNKNOWN'])
+    for dataset_name in [MORTALITY, MORT_EUROSTAT]:
+      self.assertEqual(serial[dataset_name].get_structured_data(), parallel[dataset_name].get_structured_data())
+    self.assertEqual(set(parallel[MORT_EUROSTAT].get_structured_data().keys()), {'Italy', 'Austria'})
+
+  def test_structure_data_artifacts(self):
+    def sources(changed=False):
+      hmd, other_hmd = self._hmd_dataset(), self._hmd_dataset()
+      other_hmd.data['CountryCode'] = other_hmd.data['CountryCode'].replace({'PRT': 'ITA', 'ESP': 'AUT'})
+      if changed:
+        other_hmd.data.loc[0, 'DTotal'] = 16.
+      return {MORTALITY: hmd, MORT_EUROSTAT: other_hmd}
+
+    with tempfile.TemporaryDirectory() as tmp:
+      artifacts = StructuredArtifacts(tmp)
+      with mock.patch.object(MortalityHMDDataset, '_structure', autospec=True,
+                             side_effect=MortalityHMDDataset._structure) as structure:
+        first = structure_data(sources(), artifacts=artifacts)
+        self.assertEqual(structure.call_count, 2)
+
+        # unchanged sources are not structured again
+        second = structure_data(sources(), artifacts=artifacts)
+        self.assertEqual(structure.call_count, 2)
+
+        # only the changed source is structured again
+        third = structure_data(sources(changed=True), artifacts=artifacts)
+        self.assertEqual(structure.call_count, 3)
+
+    for dataset_name in [MORTALITY, MORT_EUROSTAT]:
+      self.assertEqual(first[dataset_name].get_source_str(), second[dataset_name].get_source_str())
+      self.assertEqual(first[dataset_name].get_structured_data(), second[dataset_name].get_structured_data())
+    self.assertEqual(first[MORTALITY].get_structured_data(), third[MORTALITY].get_structured_data())
+    self.assertNotEqual(first[MORT_EUROSTAT].get_structured_data(), third[MORT_EUROSTAT].get_structured_data())
+
+
+if __name__ == '__main__':
+  unittest.main()
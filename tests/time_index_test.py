@@ -0,0 +1,64 @@
+import unittest
+import gc
+import pandas as pd
+import numpy as np
+
+from fairiskdata.utils.time_parsers import safe_date_parse
+from fairiskdata.utils.time_index import get_time_index, set_time_index
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+KEYS = ['2020W05', '2020W53', '03-2021', '03/2021', '2020-01-31', '2010-2015', '2019', 'Total']
+
+
+class TestTimeIndex(unittest.TestCase):
+
+  def test_parse(self):
+    time_index = get_time_index(pd.Index(KEYS))
+
+    self.assertEqual(list(time_index.labels), KEYS)
+    self.assertEqual(time_index.to_list(), [safe_date_parse(key) for key in KEYS])
+
+  def test_overlaps(self):
+    time_index = get_time_index(pd.Index(KEYS))
+
+    for time_interval in [pd.Interval(pd.Timestamp('2020'), pd.Timestamp('2021'), closed='neither'),
+                          pd.Interval(pd.Timestamp('2020-01-31'), pd.Timestamp('2021-03-01'), closed='both'),
+                          pd.Interval(pd.Timestamp('2020-01-31'), pd.Timestamp('2021-03-01'), closed='left')]:
+      expected = [False if parsed is None else
+                  time_interval.overlaps(parsed) if isinstance(parsed, pd.Interval) else parsed in time_interval
+                  for parsed in map(safe_date_parse, KEYS)]
+      self.assertEqual(list(time_index.overlaps(time_interval)), expected)
+
+  def test_select_overlapping(self):
+    weeks = get_time_index(pd.Index(['2020W%02d' % week for week in range(1, 54)]))
+    self.assertTrue(weeks.is_sorted)
+    self.assertFalse(get_time_index(pd.Index(KEYS)).is_sorted)
+
+    time_intervals = [pd.Interval(pd.Timestamp('2020-02-01'), pd.Timestamp('2020-06-30'), closed='both'),
+                      pd.Interval(pd.Timestamp('2020-01-06'), pd.Timestamp('2020-03-02'), closed='neither'),
+                      pd.Interval(pd.Timestamp('2021'), pd.Timestamp('2022'), closed='both')]
+    for time_interval, selected in zip(time_intervals, weeks.select_overlapping_all(time_intervals)):
+      self.assertIsInstance(selected, slice)
+      self.assertEqual(list(weeks.labels[selected]), list(weeks.labels[weeks.overlaps(time_interval)]))
+
+  def test_cache(self):
+    series = pd.Series(np.arange(len(KEYS)), index=KEYS)
+    time_index = get_time_index(series.index)
+    self.assertIs(get_time_index(series.index), time_index)
+
+    selected = time_index.overlaps(pd.Interval(pd.Timestamp('2020'), pd.Timestamp('2021')))
+    selected_series = series[selected]
+    set_time_index(selected_series.index, time_index.take(selected))
+    self.assertEqual(list(get_time_index(selected_series.index).labels), list(selected_series.index))
+
+    # a new index with the same id is parsed again
+    del series, selected_series
+    gc.collect()
+    self.assertEqual(list(get_time_index(pd.Index(['2019'])).labels), ['2019'])
+
+
+if __name__ == '__main__':
+  unittest.main()
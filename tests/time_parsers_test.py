@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from fairiskdata.utils.time_parsers import parse_time_keys, safe_date_parse, KIND_NONE, KIND_TIMESTAMP, KIND_WEEK, \
+  KIND_YEAR_RANGE, KIND_MONTH, KIND_YEAR
+
+import logging.config
+from os import path
+logging.config.fileConfig(path.join(path.dirname(__file__), '../logging.conf'))
+
+KEYS = ['2020W00', '2020W1', '2020W05', '2020W53', '2021W00', '2021W53', '03-2021', '03/2021', '12-2021', '13-2021',
+        '2020-01-31', '2021-02-30', '31-01-2020', '2010-2015', '2019', '1677', 'Total', '']
+
+
+class TestTimeParsers(unittest.TestCase):
+
+  def test_parse_time_keys(self):
+    start, end, kind = parse_time_keys(KEYS)
+
+    for key, key_start, key_end, key_kind in zip(KEYS, start, end, kind):
+      parsed = safe_date_parse(key)
+      if isinstance(parsed, pd.Interval):
+        self.assertEqual((key_start, key_end), (parsed.left.value, parsed.right.value), key)
+        self.assertGreaterEqual(key_kind, KIND_WEEK, key)
+      elif isinstance(parsed, pd.Timestamp):
+        self.assertEqual((key_start, key_end, key_kind), (parsed.value, parsed.value, KIND_TIMESTAMP), key)
+      else:
+        self.assertEqual((key_start, key_end, key_kind), (pd.NaT.value, pd.NaT.value, KIND_NONE), key)
+
+    self.assertEqual(list(kind[[2, 6, 7, 13, 14]]), [KIND_WEEK, KIND_MONTH, KIND_MONTH, KIND_YEAR_RANGE, KIND_YEAR])
+
+  def test_parse_time_keys_missing(self):
+    start, end, kind = parse_time_keys(['2019', np.nan, None, '2019'])
+
+    self.assertEqual(list(kind), [KIND_YEAR, KIND_NONE, KIND_NONE, KIND_YEAR])
+    self.assertEqual(start[0], start[3])
+
+  def test_parse_time_keys_errors(self):
+    # the same errors as `safe_date_parse`
+    for key in ['2020W54', '2015-2010']:
+      self.assertRaises(ValueError, safe_date_parse, key)
+      self.assertRaises(ValueError, parse_time_keys, ['2019', key])
+
+
+if __name__ == '__main__':
+  unittest.main()